@@ -8,6 +8,8 @@ from homeassistant.helpers.aiohttp_client import async_get_clientsession
 from .helpers import LOGGER, ConfigEntryType
 from .helpers.component_api import ComponentApi
 from .helpers.meross_profile import MerossProfile, MerossProfileStore
+from .helpers.response_size import ResponseSizeStore
+from .helpers.snapshot import DeviceSnapshotStore
 from .merossclient import cloudapi
 
 if typing.TYPE_CHECKING:
@@ -40,14 +42,17 @@ async def async_setup_entry(
                 # this could happen when we add profile entries
                 # after boot
                 api.devices[device_id] = None
+            await api.async_prewarm_modules()
             device = await api.async_build_device(device_id, config_entry)
             try:
                 await device.async_init()
                 await device.async_setup_entry(hass, config_entry)
                 api.devices[device_id] = device
                 # this code needs to run after registering api.devices[device_id]
-                # because of race conditions with profile entry loading
-                device.start()
+                # because of race conditions with profile entry loading.
+                # The startup scheduler will start the device (now or in a
+                # later wave) so that the whole fleet doesn't start at once
+                api.startup_scheduler.admit(device)
                 return True
             except Exception as error:
                 await device.async_shutdown()
@@ -104,6 +109,8 @@ async def async_remove_entry(hass: "HomeAssistant", config_entry: "ConfigEntry")
     match ConfigEntryType.get_type_and_id(config_entry.unique_id):
         case (ConfigEntryType.DEVICE, device_id):
             api.devices.pop(device_id)
+            await ResponseSizeStore(hass, device_id).async_remove()
+            await DeviceSnapshotStore(hass, device_id).async_remove()
 
         case (ConfigEntryType.PROFILE, profile_id):
             api.profiles.pop(profile_id)
@@ -279,7 +279,7 @@ class MtsClimate(me.MLEntity, climate.ClimateEntity):
             try:
                 ns_adjust = self.get_ns_adjust()
                 if ns_adjust.polling_epoch_next > (ns_adjust.device.lastresponse + 30):
-                    ns_adjust.polling_epoch_next = 0.0
+                    ns_adjust.polling_reset()
             except:
                 # in case the ns is not available for this device
                 pass
@@ -429,6 +429,7 @@ class MerossFlowHandlerMixin(
         config_schema[
             _required(mlc.CONF_CHECK_FIRMWARE_UPDATES, profile_config, False)
         ] = bool
+        config_schema[_optional(mlc.CONF_MQTT_RX_DECODE, profile_config, False)] = bool
         if self._profile_entry:
             self._setup_entitymanager_schema(config_schema, profile_config)
         return self.async_show_form_with_errors(
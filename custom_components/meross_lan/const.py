@@ -48,7 +48,8 @@ CONF_TRACE: Final = "trace"
 # when starting a trace stop it and close the file after .. secs
 CONF_TRACE_TIMEOUT: Final = "trace_timeout"
 CONF_TRACE_TIMEOUT_DEFAULT: Final = 600
-CONF_TRACE_MAXSIZE: Final = 262144  # or when MAXSIZE exceeded
+CONF_TRACE_MAXSIZE: Final = 262144  # rotate the file when MAXSIZE exceeded
+CONF_TRACE_MAXFILES: Final = 4  # and stop when MAXFILES have been written
 # folder where to store traces
 CONF_TRACE_DIRECTORY: Final = "traces"
 # versioning
@@ -122,6 +123,12 @@ CONF_POLLING_PERIOD_MIN: Final = 5
 CONF_POLLING_PERIOD_DEFAULT: Final = 30
 # enable/disable Appliance.Control.Multiple
 CONF_DISABLE_MULTIPLE: Final = "disable_multiple"
+# max number of concurrent (pipelined) MQTT transactions for a device
+CONF_MQTT_WINDOW: Final = "mqtt_window"
+CONF_MQTT_WINDOW_DEFAULT: Final = 4
+CONF_MQTT_WINDOW_MAX: Final = 8
+# restore the last known device state (snapshot) when the entry is loaded
+CONF_WARM_START: Final = "warm_start"
 # this is a 'fake' conf used to force-flush
 CONF_TIMESTAMP: Final = mc.KEY_TIMESTAMP
 
@@ -148,6 +155,10 @@ class DeviceConfigType(DeviceConfigTypeMinimal, total=False):
     """configures the protocol: auto will automatically switch between the available transports"""
     polling_period: NotRequired[int | None]
     """base polling period to query device state"""
+    mqtt_window: NotRequired[int | None]
+    """max number of concurrent MQTT transactions (adapted down on losses)"""
+    warm_start: NotRequired[bool | None]
+    """restore the device state saved at shutdown and skip polling it until due"""
     timezone: NotRequired[str]
     """IANA timezone set in the device"""
     timestamp: NotRequired[float]
@@ -160,6 +171,7 @@ CONF_PASSWORD: Final = hac.CONF_PASSWORD
 CONF_MFA_CODE: Final = "mfa_code"
 CONF_SAVE_PASSWORD: Final = "save_password"
 CONF_CHECK_FIRMWARE_UPDATES: Final = "check_firmware_updates"
+CONF_MQTT_RX_DECODE: Final = "mqtt_rx_decode"
 
 
 class ProfileConfigType(
@@ -178,6 +190,8 @@ class ProfileConfigType(
     """saves the account password in HA storage"""
     check_firmware_updates: NotRequired[bool]
     """activate a periodical query to the cloud api to look for fw updates """
+    mqtt_rx_decode: NotRequired[bool]
+    """decode (and verify) cloud MQTT messages in the MQTT client thread"""
 
 
 SERVICE_REQUEST = "request"
@@ -261,3 +275,23 @@ PARAM_HEADER_SIZE = 300
 """(rough) estimate of the header part of any response"""
 PARAM_RESPONSE_SIZE_MAX = 3000
 """(rough) estimate of the allowed response size limit before overflow occurs (see #244)"""
+PARAM_POLLING_SLOT_MAX = 4
+"""(maximum) number of devices starting their polling cycle in the same second"""
+PARAM_MQTT_RL_BUDGET_RESERVE = 2
+"""messages kept in the MQTT rate-limiter budget for commands: smart polls get delayed"""
+PARAM_MQTT_RL_QUEUE_TIMEOUT = 30
+"""max time a request is held back waiting for the MQTT rate-limiter before being discarded"""
+PARAM_RESPONSE_SIZE_SAVE_TIMEOUT = 300
+"""used to delay the updated (learned) response size model to storage"""
+PARAM_SNAPSHOT_TIMEOUT = 600
+"""max age of the device snapshot to be restored when warm starting"""
+PARAM_STARTUP_WAVE_PERIOD = 1
+"""period (seconds) of the waves admitting the devices (first polling) at startup"""
+PARAM_STARTUP_HTTP_BUDGET = 4
+"""(maximum) number of devices talking HTTP started in the same startup wave"""
+PARAM_STARTUP_MQTT_BUDGET = 2
+"""(maximum) number of devices talking MQTT started in the same startup wave"""
+PARAM_STATISTICS_IMPORT_DELAY = 60
+"""delay used to coalesce the energy history updates before importing them into statistics"""
+PARAM_STATISTICS_IMPORT_BATCH_MAX = 20
+"""(maximum) number of statistics imported in a single batch before yielding to the recorder"""
@@ -29,7 +29,7 @@ from ...sensor import (
 from ...switch import MLSwitch
 
 if TYPE_CHECKING:
-    from typing import Any, Callable, Collection, Final
+    from typing import Any, Callable, ClassVar, Collection, Final
 
     from ...helpers.device import AsyncRequestFunc, DigestInitReturnType
     from ...helpers.entity import MLEntity
@@ -106,6 +106,13 @@ class HubNamespaceHandler(NamespaceHandler):
 
     device: "HubMixin"
 
+    # Every dispatched message gets a new sequence number which is stamped on the
+    # parsed subdevices (SubDevice.hub_dispatch_seq) so that duplicated subdevices
+    # in the same payload are detected without keeping a per-message set.
+    # This is shared among all of the handlers since a subdevice could receive
+    # messages from any of them.
+    _dispatch_seq = 0
+
     def __init__(self, device: "HubMixin", ns: "Namespace"):
         NamespaceHandler.__init__(self, device, ns, handler=self._handle_subdevice)
 
@@ -113,23 +120,25 @@ class HubNamespaceHandler(NamespaceHandler):
         """Generalized Hub namespace dispatcher to subdevices"""
         hub = self.device
         subdevices = hub.subdevices
-        subdevices_parsed = set()
+        HubNamespaceHandler._dispatch_seq = dispatch_seq = (
+            HubNamespaceHandler._dispatch_seq + 1
+        )
         key_namespace = self.ns.key
         key_channel = self.ns.key_channel
         for p_subdevice in payload[key_namespace]:
             try:
                 subdevice_id = p_subdevice[key_channel]
-                if subdevice_id in subdevices_parsed:
+                try:
+                    subdevice = subdevices[subdevice_id]
+                except KeyError:
+                    # force a rescan since we discovered a new subdevice
+                    hub.namespace_handlers[mn.Appliance_System_All.name].polling_reset()
+                    continue
+                if subdevice.hub_dispatch_seq == dispatch_seq:
                     hub.log_duplicated_subdevice(subdevice_id)
-                else:
-                    try:
-                        subdevices[subdevice_id]._hub_parse(key_namespace, p_subdevice)
-                    except KeyError:
-                        # force a rescan since we discovered a new subdevice
-                        hub.namespace_handlers[
-                            mn.Appliance_System_All.name
-                        ].polling_epoch_next = 0.0
-                    subdevices_parsed.add(subdevice_id)
+                    continue
+                subdevice.hub_dispatch_seq = dispatch_seq
+                subdevice._hub_parse(key_namespace, p_subdevice)
             except TypeError:
                 # This could happen when the main payload is not a list of subdevices
                 # and might indicate this namespace is likely devoted to general hub
@@ -149,6 +158,8 @@ class HubChunkedNamespaceHandler(HubNamespaceHandler):
     from time to time (see POLLING_STRATEGY_CONF for the relevant namespaces)
     """
 
+    POLLING_TIMED = True
+
     __slots__ = (
         "_models",
         "_included",
@@ -202,6 +213,14 @@ class HubChunkedNamespaceHandler(HubNamespaceHandler):
             self.polling_request_set(p)
             await HubNamespaceHandler.async_trace(self, async_request_func)
 
+    def get_response_size_key(self, payload: dict, /):
+        # chunks carry a different number of subdevices (the last one is
+        # usually shorter) so their sizes are learned separately
+        try:
+            return f"{self.ns.name}#{len(payload[self.ns.key])}"
+        except (KeyError, TypeError):
+            return self.ns.name
+
     def _build_subdevices_payload(self):
         """
         This generator helps dealing with hubs hosting an high number
@@ -451,10 +470,23 @@ class SubDevice(NamespaceParser, BaseDevice):
     ms130-Appliance.Control.Sensor.LatestX)
     """
 
+    if TYPE_CHECKING:
+        type HubParserType = Callable[[Any, dict], Any]
+        HUB_PARSERS: ClassVar[dict[str, HubParserType]]
+        """Dispatch table for _hub_parse: payload key -> '_parse_{key}' method."""
+
+    # payload keys in digest/Sensor.All which are not (or differently) dispatched
+    DIGEST_KEYS_EXCLUDED: "Final" = frozenset(
+        (mc.KEY_ID, mc.KEY_STATUS, mc.KEY_ONOFF, mc.KEY_LASTACTIVETIME)
+    )
+    ALL_KEYS_EXCLUDED: "Final" = frozenset((mc.KEY_ID, mc.KEY_ONLINE))
+
     __slots__ = (
         "async_request",
         "check_device_timezone",
+        "flush_entity_state",
         "hub",
+        "hub_dispatch_seq",
         "model",
         "p_digest",
         "sub_device_info",
@@ -468,11 +500,14 @@ class SubDevice(NamespaceParser, BaseDevice):
         # this way we're short-circuiting that indirection
         self.async_request = hub.async_request
         self.check_device_timezone = hub.check_device_timezone
+        # entity states are written (and batched) by the hub
+        self.flush_entity_state = hub.flush_entity_state
         # these properties are needed to be in place before base class init
         self.hub = hub
         self.model = model
         self.p_digest = p_digest
         self.sub_device_info = None
+        self.hub_dispatch_seq = 0
         id = p_digest[mc.KEY_ID]
         super().__init__(
             id,
@@ -500,6 +535,16 @@ class SubDevice(NamespaceParser, BaseDevice):
             hub.setup_chunked_handler(mn_h.Appliance_Hub_Sensor_All, False, 8)
         hub.remove_issue(mlc.ISSUE_HUB_SUBDEVICE_REMOVED, id)
 
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls.HUB_PARSERS = cls._build_hub_parsers()
+
+    @classmethod
+    def _build_hub_parsers(cls):
+        return {
+            name[7:]: getattr(cls, name) for name in dir(cls) if name[:7] == "_parse_"
+        }
+
     # interface: EntityManager
     def generate_unique_id(self, entity: "MLEntity"):
         """
@@ -540,7 +585,7 @@ class SubDevice(NamespaceParser, BaseDevice):
                 if self.model in mc.MTS100_ALL_TYPESET
                 else mn_h.Appliance_Hub_Sensor_All.name
             )
-        ].polling_epoch_next = 0.0
+        ].polling_reset()
 
     # interface: self
     def build_binary_sensor_window(self):
@@ -561,8 +606,9 @@ class SubDevice(NamespaceParser, BaseDevice):
 
     def _hub_parse(self, key: str, payload: dict):
         try:
-            getattr(self, f"_parse_{key}")(payload)
-        except AttributeError:
+            if hub_parser := self.HUB_PARSERS.get(key):
+                hub_parser(self, payload)
+                return
             # This happens when we still haven't 'normalized' the device structure
             # so we'll (eventually) euristically generate sensors for device properties
             # This is the case for when we see newer devices and we don't know
@@ -648,21 +694,10 @@ class SubDevice(NamespaceParser, BaseDevice):
         self.p_digest = p_digest
         self._parse_online(p_digest)
         if self.online:
-            for _ in (
-                self._hub_parse(key, value)
-                for key, value in p_digest.items()
-                if (
-                    key
-                    not in {
-                        mc.KEY_ID,
-                        mc.KEY_STATUS,
-                        mc.KEY_ONOFF,
-                        mc.KEY_LASTACTIVETIME,
-                    }
-                )
-                and (type(value) is dict)
-            ):
-                pass
+            keys_excluded = SubDevice.DIGEST_KEYS_EXCLUDED
+            for key, value in p_digest.items():
+                if (type(value) is dict) and (key not in keys_excluded):
+                    self._hub_parse(key, value)
             if mc.KEY_ONOFF in p_digest:
                 self._parse_togglex(p_digest)
 
@@ -697,12 +732,10 @@ class SubDevice(NamespaceParser, BaseDevice):
         self._parse_online(p_all.get(mc.KEY_ONLINE, {}))
 
         if self.online:
-            for _ in (
-                self._hub_parse(key, value)
-                for key, value in p_all.items()
-                if (key not in {mc.KEY_ID, mc.KEY_ONLINE}) and (type(value) is dict)
-            ):
-                pass
+            keys_excluded = SubDevice.ALL_KEYS_EXCLUDED
+            for key, value in p_all.items():
+                if (type(value) is dict) and (key not in keys_excluded):
+                    self._hub_parse(key, value)
 
     def _parse_adjust(self, p_adjust: dict):
         for p_key, p_value in p_adjust.items():
@@ -762,6 +795,9 @@ class SubDevice(NamespaceParser, BaseDevice):
             )
 
 
+SubDevice.HUB_PARSERS = SubDevice._build_hub_parsers()
+
+
 class MTS100SubDevice(SubDevice):
     __slots__ = ("climate",)
 
@@ -1063,7 +1099,7 @@ class MS100SubDevice(SubDevice):
                 mn_h.Appliance_Hub_Sensor_Adjust.name
             ]
             if strategy.lastrequest < (self.hub.lastresponse - 30):
-                strategy.polling_epoch_next = 0.0
+                strategy.polling_reset()
 
 
 WELL_KNOWN_TYPE_MAP[mc.TYPE_MS100] = MS100SubDevice
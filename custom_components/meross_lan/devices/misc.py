@@ -162,9 +162,11 @@ class SensorLatestXNamespaceHandler(NamespaceHandler):
                     for channel_payload in polling_request_channels:
                         if channel_payload[key_channel] == channel:
                             channel_payload[mc.KEY_DATA].append(data_key)
+                            self.polling_template = None
                             break
                     else:
                         polling_request_channels.append({key_channel: channel, mc.KEY_DATA: [data_key]})
+                        self.polling_template = None
                         self.polling_response_size = (
                             self.polling_response_base_size
                             + len(polling_request_channels) * self.polling_response_item_size
@@ -8,6 +8,7 @@ from homeassistant.util import dt as dt_util
 
 from .. import const as mlc
 from ..helpers import entity as me
+from ..helpers.consumption import ConsumptionHistory
 from ..helpers.namespaces import (
     EntityNamespaceHandler,
     EntityNamespaceMixin,
@@ -16,6 +17,7 @@ from ..helpers.namespaces import (
     mc,
     mn,
 )
+from ..helpers.statistics import StatisticsSource
 from ..sensor import MLEnumSensor, MLNumericSensor
 from ..switch import MLSwitch
 
@@ -55,6 +57,11 @@ class ElectricitySensor(me.MEAlwaysAvailableMixin, MLNumericSensor):
         native_value: int
 
         sensor_consumptionx: "ConsumptionXSensor | None"
+        _sensors: tuple[tuple[str, MLNumericSensor | None], ...]
+        """(key, sensor) for every SENSOR_DEFS key (None if optional and not built)."""
+        _sensors_version: int
+        """manager.entities_version at the time _sensors was resolved."""
+        _sensor_power: MLNumericSensor | None
 
     SENSOR_DEFS = {
         # key: (not-optional, DeviceClass, StateClass, suggested_display_precision, device_scale)
@@ -89,12 +96,18 @@ class ElectricitySensor(me.MEAlwaysAvailableMixin, MLNumericSensor):
         "_electricity_lastepoch",
         "_reset_unsub",
         "sensor_consumptionx",
+        "_sensors",
+        "_sensors_version",
+        "_sensor_power",
     )
 
     def __init__(self, manager: "Device", channel: object | None, /):
         self._estimate = 0.0
         self._electricity_lastepoch = 0.0
         self._reset_unsub = None
+        self._sensors = ()
+        self._sensors_version = -1
+        self._sensor_power = None
         # depending on init order we might not have this ready now...
         self.sensor_consumptionx = manager.entities.get(mlc.CONSUMPTIONX_SENSOR_KEY)  # type: ignore
         # here entitykey is the 'legacy' EnergyEstimateSensor one to mantain compatibility
@@ -108,15 +121,7 @@ class ElectricitySensor(me.MEAlwaysAvailableMixin, MLNumericSensor):
         self._schedule_reset(dt_util.now())
         for key, entity_def in self.SENSOR_DEFS.items():
             if entity_def[0]:
-                MLNumericSensor(
-                    manager,
-                    channel,
-                    key,
-                    entity_def[1],
-                    state_class=entity_def[2],
-                    suggested_display_precision=entity_def[3],
-                    device_scale=entity_def[4],
-                )
+                self._build_sensor(key)
 
     async def async_shutdown(self):
         if self._reset_unsub:
@@ -124,6 +129,8 @@ class ElectricitySensor(me.MEAlwaysAvailableMixin, MLNumericSensor):
             self._reset_unsub = None
         await super().async_shutdown()
         self.sensor_consumptionx = None
+        self._sensors = ()
+        self._sensor_power = None
 
     async def async_added_to_hass(self):
         await super().async_added_to_hass()
@@ -162,16 +169,27 @@ class ElectricitySensor(me.MEAlwaysAvailableMixin, MLNumericSensor):
     def _parse(self, payload: dict, /):
         """{"channel": 0, "power": 11000, ...}"""
         device = self.manager
-        entities = device.entities
+        if self._sensors_version != device.entities_version:
+            self._resolve_sensors()
 
-        sensor_power = self._get_sensor_from_key(entities, mc.KEY_POWER)
+        sensor_power: MLNumericSensor = self._sensor_power  # type: ignore
         last_power = sensor_power.native_value
 
-        for key in self.SENSOR_DEFS:
+        # apply all of the readings before flushing the changed ones (this is the
+        # same as MLNumericSensor.update_device_value)
+        sensors_changed = []
+        for key, sensor in self._sensors:
             if key in payload:
-                self._get_sensor_from_key(entities, key).update_device_value(
-                    payload[key]
-                )
+                if sensor is None:
+                    # optional sensor appearing: this will also invalidate _sensors
+                    sensor = self._build_sensor(key)
+                device_value = payload[key]
+                if sensor.device_value != device_value:
+                    sensor.device_value = device_value
+                    sensor.native_value = device_value / sensor.device_scale
+                    sensors_changed.append(sensor)
+        for sensor in sensors_changed:
+            sensor.flush_state()
 
         power = sensor_power.native_value
         if not power:
@@ -196,20 +214,32 @@ class ElectricitySensor(me.MEAlwaysAvailableMixin, MLNumericSensor):
 
         self._electricity_lastepoch = device.device_timestamp
 
-    def _get_sensor_from_key(self, entities, key: str, /) -> MLNumericSensor:
-        try:
-            return entities[key if self.channel is None else f"{self.channel}_{key}"]
-        except KeyError:
-            entity_def = self.SENSOR_DEFS[key]
-            return MLNumericSensor(
-                self.manager,
-                self.channel,
-                key,
-                entity_def[1],
-                state_class=entity_def[2],
-                suggested_display_precision=entity_def[3],
-                device_scale=entity_def[4],
-            )
+    def _build_sensor(self, key: str, /):
+        entity_def = self.SENSOR_DEFS[key]
+        return MLNumericSensor(
+            self.manager,
+            self.channel,
+            key,
+            entity_def[1],
+            state_class=entity_def[2],
+            suggested_display_precision=entity_def[3],
+            device_scale=entity_def[4],
+        )
+
+    def _resolve_sensors(self):
+        """(Re)builds the table of the sensors managed by this parser. This is needed
+        whenever the manager entities change (see EntityManager.entities_version)."""
+        entities = self.manager.entities
+        channel = self.channel
+        sensors = []
+        for key, entity_def in self.SENSOR_DEFS.items():
+            sensor = entities.get(key if channel is None else f"{channel}_{key}")
+            if (sensor is None) and entity_def[0]:
+                sensor = self._build_sensor(key)
+            sensors.append((key, sensor))
+        self._sensors = tuple(sensors)  # type: ignore
+        self._sensor_power = dict(sensors)[mc.KEY_POWER]  # type: ignore
+        self._sensors_version = self.manager.entities_version
 
     def _schedule_reset(self, _now: datetime, /):
         with self.exception_warning("_schedule_reset"):
@@ -322,6 +352,9 @@ class ConsumptionXSensor(EntityNamespaceMixin, MLNumericSensor):
         offset: int
         reset_ts: int
         energy_estimate: float
+        history: ConsumptionHistory
+        """The device daily consumption samples (sample epoch -> Wh) indexed by date."""
+        statistics_source: StatisticsSource
         _consumption_last_value: int | None
         _consumption_last_time: int | None
 
@@ -334,6 +367,8 @@ class ConsumptionXSensor(EntityNamespaceMixin, MLNumericSensor):
         "offset",
         "reset_ts",
         "energy_estimate",
+        "history",
+        "statistics_source",
         "_consumption_last_value",
         "_consumption_last_time",
         "_yesterday_midnight_epoch",
@@ -345,6 +380,7 @@ class ConsumptionXSensor(EntityNamespaceMixin, MLNumericSensor):
         self.offset = 0
         self.reset_ts = 0
         self.energy_estimate = 0.0
+        self.history = ConsumptionHistory()
         self._consumption_last_value = None
         self._consumption_last_time = None
         # these are the device actual EPOCHs of the last midnight
@@ -362,6 +398,13 @@ class ConsumptionXSensor(EntityNamespaceMixin, MLNumericSensor):
         super().__init__(
             manager, None, mlc.CONSUMPTIONX_SENSOR_KEY, self.DeviceClass.ENERGY
         )
+        self.statistics_source = StatisticsSource(
+            self.unique_id,
+            self.name,
+            self.native_unit_of_measurement,
+            self.history,
+            self._get_statistics_start,
+        )
         EntityNamespaceHandler(self).polling_response_size_adj(30)
 
     # interface: MLEntity
@@ -426,6 +469,23 @@ class ConsumptionXSensor(EntityNamespaceMixin, MLNumericSensor):
             self.flush_state()
             self.log(self.DEBUG, "no readings available for new day - resetting")
 
+    def _get_statistics_start(self, sample_time: int, /):
+        """Daily samples are imported in the bucket of their (device) midnight."""
+        devtime = self.manager.get_device_datetime(sample_time)
+        midnight_epoch = int(
+            datetime(
+                devtime.year, devtime.month, devtime.day, tzinfo=devtime.tzinfo
+            ).timestamp()
+        )
+        # statistics rows need to be hour aligned
+        return midnight_epoch - (midnight_epoch % 3600)
+
+    def schedule_statistics_import(self):
+        if self.hass_connected:
+            statistics_source = self.statistics_source
+            statistics_source.name = f"{self.manager.name} {self.name}"
+            self.manager.api.statistics_importer.schedule_import(statistics_source)
+
     def _handle(self, header, payload: dict, /):
         device = self.manager
         days = payload[mc.KEY_CONSUMPTIONX]
@@ -464,28 +524,26 @@ class ConsumptionXSensor(EntityNamespaceMixin, MLNumericSensor):
                     devtime_today_midnight.isoformat(),
                     devtime_tomorrow_midnight.isoformat(),
                 )
+            if self.history.update(days):
+                self.schedule_statistics_import()
+        elif self.history.update(days):
+            self.schedule_statistics_import()
+        else:
+            # same payload as the last poll (and same day): nothing to update
+            return
 
-        # the days array contains a month worth of data
+        # the days history contains (at least) a month worth of data
         # but we're only interested in the last few days (today
-        # and maybe yesterday) so we discard a bunch of
-        # elements before sorting (in order to not waste time)
-        # checks for 'not enough meaningful data' are post-poned
-        # and just for safety since they're unlikely to happen
+        # and maybe yesterday). Checks for 'not enough meaningful data'
+        # are just for safety since they're unlikely to happen
         # in a normal running environment over few days
-        def _get_timestamp(_day, /):
-            return _day[mc.KEY_TIME]
-
-        days = sorted(
-            (day for day in days if day[mc.KEY_TIME] >= self._yesterday_midnight_epoch),
-            key=_get_timestamp,
-        )
-        days_len = len(days)
-        if not days_len:
+        history = self.history
+        times = history.times
+        if not (times and (times[-1] >= self._yesterday_midnight_epoch)):
             self.reset_consumption()
             return
 
-        day_last: dict = days[-1]
-        day_last_time: int = day_last[mc.KEY_TIME]
+        day_last_time: int = times[-1]
 
         if day_last_time < self._today_midnight_epoch:
             # this could happen right after midnight when the device
@@ -497,11 +555,13 @@ class ConsumptionXSensor(EntityNamespaceMixin, MLNumericSensor):
             return
 
         # now day_last 'should' contain today data in HA time.
-        day_last_value: int = day_last[mc.KEY_VALUE]
+        day_last_value: int = history.samples[day_last_time]
         # check if the device tripped its own midnight and started a
         # new day readings
-        if days_len > 1 and (
-            self.reset_ts != (day_yesterday_time := days[-2][mc.KEY_TIME])
+        if (
+            (len(times) > 1)
+            and ((day_yesterday_time := times[-2]) >= self._yesterday_midnight_epoch)
+            and (self.reset_ts != day_yesterday_time)
         ):
             # this is the first time after device midnight that we receive new data.
             # in order to fix #264 we're going to set our internal energy offset.
@@ -3,10 +3,12 @@ Helpers!
 """
 
 import abc
+from collections import OrderedDict
 from contextlib import contextmanager
 from datetime import UTC, datetime
 from enum import StrEnum
 import logging
+import threading
 from time import gmtime, time
 import typing
 
@@ -136,6 +138,102 @@ def getLogger(name):
     return logger
 
 
+class LogThrottle:
+    """
+    Bounded cache of the recently emitted 'timeout=' log messages (see _Logger).
+    Entries are keyed by (msg, args) and store [epoch, bucket, suppressed] where
+    epoch is the last emission, bucket is the time bucket (BUCKET_DURATION wide)
+    in which the entry expires (given the timeout of the emitting call) and suppressed
+    counts the messages dropped so far. The cache keeps the least recently emitted
+    entries first so that it can be capped at MAXSIZE while expired entries are
+    purged by whole buckets as time goes by without scanning the cache.
+    """
+
+    MAXSIZE: "Final" = 1024
+    BUCKET_DURATION: "Final" = 300
+
+    __slots__ = (
+        "entries",
+        "buckets",
+        "bucket_purged",
+        "evicted",
+        "suppressed",
+        "_lock",
+    )
+
+    def __init__(self):
+        self.entries: OrderedDict[tuple, list] = OrderedDict()
+        self.buckets: dict[int, set[tuple]] = {}
+        self.bucket_purged = 0
+        self.evicted = 0
+        """Entries discarded before expiring because of MAXSIZE."""
+        self.suppressed = 0
+        """Total number of suppressed messages."""
+        # logging could happen in other threads (paho mqtt)
+        self._lock = threading.Lock()
+
+    def check(self, key: tuple, timeout: float, epoch: float, /):
+        """Returns True (and records the emission) if the message can be logged."""
+        with self._lock:
+            bucket = int((epoch + timeout) // LogThrottle.BUCKET_DURATION)
+            bucket_now = int(epoch // LogThrottle.BUCKET_DURATION)
+            if bucket_now > self.bucket_purged:
+                self._purge(bucket_now)
+            entries = self.entries
+            buckets = self.buckets
+            try:
+                entry = entries[key]
+            except KeyError:
+                entries[key] = [epoch, bucket, 0]
+                if len(entries) > LogThrottle.MAXSIZE:
+                    _key, _entry = entries.popitem(last=False)
+                    buckets[_entry[1]].discard(_key)
+                    self.evicted += 1
+            else:
+                if (epoch - entry[0]) < timeout:
+                    entry[2] += 1
+                    self.suppressed += 1
+                    return False
+                buckets[entry[1]].discard(key)
+                entry[0] = epoch
+                entry[1] = bucket
+                entries.move_to_end(key)
+            try:
+                buckets[bucket].add(key)
+            except KeyError:
+                buckets[bucket] = {key}
+            return True
+
+    def _purge(self, bucket_now: int, /):
+        self.bucket_purged = bucket_now
+        entries = self.entries
+        buckets = self.buckets
+        for bucket in [bucket for bucket in buckets if bucket < bucket_now]:
+            for key in buckets.pop(bucket):
+                del entries[key]
+
+    def get_diagnostic_state(self):
+        with self._lock:
+            suppressed = {}
+            for key, entry in self.entries.items():
+                if entry[2]:
+                    # args could carry sensitive data: only expose the msg
+                    suppressed[key[0]] = suppressed.get(key[0], 0) + entry[2]
+            top_suppressed = sorted(
+                suppressed.items(), key=lambda item: item[1], reverse=True
+            )
+            return {
+                "size": len(self.entries),
+                "evicted": self.evicted,
+                "suppressed": self.suppressed,
+                "top_suppressed": dict(top_suppressed[:10]),
+            }
+
+
+LOG_THROTTLE = LogThrottle()
+"""Global state of the log throttling (see _Logger)"""
+
+
 class _Logger(logging.Logger if typing.TYPE_CHECKING else object):
     """
     This wrapper will 'filter' log messages and avoid
@@ -149,27 +247,20 @@ class _Logger(logging.Logger if typing.TYPE_CHECKING else object):
     # for example: LOGGER.error("This error will %s be logged again", "soon", timeout=5)
     # it can also be overriden at the 'Logger' instance level
     default_timeout = 60 * 60 * 8
-    # cache of logged messages with relative last-thrown-epoch
-    _LOGGER_TIMEOUTS = {}
     # cache of subclassing types: see getLogger
     _CLASS_HOOKS = {}
 
     def _log(self, level, msg, args, **kwargs):
         if "timeout" in kwargs:
-            timeout = kwargs.pop("timeout")
-            epoch = time()
-            trap_key = (msg, args)
-            if trap_key in _Logger._LOGGER_TIMEOUTS:
-                if (epoch - _Logger._LOGGER_TIMEOUTS[trap_key]) < timeout:
-                    if self.isEnabledFor(mlc.CONF_LOGGING_VERBOSE):
-                        super()._log(
-                            mlc.CONF_LOGGING_VERBOSE,
-                            f"dropped log message for {msg}",
-                            args,
-                            **kwargs,
-                        )
-                    return
-            _Logger._LOGGER_TIMEOUTS[trap_key] = epoch
+            if not LOG_THROTTLE.check((msg, args), kwargs.pop("timeout"), time()):
+                if self.isEnabledFor(mlc.CONF_LOGGING_VERBOSE):
+                    super()._log(
+                        mlc.CONF_LOGGING_VERBOSE,
+                        f"dropped log message for {msg}",
+                        args,
+                        **kwargs,
+                    )
+                return
 
         super()._log(level, msg, args, **kwargs)
 
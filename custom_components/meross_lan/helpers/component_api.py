@@ -1,5 +1,6 @@
 import asyncio
 import importlib
+from math import inf
 from time import time
 import typing
 import zoneinfo
@@ -11,8 +12,9 @@ from homeassistant.exceptions import (
     HomeAssistantError,
 )
 from homeassistant.helpers import device_registry as dr, entity_registry as er
+from homeassistant.util import slugify
 
-from . import ConfigEntryType
+from . import LOG_THROTTLE, ConfigEntryType
 from .. import const as mlc
 from ..merossclient import (
     MEROSSDEBUG,
@@ -20,7 +22,7 @@ from ..merossclient import (
     MerossDeviceDescriptor,
     json_loads,
 )
-from ..merossclient.httpclient import MerossHttpClient
+from ..merossclient.httpclient import HttpDispatcher, MerossHttpClient
 from ..merossclient.protocol import const as mc, namespaces as mn
 from ..merossclient.protocol.message import (
     MerossAckReply,
@@ -30,6 +32,9 @@ from ..merossclient.protocol.message import (
 from .device import Device
 from .manager import ConfigEntryManager
 from .mqtt_profile import MQTTConnection, MQTTProfile
+from .scheduler import PollingScheduler
+from .startup import StartupScheduler, StartupSensor
+from .statistics import StatisticsImporter
 
 if typing.TYPE_CHECKING:
 
@@ -120,13 +125,18 @@ class HAMQTTConnection(MQTTConnection):
     def get_rl_safe_delay(self, uuid: str):
         return 0.0
 
+    def get_rl_budget(self, uuid: str):
+        return inf
+
     async def _async_mqtt_publish(
         self,
         device_id: str,
         request: "MerossMessage",
     ):
         await mqtt_async_publish(
-            self.profile.hass, mc.TOPIC_REQUEST.format(device_id), request.json()
+            self.profile.hass,
+            mc.TOPIC_REQUEST.format(device_id),
+            request.json_bytes(),
         )
         self._mqtt_published()
 
@@ -150,8 +160,9 @@ class HAMQTTConnection(MQTTConnection):
             global mqtt_async_publish
             mqtt_async_publish = mqtt.async_publish
 
+            # encoding=None: we want the raw (bytes) payloads
             self._unsub_mqtt_subscribe = await mqtt.async_subscribe(
-                hass, mc.TOPIC_DISCOVERY, self.async_mqtt_message
+                hass, mc.TOPIC_DISCOVERY, self.async_mqtt_message, encoding=None
             )
 
             @callback
@@ -341,6 +352,12 @@ class ComponentApi(MQTTProfile):
 
         device_registry: Final[dr.DeviceRegistry]
         entity_registry: Final[er.EntityRegistry]
+        polling_scheduler: Final[PollingScheduler]
+        """shared scheduler for the polling cycles of all of the devices"""
+        startup_scheduler: Final[StartupScheduler]
+        """admission (in waves) of the devices first polling cycle"""
+        statistics_importer: Final[StatisticsImporter]
+        """background importer of the devices energy history into HA statistics"""
 
         _mqtt_connection: HAMQTTConnection | None
 
@@ -353,11 +370,15 @@ class ComponentApi(MQTTProfile):
         "managers_transient_state",
         "device_registry",
         "entity_registry",
+        "polling_scheduler",
+        "startup_scheduler",
+        "statistics_importer",
         "_mqtt_connection",
         "_deviceclasses",
         "_zoneinfo",
         "_import_module_lock",
         "_import_module_cache",
+        "_import_module_prewarmed",
     )
 
     @staticmethod
@@ -405,11 +426,15 @@ class ComponentApi(MQTTProfile):
         self.managers_transient_state = {}
         self.device_registry = dr.async_get(hass)
         self.entity_registry = er.async_get(hass)
+        self.polling_scheduler = PollingScheduler(hass.loop)
+        self.startup_scheduler = StartupScheduler(self)
+        self.statistics_importer = StatisticsImporter(self)
         self._mqtt_connection = None
         self._deviceclasses = {}
         self._zoneinfo = {}
         self._import_module_lock = asyncio.Lock()
         self._import_module_cache = {}
+        self._import_module_prewarmed = False
         for config_entry in hass.config_entries.async_entries(mlc.DOMAIN):
             match ConfigEntryType.get_type_and_id(config_entry.unique_id):
                 case (ConfigEntryType.DEVICE, device_id):
@@ -510,7 +535,9 @@ class ComponentApi(MQTTProfile):
                                 key or self.key,
                                 logger=self,
                                 log_level_dump=self.VERBOSE,
-                            ).async_request_raw(request.json())
+                            ).async_request_raw(
+                                request.json_bytes(), HttpDispatcher.PRIORITY_COMMAND
+                            )
                             or {}
                         )
                     except Exception as exception:
@@ -533,6 +560,12 @@ class ComponentApi(MQTTProfile):
         return
 
     # interface: ConfigEntryManager
+    async def async_setup_entry(
+        self, hass: "HomeAssistant", config_entry: "ConfigEntry"
+    ):
+        StartupSensor(self)
+        await super().async_setup_entry(hass, config_entry)
+
     async def async_shutdown(self):
         # This is the base entry point when the config entry (MQTT Hub) is unloaded
         # but we want to actually preserve some of our state since ComponentApi provides
@@ -547,6 +580,15 @@ class ComponentApi(MQTTProfile):
     def get_logger_name(self) -> str:
         return "api"
 
+    def loggable_diagnostic_state(self):
+        return {
+            "polling_scheduler": self.polling_scheduler.get_diagnostic_state(),
+            "startup_scheduler": self.startup_scheduler.get_diagnostic_state(),
+            "statistics_importer": self.statistics_importer.get_diagnostic_state(),
+            "http_dispatcher": MerossHttpClient.DISPATCHER.get_diagnostic_state(),
+            "log_throttle": LOG_THROTTLE.get_diagnostic_state(),
+        }
+
     # interface: ApiProfile
     @property
     def allow_mqtt_publish(self):
@@ -569,6 +611,9 @@ class ComponentApi(MQTTProfile):
             await device.async_shutdown()
         for profile in self.active_profiles():
             await profile.async_shutdown()
+        self.polling_scheduler.shutdown()
+        self.startup_scheduler.shutdown()
+        self.statistics_importer.shutdown()
         await super().async_shutdown()
         await MerossHttpClient.async_shutdown_session()
         self._mqtt_connection = None
@@ -677,6 +722,61 @@ class ComponentApi(MQTTProfile):
                     self._import_module_cache[name] = module
                     return module
 
+    async def async_prewarm_modules(self):
+        """
+        Imports (in a single executor job) the modules needed by all of the configured
+        devices so that their initialization doesn't serialize many (small)
+        executor jobs behind the import lock. This is only done once (at startup):
+        modules failing here will be imported (and errors reported) on demand.
+        """
+        if self._import_module_prewarmed:
+            return
+        self._import_module_prewarmed = True
+        names = set()
+        for config_entry in self.hass.config_entries.async_entries(mlc.DOMAIN):
+            if config_entry.disabled_by or (
+                ConfigEntryType.get_type_and_id(config_entry.unique_id)[0]
+                is not ConfigEntryType.DEVICE
+            ):
+                continue
+            try:
+                descriptor = MerossDeviceDescriptor(config_entry.data[mlc.CONF_PAYLOAD])
+            except Exception:
+                continue
+            for key_digest in descriptor.digest or descriptor.control:
+                init = MIXIN_DIGEST_INIT.get(key_digest)
+                if isinstance(init, tuple):
+                    names.add(init[0])
+                init = Device.DIGEST_INIT.get(
+                    key_digest, f".devices.{slugify(key_digest)}"
+                )
+                if isinstance(init, str):
+                    names.add(init)
+            for namespace in descriptor.ability:
+                init = Device.NAMESPACE_INIT.get(namespace)
+                if isinstance(init, tuple):
+                    names.add(init[0])
+        names.difference_update(self._import_module_cache)
+        if not names:
+            return
+
+        def _import_modules():
+            modules = {}
+            for name in names:
+                try:
+                    modules[name] = importlib.import_module(
+                        name, "custom_components.meross_lan"
+                    )
+                except Exception:
+                    pass
+            return modules
+
+        async with self._import_module_lock:
+            with self.exception_warning("prewarming modules"):
+                self._import_module_cache.update(
+                    await self.hass.async_add_executor_job(_import_modules)
+                )
+
     def get_config_entry(self, unique_id: str):
         """Gets the configured entry if it exists."""
         try:
@@ -0,0 +1,159 @@
+"""
+Indexed history of the energy consumption samples reported by the devices
+(Appliance.Control.ConsumptionX and the likes).
+"""
+
+import bisect
+from typing import TYPE_CHECKING
+
+from ..merossclient.protocol import const as mc
+
+if TYPE_CHECKING:
+    from typing import Final
+
+
+class ConsumptionHistory:
+    """
+    Time indexed (epoch -> value) samples merged from the device payloads which
+    typically carry a rolling window of samples (a month of daily totals for
+    ConsumptionX). Samples are identified by 'key_index' (the day 'date' for
+    ConsumptionX) since the sample time of the current period keeps moving forward
+    as the device updates it. Payloads are not expected to be sorted (the devices
+    report a ring buffer) so every update compares the payload content against the
+    previous one and only merges the changed samples (nothing at all when polling
+    an idle device).
+    'times' is kept sorted so that the latest samples are at the end. 'version'
+    is incremented on every actual change so that consumers (statistics) can
+    cheaply check for updates.
+    """
+
+    MAXSIZE: "Final" = 62
+    """Samples retained (older ones are discarded as newer ones come in)."""
+
+    __slots__ = (
+        "samples",
+        "times",
+        "indexes",
+        "version",
+        "key_time",
+        "key_value",
+        "key_index",
+        "_payload",
+    )
+
+    def __init__(
+        self,
+        key_time: str = mc.KEY_TIME,
+        key_value: str = mc.KEY_VALUE,
+        key_index: str = mc.KEY_DATE,
+    ):
+        self.samples: dict[int, int] = {}
+        self.times: list[int] = []
+        self.indexes: dict[object, int] = {}
+        """key_index -> sample time"""
+        self.version = 0
+        self.key_time = key_time
+        self.key_value = key_value
+        self.key_index = key_index
+        self._payload = None
+
+    def clear(self):
+        self.samples.clear()
+        self.times.clear()
+        self.indexes.clear()
+        self.version += 1
+        self._payload = None
+
+    def update(self, payload: list[dict], /):
+        """Merges the samples in payload. Returns True if anything changed."""
+        key_index = self.key_index
+        payload_last = self._payload
+        self._payload = payload
+        if payload == payload_last:
+            return False
+        if payload_last and (len(payload_last) == len(payload)):
+            # the ring buffer slots are stable across updates so that we
+            # only merge the changed ones. When a slot is reused for a
+            # new sample we're falling back to the full merge
+            p_changed = []
+            for p_sample, p_sample_last in zip(payload, payload_last):
+                if p_sample != p_sample_last:
+                    if p_sample[key_index] != p_sample_last[key_index]:
+                        p_changed = payload
+                        break
+                    p_changed.append(p_sample)
+            if not p_changed:
+                return False
+        else:
+            p_changed = payload
+
+        samples = self.samples
+        indexes = self.indexes
+        key_time = self.key_time
+        key_value = self.key_value
+        changed = False
+        for p_sample in p_changed:
+            sample_index = p_sample[key_index]
+            sample_time = p_sample[key_time]
+            sample_value = p_sample[key_value]
+            if (time_last := indexes.get(sample_index)) is None:
+                self._insert(sample_time)
+            elif time_last != sample_time:
+                # the (current) period sample has been updated
+                self._remove(time_last)
+                self._insert(sample_time)
+            elif samples[sample_time] == sample_value:
+                continue
+            indexes[sample_index] = sample_time
+            samples[sample_time] = sample_value
+            changed = True
+
+        if (p_changed is payload) and (len(indexes) > len(payload)):
+            # samples inside the payload window which are not reported anymore
+            payload_indexes = {p_sample[key_index] for p_sample in payload}
+            index_min = min(payload_indexes, default=None)
+            for sample_index in [
+                sample_index
+                for sample_index in indexes
+                if (sample_index >= index_min)  # type: ignore
+                and (sample_index not in payload_indexes)
+            ]:
+                self._remove(indexes.pop(sample_index))
+                changed = True
+
+        times = self.times
+        if len(times) > ConsumptionHistory.MAXSIZE:
+            times_discarded = set(times[: -ConsumptionHistory.MAXSIZE])
+            del times[: -ConsumptionHistory.MAXSIZE]
+            for sample_time in times_discarded:
+                del samples[sample_time]
+            for sample_index in [
+                sample_index
+                for sample_index, sample_time in indexes.items()
+                if sample_time in times_discarded
+            ]:
+                del indexes[sample_index]
+
+        if changed:
+            self.version += 1
+        return changed
+
+    def get_samples(self, time_start: float = 0, /):
+        """Returns the (sorted) list of (epoch, value) samples since time_start."""
+        samples = self.samples
+        return [
+            (sample_time, samples[sample_time])
+            for sample_time in self.times[bisect.bisect_left(self.times, time_start) :]
+        ]
+
+    def _insert(self, sample_time: int, /):
+        times = self.times
+        if (not times) or (sample_time > times[-1]):
+            times.append(sample_time)
+        else:
+            bisect.insort(times, sample_time)
+
+    def _remove(self, sample_time: int, /):
+        del self.samples[sample_time]
+        times = self.times
+        del times[bisect.bisect_left(times, sample_time)]
@@ -1,4 +1,5 @@
 import abc
+import asyncio
 import bisect
 from datetime import UTC, tzinfo
 from json import JSONDecodeError
@@ -14,7 +15,7 @@ from homeassistant.helpers import device_registry as dr
 from homeassistant.util import dt as dt_util, slugify
 import voluptuous as vol
 
-from . import datetime_from_epoch
+from . import clamp, datetime_from_epoch
 from .. import const as mlc
 from ..button import MLPersistentButton
 
@@ -27,18 +28,23 @@ from ..const import (
     CONF_PROTOCOL_MQTT,
     PARAM_HEADER_SIZE,
     PARAM_HEARTBEAT_PERIOD,
+    PARAM_MQTT_RL_BUDGET_RESERVE,
     PARAM_TIMESTAMP_TOLERANCE,
 )
-from ..helpers.obfuscate import obfuscated_dict
+from ..helpers.obfuscate import obfuscate_json, obfuscated_dict
 from ..merossclient import (
     HostAddress,
     get_active_broker,
     is_device_online,
-    json_dumps,
 )
-from ..merossclient.httpclient import MerossHttpClient, TerminatedException
+from ..merossclient.httpclient import (
+    HttpDispatcher,
+    MerossHttpClient,
+    TerminatedException,
+)
 from ..merossclient.protocol.message import (
     MerossRequest,
+    MerossRequestTemplate,
     MerossResponse,
     compute_message_encryption_key,
     compute_message_signature,
@@ -47,7 +53,10 @@ from ..merossclient.protocol.message import (
 from ..sensor import ProtocolSensor
 from ..update import MLUpdate
 from .manager import ConfigEntryManager, EntityManager
+from .mqtt_profile import MQTTWindow
 from .namespaces import NamespaceHandler, mc, mn
+from .response_size import ResponseSizeModel
+from .snapshot import DeviceSnapshotStore
 
 if TYPE_CHECKING:
     from asyncio import Future, TimerHandle
@@ -78,6 +87,7 @@ if TYPE_CHECKING:
         MerossPayloadType,
     )
     from .component_api import ComponentApi
+    from .scheduler import PollingHandle
     from .entity import MLEntity
     from .mqtt_profile import MQTTConnection, MQTTProfile
     from .namespaces import NamespaceParser
@@ -247,6 +257,8 @@ class Device(BaseDevice, ConfigEntryManager):
         they'll be cached in the dict.
         Namespace handlers will be initialized in the order as they appear in the dict
         and this could have consequences in the order of polls."""
+        SNAPSHOT_EXCLUDE: ClassVar[set[str]]
+        """ Namespaces whose payloads are not saved in the device snapshot."""
         TRACE_ABILITY_EXCLUDE: ClassVar[tuple[str, ...]]
         """ When tracing we enumerate appliance abilities to get insights on payload structures
         this list will be excluded from enumeration since it's redundant/exposing sensitive info
@@ -265,6 +277,7 @@ class Device(BaseDevice, ConfigEntryManager):
         curr_protocol: str
 
         device_timestamp: int
+        response_size: Final[ResponseSizeModel]
 
         _profile: MQTTProfile | None
         _mqtt_connection: MQTTConnection | None
@@ -273,6 +286,7 @@ class Device(BaseDevice, ConfigEntryManager):
         _mqtt_active: MQTTConnection | None
         _mqtt_lastrequest: float
         _mqtt_lastresponse: float
+        mqtt_window: Final[MQTTWindow]
         _http: MerossHttpClient | None
         _http_active: MerossHttpClient | None
         _http_lastrequest: float
@@ -283,13 +297,18 @@ class Device(BaseDevice, ConfigEntryManager):
         digest_pollers: set[NamespaceHandler]
         _lazypoll_requests: list[NamespaceHandler]
         _polling_epoch: float
-        _polling_callback_unsub: TimerHandle | None
+        _polling_callback_unsub: PollingHandle | None
         _polling_callback_shutdown: Future | None
         _queued_cloudpoll_requests: int
         multiple_max: int
+        _multiple_requests: list[
+            tuple[NamespaceHandler, MerossRequestTemplate, int, bool]
+        ]
         _timezone_next_check: float
         _trace_ability_callback_unsub: TimerHandle | None
         _diagnostics_build: bool
+        _snapshot_payloads: dict[str, MerossPayloadType] | None
+        """last GETACK payload for every namespace (only when warm start is enabled)"""
 
         # entities
         sensor_protocol: ProtocolSensor
@@ -315,6 +334,11 @@ class Device(BaseDevice, ConfigEntryManager):
 
     NAMESPACES = mn.NAMESPACES
 
+    SNAPSHOT_EXCLUDE = {
+        mn.Appliance_System_All.name,  # digest is saved on its own
+        mn.Appliance_Control_Multiple.name,
+    }
+
     DIGEST_INIT = {
         mc.KEY_FAN: ".fan",
         mc.KEY_LIGHT: ".light",
@@ -422,8 +446,7 @@ class Device(BaseDevice, ConfigEntryManager):
         "device_timedelta",
         "device_timedelta_log_epoch",
         "device_timedelta_config_epoch",
-        "device_response_size_min",
-        "device_response_size_max",
+        "response_size",
         "lastrequest",
         "lastresponse",
         "_topic_response",  # sets the "from" field in request messages
@@ -434,6 +457,7 @@ class Device(BaseDevice, ConfigEntryManager):
         "_mqtt_active",  # the broker receives valid traffic i.e. the device is 'mqtt' reachable
         "_mqtt_lastrequest",
         "_mqtt_lastresponse",
+        "mqtt_window",
         "_http",  # cached MerossHttpClient
         "_http_active",  # HTTP is 'online' i.e. reachable
         "_http_lastrequest",
@@ -449,10 +473,10 @@ class Device(BaseDevice, ConfigEntryManager):
         "_queued_cloudpoll_requests",
         "multiple_max",
         "_multiple_requests",
-        "_multiple_response_size",
         "_timezone_next_check",
         "_trace_ability_callback_unsub",
         "_diagnostics_build",
+        "_snapshot_payloads",
         "sensor_protocol",
         "update_firmware",
         # Hub slots
@@ -477,12 +501,13 @@ class Device(BaseDevice, ConfigEntryManager):
         self.device_timedelta = 0
         self.device_timedelta_log_epoch = 0
         self.device_timedelta_config_epoch = 0
-        self.device_response_size_min = 1000
-        self.device_response_size_max = (
+        self.response_size = ResponseSizeModel(
+            api.hass,
+            config_entry.data[mlc.CONF_DEVICE_ID],
             descriptor.ability.get(mn.Appliance_Control_Multiple.name, {}).get(
                 "maxCmdNum", 0
             )
-            * 800
+            * 800,
         )
         self.lastrequest = 0.0
         self.lastresponse = 0.0
@@ -493,6 +518,7 @@ class Device(BaseDevice, ConfigEntryManager):
         self._mqtt_publish = None
         self._mqtt_active = None
         self._mqtt_lastrequest = 0
+        self.mqtt_window = MQTTWindow(mlc.CONF_MQTT_WINDOW_DEFAULT)
         self._mqtt_lastresponse = 0
         self._http = None
         self._http_active = None
@@ -509,6 +535,7 @@ class Device(BaseDevice, ConfigEntryManager):
         self._polling_callback_shutdown = None
         self._queued_cloudpoll_requests = 0
         self.multiple_max = 0
+        self._multiple_requests = []
         self._timezone_next_check = (
             0
             if mn.Appliance_System_Time.name in descriptor.ability
@@ -516,6 +543,7 @@ class Device(BaseDevice, ConfigEntryManager):
         )
         self._trace_ability_callback_unsub = None
         self._diagnostics_build = False
+        self._snapshot_payloads = None
 
         super().__init__(
             config_entry.data[mlc.CONF_DEVICE_ID],
@@ -567,6 +595,9 @@ class Device(BaseDevice, ConfigEntryManager):
         api = self.api
         descriptor = self.descriptor
 
+        with self.exception_warning("loading response size model"):
+            await self.response_size.async_load()
+
         if tzname := descriptor.timezone:
             # self.tz defaults to UTC on init
             with self.exception_warning(
@@ -646,14 +677,16 @@ class Device(BaseDevice, ConfigEntryManager):
                 )
                 self.digest_handlers[key_digest] = Device.digest_parse_empty
 
+        if self._snapshot_payloads is not None:
+            with self.exception_warning("restoring device snapshot"):
+                await self._async_snapshot_restore()
+
     def start(self):
         # called by async_setup_entry after the entities have been registered
         # here we'll register mqtt listening (in case) and start polling after
         # the states have been eventually restored (some entities need this)
         self._check_protocol_ext()
-        self._polling_callback_unsub = self.schedule_async_callback(
-            0, self._async_polling_callback, None
-        )
+        self._polling_callback_unsub = self.api.polling_scheduler.schedule(self, 0)
 
     # interface: ConfigEntryManager
     async def entry_update_listener(
@@ -786,7 +819,11 @@ class Device(BaseDevice, ConfigEntryManager):
                     header[mc.KEY_METHOD],
                     header[mc.KEY_NAMESPACE],
                     header[mc.KEY_MESSAGEID],
-                    json_dumps(self.loggable_dict(message)),
+                    (
+                        obfuscate_json(message.json())
+                        if self.obfuscate
+                        else message.json()
+                    ),
                 ),
             )
         elif logger.isEnabledFor(self.DEBUG):
@@ -851,8 +888,9 @@ class Device(BaseDevice, ConfigEntryManager):
             "pref_protocol": self.pref_protocol,
             "curr_protocol": self.curr_protocol,
             "polling_period": self.polling_period,
-            "device_response_size_min": self.device_response_size_min,
-            "device_response_size_max": self.device_response_size_max,
+            "state_writes": self.state_writes,
+            "state_writes_suppressed": self.state_writes_suppressed,
+            "response_size": self.response_size.get_diagnostic_state(),
             "MQTT": {
                 "cloud_profile": (
                     self._profile.is_cloud_profile if self._profile else None
@@ -862,10 +900,12 @@ class Device(BaseDevice, ConfigEntryManager):
                 "mqtt_connected": bool(self._mqtt_connected),
                 "mqtt_publish": bool(self._mqtt_publish),
                 "mqtt_active": bool(self._mqtt_active),
+                "mqtt_window": self.mqtt_window.get_diagnostic_state(),
             },
             "HTTP": {
                 "http": bool(self._http),
                 "http_active": bool(self._http_active),
+                "http_stats": self._http.get_diagnostic_state() if self._http else None,
             },
             "namespace_handlers": {
                 handler.ns.name: {
@@ -912,7 +952,13 @@ class Device(BaseDevice, ConfigEntryManager):
             await self._http.async_terminate()
             self._http = None
 
+        self.api.startup_scheduler.discard(self)
         await self._async_polling_stop()
+        with self.exception_warning("saving response size model"):
+            await self.response_size.async_shutdown()
+        if (self._snapshot_payloads is not None) and self.online:
+            with self.exception_warning("saving device snapshot"):
+                await self._async_snapshot_save()
         await super().async_shutdown()
         self.namespace_handlers = None  # type: ignore
         self.digest_handlers = None  # type: ignore
@@ -972,12 +1018,23 @@ class Device(BaseDevice, ConfigEntryManager):
         current protocol. When switching transport the message is recomputed to
         avoid reusing the same (old) timestamps and messageids
         """
+        return await self.async_request_template(
+            MerossRequestTemplate(namespace, method, payload, mlc.DOMAIN)
+        )
+
+    async def async_request_template(
+        self, template: MerossRequestTemplate
+    ) -> MerossResponse | None:
+        """
+        Same as async_request but the messages for the different transports are
+        built out of a (pre-serialized) template (see NamespaceHandler.get_polling_template)
+        """
         self.lastrequest = time()
         mqttfailed = False
         if self.curr_protocol is CONF_PROTOCOL_MQTT:
             if self._mqtt_publish:
-                if response := await self.async_mqtt_request(
-                    namespace, method, payload
+                if response := await self.async_mqtt_request_raw(
+                    template.build(self.key, self._topic_response)
                 ):
                     return response
                 mqttfailed = True
@@ -986,7 +1043,9 @@ class Device(BaseDevice, ConfigEntryManager):
                 return None
 
         # curr_protocol is HTTP or mqtt failed somehow
-        if response := await self.async_http_request(namespace, method, payload):
+        if response := await self.async_http_request_raw(
+            template.build(self.key, self._topic_response)
+        ):
             return response
 
         if (
@@ -994,7 +1053,9 @@ class Device(BaseDevice, ConfigEntryManager):
             and self._mqtt_publish  # profile allows publishing
             and not mqttfailed  # we've already tried mqtt
         ):
-            return await self.async_mqtt_request(namespace, method, payload)
+            return await self.async_mqtt_request_raw(
+                template.build(self.key, self._topic_response)
+            )
 
         return None
 
@@ -1024,6 +1085,9 @@ class Device(BaseDevice, ConfigEntryManager):
         self.device_debug = None
         for handler in self.namespace_handlers.values():
             handler.polling_epoch_next = 0.0
+        # the next cycle might have been delayed (up to the heartbeat) while
+        # MQTT was pushing: bring it back so we start probing the device
+        self.polling_reschedule()
 
     def get_type(self) -> mlc.DeviceType:
         return mlc.DeviceType.DEVICE
@@ -1191,6 +1255,29 @@ class Device(BaseDevice, ConfigEntryManager):
                 )
             ] = bool
 
+        # the transactions window only applies when the device can publish
+        # over MQTT (either the local HA broker or a cloud profile)
+        if (
+            mqtt_connection := self._mqtt_connection
+        ) and mqtt_connection.profile.allow_mqtt_publish:
+            config_schema[
+                vol.Optional(
+                    mlc.CONF_MQTT_WINDOW,
+                    default=mlc.CONF_MQTT_WINDOW_DEFAULT,
+                    description={
+                        "suggested_value": self.config.get(mlc.CONF_MQTT_WINDOW)
+                    },
+                )
+            ] = vol.All(int, vol.Range(min=1, max=mlc.CONF_MQTT_WINDOW_MAX))
+
+        config_schema[
+            vol.Optional(
+                mlc.CONF_WARM_START,
+                default=False,
+                description={"suggested_value": self.config.get(mlc.CONF_WARM_START)},
+            )
+        ] = bool
+
         if mn.Appliance_System_Time.name in self.descriptor.ability:
             global TIMEZONES_SET
             if TIMEZONES_SET is None:
@@ -1278,17 +1365,14 @@ class Device(BaseDevice, ConfigEntryManager):
         return await self.async_request(*mn.Appliance_Control_Unbind.request_default)
 
     def disable_multiple(self):
+        # polls are still collected along the cycle but sent one by one
         self.multiple_max = 0
-        self._multiple_requests = None
-        self._multiple_response_size = 0
 
     def enable_multiple(self):
         if not self.multiple_max:
             self.multiple_max: int = self.descriptor.ability.get(
                 mn.Appliance_Control_Multiple.name, {}
             ).get("maxCmdNum", 0)
-            self._multiple_requests = []
-            self._multiple_response_size = PARAM_HEADER_SIZE
 
     async def async_multiple_requests_ack(
         self, requests: "Collection[MerossRequestType]", auto_handle: bool = True
@@ -1321,69 +1405,117 @@ class Device(BaseDevice, ConfigEntryManager):
         ):
             if auto_handle:
                 multiple_responses = multiple_response[mc.KEY_PAYLOAD][mc.KEY_MULTIPLE]
-                for message in multiple_responses:
-                    self._handle(
-                        message[mc.KEY_HEADER],
-                        message[mc.KEY_PAYLOAD],
-                    )
+                with self.state_batch():
+                    for message in multiple_responses:
+                        self._handle(
+                            message[mc.KEY_HEADER],
+                            message[mc.KEY_PAYLOAD],
+                        )
                 return multiple_responses
             return multiple_response[mc.KEY_PAYLOAD][mc.KEY_MULTIPLE]
 
     async def _async_multiple_requests_flush(self):
+        """Packs the polls collected along the polling cycle into the fewest
+        NS_MULTIPLE requests (first-fit-decreasing on the estimated response sizes).
+        Urgent polls (i.e. namespaces never polled or being reset) are packed first
+        while lazy pollers are only used to fill the space left in any batch."""
         assert self._multiple_requests
-        multiple_requests = self._multiple_requests
-        multiple_response_size = self._multiple_response_size
+        pending = self._multiple_requests
         self._multiple_requests = []
-        self._multiple_response_size = PARAM_HEADER_SIZE
+        pending.sort(key=lambda item: (not item[3], -item[2]))
+
+        response_size = self.response_size
+        lazypoll_requests = self._lazypoll_requests
+        # on MQTT responses are matched by messageId so that we can send
+        # the batches without waiting for each reply (see MQTTWindow)
+        pipelined = (
+            []
+            if (self.curr_protocol is CONF_PROTOCOL_MQTT)
+            and (self.mqtt_window.size_max > 1)
+            else None
+        )
+        while self.online and pending:
+            # the limit might have been updated by the previous batch
+            response_size_max = response_size.size_max(self.curr_protocol)
+            multiple_max = self.multiple_max
+            multiple_requests = []
+            multiple_response_size = PARAM_HEADER_SIZE
+            pending_next = []
+            for item in pending:
+                # the first item always goes in: if it's too big
+                # it will be sent alone as a plain request
+                if (not multiple_requests) or (
+                    (len(multiple_requests) < multiple_max)
+                    and ((multiple_response_size + item[2]) <= response_size_max)
+                ):
+                    multiple_requests.append(item[:2])
+                    multiple_response_size += item[2]
+                else:
+                    pending_next.append(item)
+            pending = pending_next
+            # lazy pollers are ordered by 'oldest polled first' so
+            # the first is the one which hasn't been polled since longer
+            # we then decide to add to the current ns_multiple the ones that would fit in
+            for handler in list(lazypoll_requests):
+                if len(multiple_requests) >= multiple_max:
+                    break
+                handler_response_size = response_size.estimate(handler)
+                if (handler_response_size + multiple_response_size) < response_size_max:
+                    handler.lastrequest = self._polling_epoch
+                    handler.polling_epoch_next = (
+                        handler.lastrequest + handler.polling_period
+                    )
+                    multiple_requests.append((handler, handler.get_polling_template()))
+                    lazypoll_requests.remove(handler)
+                    multiple_response_size += handler_response_size
+
+            if pipelined is None:
+                await self._async_multiple_requests_send(
+                    multiple_requests, multiple_response_size
+                )
+            else:
+                pipelined.append(
+                    self._async_multiple_requests_send(
+                        multiple_requests, multiple_response_size
+                    )
+                )
+
+        if pipelined:
+            # the batches are independent: one failing shouldn't
+            # abandon (or cancel) the others
+            for result in await asyncio.gather(*pipelined, return_exceptions=True):
+                if isinstance(result, Exception):
+                    self.log_exception(
+                        self.WARNING,
+                        result,
+                        "sending pipelined Appliance.Control.Multiple",
+                        timeout=14400,
+                    )
 
+    async def _async_multiple_requests_send(
+        self,
+        multiple_requests: "list[tuple[NamespaceHandler, MerossRequestTemplate]]",
+        multiple_response_size: int,
+    ):
+        """Polls the handlers in a single NS_MULTIPLE request. The (inner) requests
+        are packed out of the (pre-serialized) polling templates captured when the
+        polls were queued since chunked handlers (hubs) rebuild their template
+        for every chunk."""
+        response_size = self.response_size
         requests_len = len(multiple_requests)
         while self.online and requests_len:
-            lazypoll_requests = self._lazypoll_requests
-            while (requests_len < self.multiple_max) and lazypoll_requests:
-                # we have space available in current ns_multiple and lazy pollers are waiting
-                for handler in lazypoll_requests:
-                    # lazy pollers are ordered by 'oldest polled first' so
-                    # the first is the one which hasn't been polled since longer
-                    # we then decide to add to the current ns_multiple the first that would fit in
-                    if (
-                        handler.polling_response_size + multiple_response_size
-                    ) < self.device_response_size_max:
-                        handler.lastrequest = self._polling_epoch
-                        handler.polling_epoch_next = (
-                            handler.lastrequest + handler.polling_period
-                        )
-                        multiple_requests.append(handler.polling_request)
-                        lazypoll_requests.remove(handler)
-                        multiple_response_size += handler.polling_response_size
-                        requests_len += 1
-                        # check if we can add more
-                        break  # for
-                else:
-                    # no lazy_poller could match..break out of while
-                    break  # while
-
             if requests_len == 1:
-                await self.async_request(*multiple_requests[0])
+                await self.async_request_template(multiple_requests[0][1])
                 return
 
-            if not (
-                response := await self.async_request_ack(
-                    mn.Appliance_Control_Multiple.name,
-                    mc.METHOD_SET,
-                    {
-                        mn.Appliance_Control_Multiple.key: [
-                            {
-                                mc.KEY_HEADER: {
-                                    mc.KEY_MESSAGEID: uuid4().hex,
-                                    mc.KEY_METHOD: request[1],
-                                    mc.KEY_NAMESPACE: request[0],
-                                },
-                                mc.KEY_PAYLOAD: request[2],
-                            }
-                            for request in multiple_requests
-                        ]
-                    },
+            response = await self.async_request_template(
+                MerossRequestTemplate.multiple(
+                    [item[1] for item in multiple_requests],
+                    mlc.DOMAIN,
                 )
+            )
+            if (not response) or (
+                response[mc.KEY_HEADER][mc.KEY_METHOD] == mc.METHOD_ERROR
             ):
                 # the ns_multiple failed but the reason could be the device
                 # did overflow somehow. I've seen 2 kind of errors so far on the
@@ -1401,19 +1533,15 @@ class Device(BaseDevice, ConfigEntryManager):
                         requests_len,
                         multiple_response_size,
                     )
-                    # Here we reduce the device_response_size_max so that
-                    # next ns_multiple will be less demanding. device_response_size_min
-                    # is another dynamic param representing the biggest payload ever received
-                    self.device_response_size_max = (
-                        self.device_response_size_max + self.device_response_size_min
-                    ) / 2
+                    # Here we reduce the (learned) response size limit so that
+                    # next ns_multiple will be less demanding.
                     self.log(
                         self.DEBUG,
-                        "Updating device_response_size_max:%d",
-                        self.device_response_size_max,
+                        "Updating response size limits (size_min:%d size_max:%d)",
+                        *response_size.update_failed(self.curr_protocol),
                     )
-                    for request in multiple_requests:
-                        await self.async_request(*request)
+                    for item in multiple_requests:
+                        await self.async_request_template(item[1])
                         if not self.online:
                             break
                 return
@@ -1427,32 +1555,37 @@ class Device(BaseDevice, ConfigEntryManager):
                     requests_len,
                     responses_len,
                     multiple_response_size,
-                    len(response.json()),
+                    len(response.json_bytes()),
                 )
             message: "MerossMessageType"
             if responses_len == requests_len:
                 # faster shortcut
-                for message in multiple_responses:
-                    self._handle(
-                        message[mc.KEY_HEADER],
-                        message[mc.KEY_PAYLOAD],
-                    )
+                response_size.update_multiple(
+                    multiple_requests, len(response.json_bytes())
+                )
+                with self.state_batch():
+                    for message in multiple_responses:
+                        self._handle(
+                            message[mc.KEY_HEADER],
+                            message[mc.KEY_PAYLOAD],
+                        )
                 return
             elif responses_len:
                 # the requests payload was too big and the response was
                 # truncated. the http client tried to 'recover' by discarding
                 # the incomplete payloads so we'll check what's missing
-                for message in multiple_responses:
-                    m_header = message[mc.KEY_HEADER]
-                    self._handle(
-                        m_header,
-                        message[mc.KEY_PAYLOAD],
-                    )
-                    namespace = m_header[mc.KEY_NAMESPACE]
-                    for request in multiple_requests:
-                        if request[0] == namespace:
-                            multiple_requests.remove(request)
-                            break
+                with self.state_batch():
+                    for message in multiple_responses:
+                        m_header = message[mc.KEY_HEADER]
+                        self._handle(
+                            m_header,
+                            message[mc.KEY_PAYLOAD],
+                        )
+                        namespace = m_header[mc.KEY_NAMESPACE]
+                        for item in multiple_requests:
+                            if item[0].ns.name == namespace:
+                                multiple_requests.remove(item)
+                                break
                 # and re-issue the missing ones
                 requests_len = len(multiple_requests)
                 multiple_response_size = -1  # logging purpose
@@ -1467,8 +1600,8 @@ class Device(BaseDevice, ConfigEntryManager):
                     multiple_response_size,
                     timeout=14400,
                 )
-                for request in multiple_requests:
-                    await self.async_request(*request)
+                for item in multiple_requests:
+                    await self.async_request_template(item[1])
                     if not self.online:
                         break
                 return
@@ -1540,7 +1673,14 @@ class Device(BaseDevice, ConfigEntryManager):
             ConfigEntryManager.TRACE_TX,
         )
         try:
-            response = await http.async_request_raw(request.json())
+            if request.method == mc.METHOD_GET:
+                response = await http.async_request_raw(
+                    request.json_bytes(), HttpDispatcher.PRIORITY_POLL, True
+                )
+            else:
+                response = await http.async_request_raw(
+                    request.json_bytes(), HttpDispatcher.PRIORITY_COMMAND
+                )
         except TerminatedException:
             return None
         except JSONDecodeError as jsonerror:
@@ -1561,14 +1701,12 @@ class Device(BaseDevice, ConfigEntryManager):
                 # if the error is too early in the payload...
                 return None
             # the error happened because of truncated json payload
-            self.device_response_size_max = response_text_len_safe
-            if self.device_response_size_min > response_text_len_safe:
-                self.device_response_size_min = response_text_len_safe
             self.log(
                 self.DEBUG,
-                "Updating device_response_size_min:%d device_response_size_max:%d",
-                self.device_response_size_min,
-                self.device_response_size_max,
+                "Updating response size limits (size_min:%d size_max:%d)",
+                *self.response_size.update_truncated(
+                    CONF_PROTOCOL_HTTP, len(response_text)
+                ),
             )
             if request.namespace is not mn.Appliance_Control_Multiple.name:
                 return None
@@ -1628,7 +1766,7 @@ class Device(BaseDevice, ConfigEntryManager):
         if self.curr_protocol is not CONF_PROTOCOL_HTTP:
             if (self.pref_protocol is CONF_PROTOCOL_HTTP) or (not self._mqtt_active):
                 self._switch_protocol(CONF_PROTOCOL_HTTP)
-        self._receive(epoch, response)
+        self._receive(epoch, response, CONF_PROTOCOL_HTTP)
         return response
 
     async def async_http_request(
@@ -1644,35 +1782,22 @@ class Device(BaseDevice, ConfigEntryManager):
         )
 
     async def async_request_poll(self, handler: NamespaceHandler):
+        # a namespace never polled (or reset) is 'urgent' and will be packed first
+        urgent = not handler.polling_epoch_next
         handler.lastrequest = self._polling_epoch
         handler.polling_epoch_next = handler.lastrequest + handler.polling_period
-        if (self._multiple_requests is None) or (
-            handler.polling_response_size >= self.device_response_size_max
-        ):
-            # multiple requests are disabled
-            # or this request alone would overflow the device response size limit
-            await self.async_request(*handler.polling_request)
-            return
-        # estimate the size of the multiple response
-        multiple_response_size = (
-            self._multiple_response_size + handler.polling_response_size
-        )
-        if multiple_response_size > self.device_response_size_max:
-            # this request (together with already previously packed)
-            # would overflow the device response size limit
-            if not self._multiple_requests:
-                # again this request alone would overflow the device response size limit
-                await self.async_request(*handler.polling_request)
-                return
-            # flush the pending multiple requests
-            await self._async_multiple_requests_flush()
-            multiple_response_size = (
-                self._multiple_response_size + handler.polling_response_size
+        # just collect the request: these will be packed together at the end
+        # of the polling cycle (see _async_multiple_requests_flush)
+        # the template is captured now since chunked handlers (see hub) will
+        # rebuild it for the next chunk before the flush
+        self._multiple_requests.append(
+            (
+                handler,
+                handler.get_polling_template(),
+                self.response_size.estimate(handler),
+                urgent,
             )
-        self._multiple_requests.append(handler.polling_request)
-        self._multiple_response_size = multiple_response_size
-        if len(self._multiple_requests) >= self.multiple_max:
-            await self._async_multiple_requests_flush()
+        )
 
     async def async_request_smartpoll(
         self,
@@ -1680,17 +1805,27 @@ class Device(BaseDevice, ConfigEntryManager):
         *,
         cloud_queue_max: int = 1,
     ):
-        if (
-            (self.curr_protocol is CONF_PROTOCOL_MQTT)
-            and (self._queued_cloudpoll_requests >= cloud_queue_max)
-            and (
+        if (self.curr_protocol is CONF_PROTOCOL_MQTT) and (
+            mqtt_publish := self._mqtt_publish
+        ):
+            if (
+                (self._queued_cloudpoll_requests >= cloud_queue_max)
+                or (
+                    mqtt_publish.get_rl_budget(self.id)
+                    < (self._queued_cloudpoll_requests + PARAM_MQTT_RL_BUDGET_RESERVE)
+                )
+            ) and (
                 (self._polling_epoch - handler.lastrequest)
                 < handler.polling_period_cloud
-            )
-        ):
-            # the request would go over cloud mqtt but we've already queued some
-            # and we could wait up to handler.polling_period_cloud
-            return False
+            ):
+                # the request would go over cloud mqtt but we've already queued some
+                # (or the rate-limiter budget is running low)
+                # and we could wait up to handler.polling_period_cloud
+                return False
+            if mqtt_publish.is_cloud_connection:
+                # polls are sent at the end of the cycle (see async_request_poll)
+                # so we account for them here
+                self._queued_cloudpoll_requests += 1
         await self.async_request_poll(handler)
         return True
 
@@ -1843,25 +1978,26 @@ class Device(BaseDevice, ConfigEntryManager):
 
             else:  # offline or 'likely' offline (failed last request)
                 ns_all_handler = self.namespace_handlers[mn.Appliance_System_All.name]
+                ns_all_template = ns_all_handler.get_polling_template()
                 ns_all_response = None
                 if self.conf_protocol is CONF_PROTOCOL_AUTO:
                     if self._http:
-                        ns_all_response = await self.async_http_request(
-                            *ns_all_handler.polling_request
+                        ns_all_response = await self.async_http_request_raw(
+                            ns_all_template.build(self.key, self._topic_response)
                         )
                     if self._mqtt_publish and not self.online:
-                        ns_all_response = await self.async_mqtt_request(
-                            *ns_all_handler.polling_request
+                        ns_all_response = await self.async_mqtt_request_raw(
+                            ns_all_template.build(self.key, self._topic_response)
                         )
                 elif self.conf_protocol is CONF_PROTOCOL_MQTT:
                     if self._mqtt_publish:
-                        ns_all_response = await self.async_mqtt_request(
-                            *ns_all_handler.polling_request
+                        ns_all_response = await self.async_mqtt_request_raw(
+                            ns_all_template.build(self.key, self._topic_response)
                         )
                 else:  # self.conf_protocol is CONF_PROTOCOL_HTTP:
                     if self._http:
-                        ns_all_response = await self.async_http_request(
-                            *ns_all_handler.polling_request
+                        ns_all_response = await self.async_http_request_raw(
+                            ns_all_template.build(self.key, self._topic_response)
                         )
 
                 if ns_all_response:
@@ -1884,11 +2020,68 @@ class Device(BaseDevice, ConfigEntryManager):
                 self._polling_callback_shutdown.set_result(True)
                 self._polling_callback_shutdown = None
             else:
-                self._polling_callback_unsub = self.schedule_async_callback(
-                    self._polling_delay, self._async_polling_callback, None
+                self._polling_callback_unsub = self.api.polling_scheduler.schedule(
+                    self, self._get_polling_delay(epoch)
                 )
             self.log(self.DEBUG, "Polling end")
 
+    def _get_polling_delay(self, epoch: float):
+        """
+        Returns the delay before the next polling cycle. When the device state is
+        PUSHed over MQTT, most of the handlers don't need to be polled at every cycle
+        so we'll skip waking up until the first of them (or any heartbeat) is due.
+        """
+        if not (
+            self.online
+            and self._mqtt_active
+            and (self.lastresponse > self.lastrequest)
+            and not self._diagnostics_build
+        ):
+            return self._polling_delay
+        if self.mqtt_locallyactive:
+            epoch_next = min(
+                self._mqtt_lastresponse + PARAM_HEARTBEAT_PERIOD,
+                self._timezone_next_check,
+            )
+        else:
+            epoch_next = epoch + PARAM_HEARTBEAT_PERIOD
+        if (self.curr_protocol is CONF_PROTOCOL_MQTT) and (
+            self.pref_protocol is CONF_PROTOCOL_HTTP
+        ):
+            epoch_next = min(
+                epoch_next, self._http_lastrequest + PARAM_HEARTBEAT_PERIOD
+            )
+        polling_strategy_pushed = NamespaceHandler.POLLING_STRATEGY_PUSHED
+        polling_strategy_timed = NamespaceHandler.POLLING_STRATEGY_TIMED
+        for handler in self.namespace_handlers.values():
+            if polling_strategy := handler.polling_strategy:
+                if polling_strategy in polling_strategy_pushed:
+                    if handler.polling_epoch_next:
+                        continue
+                elif (polling_strategy in polling_strategy_timed) or (
+                    handler.POLLING_TIMED
+                ):
+                    if handler.polling_epoch_next < epoch_next:
+                        epoch_next = handler.polling_epoch_next
+                    continue
+                # this handler needs to be polled at every cycle
+                return self._polling_delay
+        return clamp(epoch_next - time(), self._polling_delay, PARAM_HEARTBEAT_PERIOD)
+
+    def polling_reschedule(self):
+        """
+        Called when any handler.polling_epoch_next has been reset so that
+        the polling cycle (if idling) is brought back to the regular pace.
+        """
+        if (polling_callback_unsub := self._polling_callback_unsub) and (
+            polling_callback_unsub.when()
+            > (self.hass.loop.time() + self._polling_delay)
+        ):
+            polling_callback_unsub.cancel()
+            self._polling_callback_unsub = self.api.polling_scheduler.schedule(
+                self, self._polling_delay
+            )
+
     async def _async_polling_stop(self):
         """Ensure we're not polling nor any schedule is in place."""
         if self._polling_callback_unsub:
@@ -1910,6 +2103,103 @@ class Device(BaseDevice, ConfigEntryManager):
             # this will also restart/schedule the cycle
             await self._async_polling_callback(None)
 
+    async def _async_snapshot_save(self):
+        """Saves the last known device state so that it can be restored
+        (see _async_snapshot_restore) when the device is loaded again."""
+        snapshot_payloads = self._snapshot_payloads
+        assert snapshot_payloads is not None
+        namespace_handlers = self.namespace_handlers
+        namespaces = {
+            namespace: payload
+            for namespace, payload in snapshot_payloads.items()
+            if (namespace in namespace_handlers)
+            and (namespace not in Device.SNAPSHOT_EXCLUDE)
+        }
+        ns_all = mn.Appliance_System_All.name
+        await DeviceSnapshotStore(self.hass, self.id).async_save(
+            {
+                "epoch": self.lastresponse,
+                "device_timestamp": self.device_timestamp,
+                "digest": self.descriptor.digest,
+                "namespaces": namespaces,
+                "polling": {
+                    namespace: handler.polling_epoch_next
+                    for namespace, handler in namespace_handlers.items()
+                    if handler.polling_epoch_next
+                    and ((namespace in namespaces) or (namespace == ns_all))
+                },
+            }
+        )
+
+    async def _async_snapshot_restore(self):
+        """Called at the end of async_init (entities are not yet added to HA) to
+        replay the state saved at shutdown. If fresh enough, the device is onlined
+        so that the entities are immediately available while the restored polling
+        schedule lets the polling cycle skip the namespaces which are not yet due.
+        The first polling cycle still queries the digest (or NS_ALL) so that an
+        unreachable device will be detected and offlined as usual."""
+        snapshot = await DeviceSnapshotStore(self.hass, self.id).async_load()
+        if not snapshot:
+            return
+        epoch = snapshot["epoch"]
+        if (time() - epoch) > mlc.PARAM_SNAPSHOT_TIMEOUT:
+            self.log(self.DEBUG, "Discarding stale device snapshot")
+            return
+        self.lastresponse = epoch
+        self.device_timestamp = snapshot["device_timestamp"]
+        digest_handlers = self.digest_handlers
+        for key_digest, _digest in snapshot["digest"].items():
+            if digest_parse := digest_handlers.get(key_digest):
+                digest_parse(_digest)
+        namespace_handlers = self.namespace_handlers
+        for namespace, payload in snapshot["namespaces"].items():
+            if handler := namespace_handlers.get(namespace):
+                try:
+                    handler.handler(
+                        {
+                            mc.KEY_NAMESPACE: namespace,
+                            mc.KEY_METHOD: mc.METHOD_GETACK,
+                            mc.KEY_TIMESTAMP: self.device_timestamp,
+                        },  # type: ignore
+                        payload,
+                    )
+                except Exception as exception:
+                    handler.handle_exception(exception, "snapshot", payload)
+        for namespace, polling_epoch_next in snapshot["polling"].items():
+            if handler := namespace_handlers.get(namespace):
+                handler.lastrequest = handler.lastresponse = epoch
+                handler.polling_epoch_next = polling_epoch_next
+        self._set_online()
+        self.log(self.DEBUG, "Restored device snapshot")
+
+    def _snapshot_update(self, namespace: str, payload: "MerossPayloadType", /):
+        """Stores the GETACK payload for the snapshot. Per-channel namespaces could be
+        polled in chunks (hubs) or replied for a subset of the channels so that the
+        channel payloads are merged with the ones already stored for the namespace."""
+        snapshot_payloads = self._snapshot_payloads
+        assert snapshot_payloads is not None
+        if (snapshot_payload := snapshot_payloads.get(namespace)) and (
+            handler := self.namespace_handlers.get(namespace)
+        ):
+            ns = handler.ns
+            key_namespace = ns.key
+            p_channels = payload.get(key_namespace)
+            p_snapshot_channels = snapshot_payload.get(key_namespace)
+            if isinstance(p_channels, list) and isinstance(p_snapshot_channels, list):
+                key_channel = ns.key_channel
+                try:
+                    channels = {
+                        p_channel[key_channel]: p_channel
+                        for p_channel in p_snapshot_channels
+                    }
+                    for p_channel in p_channels:
+                        channels[p_channel[key_channel]] = p_channel
+                    payload = payload | {key_namespace: list(channels.values())}
+                except (KeyError, TypeError):
+                    # not a 'per channel' list: just keep the latest
+                    pass
+        snapshot_payloads[namespace] = payload
+
     def mqtt_receive(self, message: "MerossResponse"):
         assert self._mqtt_connected
         self._mqtt_lastresponse = epoch = time()
@@ -1921,7 +2211,7 @@ class Device(BaseDevice, ConfigEntryManager):
         if self.curr_protocol is not CONF_PROTOCOL_MQTT:
             if (self.pref_protocol is CONF_PROTOCOL_MQTT) or (not self._http_active):
                 self._switch_protocol(CONF_PROTOCOL_MQTT)
-        self._receive(epoch, message)
+        self._receive(epoch, message, CONF_PROTOCOL_MQTT)
 
     def mqtt_attached(self, mqtt_connection: "MQTTConnection"):
         assert self.conf_protocol is not CONF_PROTOCOL_HTTP
@@ -1962,8 +2252,8 @@ class Device(BaseDevice, ConfigEntryManager):
             if not self.online and self._polling_callback_unsub:
                 # reschedule immediately
                 self._polling_callback_unsub.cancel()
-                self._polling_callback_unsub = self.schedule_async_callback(
-                    0, self._async_polling_callback, None
+                self._polling_callback_unsub = self.api.polling_scheduler.schedule(
+                    self, 0
                 )
         elif self.conf_protocol is CONF_PROTOCOL_MQTT:
             self.log(
@@ -1985,11 +2275,15 @@ class Device(BaseDevice, ConfigEntryManager):
         if self.curr_protocol is CONF_PROTOCOL_MQTT:
             if self.conf_protocol is CONF_PROTOCOL_AUTO:
                 self._switch_protocol(CONF_PROTOCOL_HTTP)
+                # the next cycle might have been delayed (up to the heartbeat)
+                # while MQTT was pushing: bring it back to fallback on HTTP
+                self.polling_reschedule()
                 return
             # conf_protocol should be CONF_PROTOCOL_MQTT:
             elif self.online:
                 self._set_offline()
                 return
+        self.polling_reschedule()
         # run this at the end so it will not double flush
         self.sensor_protocol.update_attrs_inactive(
             ProtocolSensor.ATTR_MQTT_BROKER, ProtocolSensor.ATTR_MQTT
@@ -2073,18 +2367,27 @@ class Device(BaseDevice, ConfigEntryManager):
             if _profile:
                 _profile.attach_mqtt(self)
 
-    def _receive(self, epoch: float, message: MerossResponse):
+    def _receive(self, epoch: float, message: MerossResponse, protocol: str):
         """
         default (received) message handling entry point
         """
         self.lastresponse = epoch
-        message_size = len(message.json())
-        if message_size > self.device_response_size_min:
-            self.device_response_size_min = message_size
-            if message_size > self.device_response_size_max:
-                self.device_response_size_max = message_size
+        message_size = len(message.json_bytes())
+        self.response_size.update_received(protocol, message_size)
 
         header = message[mc.KEY_HEADER]
+        if (header[mc.KEY_METHOD] == mc.METHOD_GETACK) and (
+            (namespace := header[mc.KEY_NAMESPACE])
+            != mn.Appliance_Control_Multiple.name
+        ):
+            self.response_size.update(
+                (
+                    handler.get_response_size_key(message[mc.KEY_PAYLOAD])
+                    if (handler := self.namespace_handlers.get(namespace))
+                    else namespace
+                ),
+                message_size,
+            )
         # we'll use the device timestamp to 'align' our time to the device one
         # this is useful for metered plugs reporting timestamped energy consumption
         # and we want to 'translate' this timings in our (local) time.
@@ -2108,32 +2411,32 @@ class Device(BaseDevice, ConfigEntryManager):
         if self.isEnabledFor(self.DEBUG):
             # it appears sometimes the devices
             # send an incorrect signature hash
-            # but at the moment this is unlikely to be critical
-            sign = compute_message_signature(
-                header[mc.KEY_MESSAGEID], self.key, header[mc.KEY_TIMESTAMP]
-            )
-            if sign != header[mc.KEY_SIGN]:
+            # but at the moment this is unlikely to be critical.
+            # The cloud MQTT client might have already checked it (off-loop)
+            # against the profile key: we'll re-check against ours if that failed
+            if not (message.sign_ok or message.check_sign(self.key)):
                 self.log(
                     self.DEBUG,
                     "Received signature error: computed=%s, header=%s",
-                    sign,
+                    compute_message_signature(
+                        header[mc.KEY_MESSAGEID], self.key, header[mc.KEY_TIMESTAMP]
+                    ),
                     str(self.loggable_dict(header)),
                 )
 
-        if not self.online:
-            self._set_online()
-            self._polling_delay = self.polling_period
-            # retrigger the polling loop in case it is scheduled/pending.
-            # This could happen when we receive an MQTT message
-            if self._polling_callback_unsub:
-                self._polling_callback_unsub.cancel()
-                self._polling_callback_unsub = self.schedule_async_callback(
-                    0,
-                    self._async_polling_callback,
-                    header[mc.KEY_NAMESPACE],
-                )
+        with self.state_batch():
+            if not self.online:
+                self._set_online()
+                self._polling_delay = self.polling_period
+                # retrigger the polling loop in case it is scheduled/pending.
+                # This could happen when we receive an MQTT message
+                if self._polling_callback_unsub:
+                    self._polling_callback_unsub.cancel()
+                    self._polling_callback_unsub = self.api.polling_scheduler.schedule(
+                        self, 0, header[mc.KEY_NAMESPACE]
+                    )
 
-        return self._handle(header, message[mc.KEY_PAYLOAD])
+            return self._handle(header, message[mc.KEY_PAYLOAD])
 
     def _handle(
         self,
@@ -2143,7 +2446,8 @@ class Device(BaseDevice, ConfigEntryManager):
         namespace = header[mc.KEY_NAMESPACE]
         method = header[mc.KEY_METHOD]
         if method == mc.METHOD_GETACK:
-            pass
+            if self._snapshot_payloads is not None:
+                self._snapshot_update(namespace, payload)
         elif method == mc.METHOD_SETACK:
             # SETACK generally doesn't carry any state/info so it is
             # no use parsing..moreover, our callbacks system is full
@@ -2563,6 +2867,18 @@ class Device(BaseDevice, ConfigEntryManager):
             self.disable_multiple()
         else:
             self.enable_multiple()
+        self.mqtt_window.configure(
+            clamp(
+                config.get(mlc.CONF_MQTT_WINDOW) or mlc.CONF_MQTT_WINDOW_DEFAULT,
+                1,
+                mlc.CONF_MQTT_WINDOW_MAX,
+            )
+        )
+        if config.get(mlc.CONF_WARM_START):
+            if self._snapshot_payloads is None:
+                self._snapshot_payloads = {}
+        else:
+            self._snapshot_payloads = None
 
         _http = self._http
         host = self.host
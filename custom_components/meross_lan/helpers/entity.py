@@ -151,6 +151,7 @@ class MLEntity(NamespaceParser, Loggable, entity.Entity if TYPE_CHECKING else ob
         "entitykey",
         "state_callbacks",
         "hass_connected",
+        "_state_snapshot",
         # HA core
         "available",
         "device_class",
@@ -205,6 +206,7 @@ class MLEntity(NamespaceParser, Loggable, entity.Entity if TYPE_CHECKING else ob
         else:
             self.state_callbacks = None
         self.hass_connected = False
+        self._state_snapshot = None
 
         self.entity_id = entity.Entity.entity_id
         self.hass = entity.Entity.hass
@@ -241,6 +243,7 @@ class MLEntity(NamespaceParser, Loggable, entity.Entity if TYPE_CHECKING else ob
             setattr(self, _attr_name, _attr_value)
 
         manager.entities[id] = self
+        manager.entities_version += 1
         async_add_devices = manager.platforms.setdefault(self.PLATFORM)
         if async_add_devices:
             async_add_devices([self])
@@ -249,6 +252,7 @@ class MLEntity(NamespaceParser, Loggable, entity.Entity if TYPE_CHECKING else ob
     async def async_added_to_hass(self):
         self.log(self.VERBOSE, "Added to HomeAssistant")
         self.hass_connected = True  # type: ignore
+        self._state_snapshot = None
         return await super().async_added_to_hass()
 
     async def async_will_remove_from_hass(self):
@@ -261,6 +265,7 @@ class MLEntity(NamespaceParser, Loggable, entity.Entity if TYPE_CHECKING else ob
         await NamespaceParser.async_shutdown(self)
         self.state_callbacks = None
         self.manager.entities.pop(self.id)
+        self.manager.entities_version += 1
         self.manager: "EntityManager" = None  # type: ignore
 
     @final
@@ -270,12 +275,33 @@ class MLEntity(NamespaceParser, Loggable, entity.Entity if TYPE_CHECKING else ob
         self.state_callbacks.add(state_callback)
 
     def flush_state(self):
-        """Actually commits a state change to HA."""
+        """Actually commits a state change to HA (see EntityManager.state_batch)."""
         if self.state_callbacks:
             for state_callback in self.state_callbacks:
                 state_callback()
         if self.hass_connected:
-            self.async_write_ha_state()
+            self.manager.flush_entity_state(self)
+
+    @final
+    def write_state(self):
+        """Writes the state to HA unless nothing changed since the last write.
+        Returns False when the write is skipped."""
+        extra_state_attributes = self.extra_state_attributes
+        state_snapshot = (
+            self.available,
+            self.state,
+            self.state_attributes,
+            self.capability_attributes,
+            # these are usually updated in place
+            dict(extra_state_attributes) if extra_state_attributes else None,
+            self.supported_features,
+            self.icon,
+        )
+        if state_snapshot == self._state_snapshot:
+            return False
+        self._state_snapshot = state_snapshot
+        self.async_write_ha_state()
+        return True
 
     def set_available(self):
         self.available = True
@@ -1,5 +1,6 @@
 import abc
 import asyncio
+from contextlib import contextmanager
 import logging
 import os
 from time import localtime, strftime, time
@@ -26,12 +27,13 @@ from .obfuscate import (
     OBFUSCATE_DEVICE_ID_MAP,
     OBFUSCATE_SERVER_MAP,
     OBFUSCATE_USERID_MAP,
+    obfuscate_json,
     obfuscated_any,
     obfuscated_dict,
 )
+from .tracing import TraceWriter
 
 if TYPE_CHECKING:
-    import io
     from types import MappingProxyType
     from typing import (
         Any,
@@ -79,6 +81,11 @@ class EntityManager(Loggable):
         deviceentry_id: Final[DeviceEntryIdType | None]
         platforms: PlatformsType  # init in derived
         entities: Final[dict[object, MLEntity]]
+        entities_version: int
+        """incremented whenever an entity is added to (or removed from) entities"""
+        state_writes: int
+        state_writes_suppressed: int
+        _state_batch: dict[MLEntity, None] | None
         _tasks: set[asyncio.Future]
         _issues: set[str]  # BEWARE: on demand attribute
 
@@ -98,7 +105,11 @@ class EntityManager(Loggable):
         "config_entry",
         "deviceentry_id",
         "entities",
+        "entities_version",
         "platforms",
+        "state_writes",
+        "state_writes_suppressed",
+        "_state_batch",
         "config",
         "key",
         "obfuscate",
@@ -118,6 +129,10 @@ class EntityManager(Loggable):
         self.config_entry = kwargs.get("config_entry")
         self.deviceentry_id = kwargs.get("deviceentry_id")
         self.entities = {}
+        self.entities_version = 0
+        self.state_writes = 0
+        self.state_writes_suppressed = 0
+        self._state_batch = None
         self._tasks = set()
         super().__init__(id, **kwargs)
 
@@ -175,6 +190,41 @@ class EntityManager(Loggable):
         """
         return f"{self.id}_{entity.id}"
 
+    @contextmanager
+    def state_batch(self):
+        """
+        Coalesces the entities state flushes (see MLEntity.flush_state) so that,
+        while processing a message, every entity is written to HA at most once
+        (when the outermost batch exits).
+        """
+        if self._state_batch is not None:
+            yield
+            return
+        self._state_batch = state_batch = {}
+        try:
+            yield
+        finally:
+            self._state_batch = None
+            for entity in state_batch:
+                if entity.hass_connected:
+                    self._write_entity_state(entity)
+
+    def flush_entity_state(self, entity: "MLEntity", /):
+        """Writes the entity state to HA or defers it if a state_batch is active."""
+        state_batch = self._state_batch
+        if state_batch is None:
+            self._write_entity_state(entity)
+        elif entity in state_batch:
+            self.state_writes_suppressed += 1
+        else:
+            state_batch[entity] = None
+
+    def _write_entity_state(self, entity: "MLEntity", /):
+        if entity.write_state():
+            self.state_writes += 1
+        else:
+            self.state_writes_suppressed += 1
+
     def schedule_async_callback(
         self, delay: float, target: "Callable[..., Coroutine]", *args
     ) -> "asyncio.TimerHandle":
@@ -263,7 +313,7 @@ class ConfigEntryManager(EntityManager):
         config: Mapping[str, Any]
         key: str
         logger: logging.Logger
-        _trace_file: io.TextIOWrapper | None
+        _trace_file: TraceWriter | None
         _trace_future: asyncio.Future | None
         _trace_data: list | None
         _unsub_trace_endtime: asyncio.TimerHandle | None
@@ -454,6 +504,12 @@ class ConfigEntryManager(EntityManager):
         """Conditionally obfuscate the dict values (based off OBFUSCATE_KEYS) to send to logging/tracing"""
         return obfuscated_dict(value) if self.obfuscate else value
 
+    def loggable_json(self, value: "Mapping[str, Any]"):
+        """Conditionally obfuscate (see loggable_dict) and serialize the dict to send to logging/tracing"""
+        return (
+            obfuscate_json(json_dumps(value)) if self.obfuscate else json_dumps(value)
+        )
+
     def loggable_config(self):
         """Return a 'loggable' version of the entry config (for diagnostic/logging purposes)"""
         return obfuscated_dict(self.config) if self.obfuscate else dict(self.config)
@@ -501,21 +557,16 @@ class ConfigEntryManager(EntityManager):
             epoch = time()
             hass = self.hass
 
-            def _trace_open():
-                tracedir = hass.config.path(
-                    "custom_components", DOMAIN, mlc.CONF_TRACE_DIRECTORY
-                )
-                os.makedirs(tracedir, exist_ok=True)
-                return open(
-                    os.path.join(
-                        tracedir,
-                        f"{strftime('%Y-%m-%d_%H-%M-%S', localtime(epoch))}_{self.logtag}.csv",
+            self._trace_file = _t = await hass.async_add_executor_job(
+                TraceWriter,
+                hass,
+                os.path.join(
+                    hass.config.path(
+                        "custom_components", DOMAIN, mlc.CONF_TRACE_DIRECTORY
                     ),
-                    mode="w",
-                    encoding="utf8",
-                )
-
-            self._trace_file = _t = await hass.async_add_executor_job(_trace_open)
+                    f"{strftime('%Y-%m-%d_%H-%M-%S', localtime(epoch))}_{self.logtag}",
+                ),
+            )
 
             @callback
             def _trace_close_callback():
@@ -533,7 +584,7 @@ class ConfigEntryManager(EntityManager):
                 # output a 'debug trace' and not a 'diagnostic'. We'll
                 # then add here the same data that are usually output
                 # to the diagnostics platform.
-                _t.write("\t".join(mlc.CONF_TRACE_COLUMNS) + "\r\n")
+                _t.write(mlc.CONF_TRACE_COLUMNS)
                 self.trace(
                     epoch,
                     {
@@ -566,18 +617,6 @@ class ConfigEntryManager(EntityManager):
     def trace_close(
         self, exception: Exception | None = None, error_context: str | None = None
     ):
-        notify_message = "Data not available"
-        if self._trace_file:
-            try:
-                notify_message = f"Data available in {self._trace_file.name}"
-                self._trace_file.close()
-            except Exception as e:
-                if not exception:
-                    exception = e
-                    error_context = "closing file"
-            self._trace_file = None
-            self.log(self.DEBUG, "Tracing end")
-
         if self._unsub_trace_endtime:
             self._unsub_trace_endtime.cancel()
             self._unsub_trace_endtime = None
@@ -585,6 +624,34 @@ class ConfigEntryManager(EntityManager):
             self._trace_future.set_result(self._trace_data)
             self._trace_future = None
         self._trace_data = None
+        if trace_file := self._trace_file:
+            self._trace_file = None
+            self.log(self.DEBUG, "Tracing end")
+
+            @callback
+            def _trace_closed_callback(trace_file: TraceWriter):
+                # called after the last (executor) flush so that
+                # we know about every file written and any error
+                notify_message = "Data available in " + ", ".join(trace_file.names)
+                if trace_file.dropped:
+                    notify_message += f" ({trace_file.dropped} rows dropped)"
+                if trace_file.exception and not exception:
+                    self._trace_notify(
+                        trace_file.exception, "writing file", notify_message
+                    )
+                else:
+                    self._trace_notify(exception, error_context, notify_message)
+
+            trace_file.close(_trace_closed_callback)
+        else:
+            self._trace_notify(exception, error_context, "Data not available")
+
+    def _trace_notify(
+        self,
+        exception: Exception | None,
+        error_context: str | None,
+        notify_message: str,
+    ):
         if exception:
             self.log_exception(
                 self.WARNING, exception, "tracing operation (%s)", error_context
@@ -616,23 +683,23 @@ class ConfigEntryManager(EntityManager):
         like logs (see trace_log) or config, diagnostics, state, etc.
         """
         try:
-            data = self.loggable_dict(payload)
             columns = [
                 strftime("%Y/%m/%d - %H:%M:%S", localtime(epoch)),
                 rxtx,
                 protocol,
                 method,
                 namespace,
-                data,
             ]
             if self._trace_data:
-                self._trace_data.append(columns)
-            if self._trace_file:
-                columns[5] = json_dumps(data)
-                self._trace_file.write("\t".join(columns) + "\r\n")
-                columns[5] = data  # restore the (eventual) _trace_data ref
-                if self._trace_file.tell() > mlc.CONF_TRACE_MAXSIZE:
+                self._trace_data.append(columns + [self.loggable_dict(payload)])
+            if trace_file := self._trace_file:
+                if trace_file.closed:
+                    # either reached CONF_TRACE_MAXFILES or failed
                     self.trace_close()
+                else:
+                    # serialize now since the payload could change before
+                    # the writer gets to it
+                    trace_file.write(columns + [self.loggable_json(payload)])
 
         except Exception as exception:
             self.trace_close(exception, "appending data")
@@ -654,10 +721,11 @@ class ConfigEntryManager(EntityManager):
             ]
             if self._trace_data:
                 self._trace_data.append(columns)
-            if self._trace_file:
-                self._trace_file.write("\t".join(columns) + "\r\n")
-                if self._trace_file.tell() > mlc.CONF_TRACE_MAXSIZE:
+            if trace_file := self._trace_file:
+                if trace_file.closed:
                     self.trace_close()
+                else:
+                    trace_file.write(columns)
 
         except Exception as exception:
             self.trace_close(exception, "appending log")
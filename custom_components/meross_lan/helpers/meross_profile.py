@@ -4,6 +4,7 @@ meross_lan module interface to access Meross Cloud services
 
 import asyncio
 from contextlib import asynccontextmanager
+import heapq
 from time import time
 import typing
 from typing import TYPE_CHECKING
@@ -20,14 +21,20 @@ from . import (
 from .. import const as mlc
 from ..const import (
     CONF_CHECK_FIRMWARE_UPDATES,
+    CONF_MQTT_RX_DECODE,
     CONF_PASSWORD,
     DOMAIN,
 )
 from ..helpers.obfuscate import OBFUSCATE_DEVICE_ID_MAP, obfuscated_dict
 from ..merossclient import MEROSSDEBUG, HostAddress, get_active_broker
 from ..merossclient.cloudapi import APISTATUS_TOKEN_ERRORS, CloudApiError
-from ..merossclient.mqttclient import MerossMQTTAppClient, generate_app_id
+from ..merossclient.mqttclient import (
+    MerossMQTTAppClient,
+    MerossMQTTRateLimitException,
+    generate_app_id,
+)
 from ..merossclient.protocol import const as mc, namespaces as mn
+from ..merossclient.protocol.message import MerossRequest
 from .manager import CloudApiClient
 from .mqtt_profile import ConnectionSensor, MQTTConnection, MQTTProfile
 
@@ -61,10 +68,27 @@ class MerossMQTTConnection(MQTTConnection, MerossMQTTAppClient):
     if TYPE_CHECKING:
         is_cloud_connection: Final[bool]
 
+        # queued items are [priority, seq, expiry, request, future]
+        _rl_pending: dict[str, list[list]]
+        _rl_drainers: dict[str, asyncio.Task]
+        _rl_seq: int
+
+    RL_PRIORITY_COMMAND: "Final" = 0
+    RL_PRIORITY_POLL: "Final" = 1
+
     __slots__ = (
+        "_rl_pending",
+        "_rl_drainers",
+        "_rl_seq",
         "_asyncio_loop",
         "_future_connected",
         "_tasks",
+        "_rx_queue",
+        "_rx_wakeup",
+        "_rx_consumers",
+        "_rx_sign_key",
+        "rx_queue_max",
+        "rx_latency",
         "_lock_state",
         "_lock_queue",
         "_rl_dropped",
@@ -82,8 +106,12 @@ class MerossMQTTConnection(MQTTConnection, MerossMQTTAppClient):
             app_id=profile.app_id,
             loop=profile.hass.loop,
             sslcontext=get_default_ssl_context(),
+            rx_decode=profile.config.get(CONF_MQTT_RX_DECODE, False),
         )
         self.is_cloud_connection = True
+        self._rl_pending = {}
+        self._rl_drainers = {}
+        self._rl_seq = 0
         MQTTConnection.__init__(self, profile, broker, self.topic_command)
         if profile.isEnabledFor(profile.VERBOSE):
             self.enable_logger(self)  # type: ignore (Loggable is duck-compatible with Logger)
@@ -115,6 +143,14 @@ class MerossMQTTConnection(MQTTConnection, MerossMQTTAppClient):
         if self._unsub_random_disconnect:
             self._unsub_random_disconnect.cancel()
             self._unsub_random_disconnect = None
+        for drainer in self._rl_drainers.values():
+            drainer.cancel()
+        self._rl_drainers.clear()
+        for pending in self._rl_pending.values():
+            for item in pending:
+                if not item[4].done():
+                    item[4].cancel()
+        self._rl_pending.clear()
         await MerossMQTTAppClient.async_shutdown(self)
         await MQTTConnection.async_shutdown(self)
 
@@ -124,24 +160,135 @@ class MerossMQTTConnection(MQTTConnection, MerossMQTTAppClient):
             self.enable_logger(self)  # type: ignore (Loggable is duck-compatible with Logger)
         else:
             self.disable_logger()
+        self.set_rx_decode(profile.config.get(CONF_MQTT_RX_DECODE, False), profile.key)
 
     def get_rl_safe_delay(self, uuid: str):
         return MerossMQTTAppClient.get_rl_safe_delay(self, uuid)
 
+    def get_rl_budget(self, uuid: str):
+        return MerossMQTTAppClient.get_rl_budget(self, uuid)
+
     async def _async_mqtt_publish(
         self,
         device_id: str,
         request: "MerossMessage",
     ):
-        return await self.profile.hass.async_add_executor_job(
-            self.rl_publish, device_id, request
+        if (device_id not in self._rl_pending) and not self.get_rl_safe_delay(
+            device_id
+        ):
+            try:
+                return await self.profile.hass.async_add_executor_job(
+                    self.rl_publish, device_id, request
+                )
+            except MerossMQTTRateLimitException:
+                # we lost the race against some other publish
+                pass
+        return await self._async_rl_enqueue(device_id, request)
+
+    async def _async_rl_enqueue(self, device_id: str, request: "MerossMessage"):
+        """Holds the request in a per-device priority queue until the rate-limiter
+        allows it to go. Commands are sent before polls and a newer poll for the same
+        namespace and payload (hub polls are chunked over the same namespace)
+        supersedes an older one still in queue. Requests held for more than
+        PARAM_MQTT_RL_QUEUE_TIMEOUT are discarded."""
+        loop = self.profile.hass.loop
+        namespace = request.namespace
+        if request.method == mc.METHOD_GET:
+            priority = self.RL_PRIORITY_POLL
+        elif namespace == mn.Appliance_Control_Multiple.name:
+            # this is how we poll when packing
+            priority = self.RL_PRIORITY_POLL
+        else:
+            priority = self.RL_PRIORITY_COMMAND
+        try:
+            pending = self._rl_pending[device_id]
+        except KeyError:
+            self._rl_pending[device_id] = pending = []
+        if request.method == mc.METHOD_GET:
+            for item in pending:
+                _request: "MerossMessage" = item[3]
+                if (
+                    (_request.method == mc.METHOD_GET)
+                    and (_request.namespace == namespace)
+                    and (_request.payload == request.payload)
+                ):
+                    pending.remove(item)
+                    heapq.heapify(pending)
+                    self._rl_supersede(item)
+                    break
+        future = loop.create_future()
+        self._rl_seq += 1
+        heapq.heappush(
+            pending,
+            [
+                priority,
+                self._rl_seq,
+                loop.time() + mlc.PARAM_MQTT_RL_QUEUE_TIMEOUT,
+                request,
+                future,
+            ],
         )
+        if device_id not in self._rl_drainers:
+            self._rl_drainers[device_id] = self.profile.async_create_task(
+                self._async_rl_drain(device_id), f"._async_rl_drain({device_id})"
+            )
+        return await future
+
+    def _rl_supersede(self, item: list):
+        request: "MerossMessage" = item[3]
+        if transaction := self._mqtt_transactions.get(request.messageid):
+            transaction.cancel()
+        if not item[4].done():
+            item[4].set_result(None)
+
+    async def _async_rl_drain(self, device_id: str):
+        loop = self.profile.hass.loop
+        pending = self._rl_pending[device_id]
+        try:
+            while pending:
+                await asyncio.sleep(self.get_rl_safe_delay(device_id))
+                item = heapq.heappop(pending)
+                future: asyncio.Future = item[4]
+                if future.done():
+                    continue  # the publisher gave up
+                if item[2] < loop.time():
+                    future.set_exception(MerossMQTTRateLimitException())
+                    continue
+                request: "MerossMessage" = item[3]
+                if isinstance(request, MerossRequest) and (
+                    device := self.mqttdevices.get(device_id)
+                ):
+                    request.refresh(device.key)
+                try:
+                    result = await self.profile.hass.async_add_executor_job(
+                        self.rl_publish, device_id, request
+                    )
+                except MerossMQTTRateLimitException:
+                    heapq.heappush(pending, item)
+                    continue
+                except Exception as exception:
+                    if not future.done():
+                        future.set_exception(exception)
+                    continue
+                if not future.done():
+                    future.set_result(result)
+        finally:
+            self._rl_pending.pop(device_id, None)
+            self._rl_drainers.pop(device_id, None)
 
     @callback
     def _mqtt_connected(self):
         MerossMQTTAppClient._mqtt_connected(self)
         MQTTConnection._mqtt_connected(self)
 
+    @callback
+    def _mqtt_rx_drained(self):
+        if sensor_connection := self.sensor_connection:
+            attrs = sensor_connection.extra_state_attributes
+            attrs[ConnectionSensor.ATTR_QUEUE_MAX] = self.rx_queue_max
+            attrs[ConnectionSensor.ATTR_QUEUE_LATENCY] = round(self.rx_latency, 3)
+            sensor_connection.flush_state()
+
     @callback
     def _mqtt_published(self):
         if sensor_connection := self.sensor_connection:
@@ -1,5 +1,6 @@
 import abc
 import asyncio
+from collections import deque
 from time import time
 from typing import TYPE_CHECKING, final
 
@@ -14,13 +15,11 @@ from ..const import (
     CONF_PROTOCOL_MQTT,
     DOMAIN,
 )
-from ..merossclient import (
-    HostAddress,
-    json_dumps,
-)
+from ..merossclient import HostAddress
 from ..merossclient.mqttclient import MerossMQTTRateLimitException
 from ..merossclient.protocol import MerossKeyError, const as mc, namespaces as mn
 from ..merossclient.protocol.message import (
+    MerossLazyResponse,
     MerossRequest,
     MerossResponse,
     check_message_strict,
@@ -29,11 +28,20 @@ from ..merossclient.protocol.message import (
 )
 from ..sensor import MLDiagnosticSensor
 from .manager import ConfigEntryManager
-from .obfuscate import obfuscated_dict
+from .obfuscate import obfuscate_json
 
 if TYPE_CHECKING:
     import asyncio
-    from typing import Awaitable, Callable, ClassVar, Final, Mapping, TypedDict, Unpack
+    from typing import (
+        Awaitable,
+        Callable,
+        ClassVar,
+        Final,
+        Mapping,
+        NotRequired,
+        TypedDict,
+        Unpack,
+    )
 
     from homeassistant.components import mqtt as ha_mqtt
     from homeassistant.config_entries import ConfigEntry
@@ -59,6 +67,11 @@ class ConnectionSensor(me.MEAlwaysAvailableMixin, MLDiagnosticSensor):
         ATTR_RECEIVED: Final
         ATTR_PUBLISHED: Final
         ATTR_DROPPED: Final
+        ATTR_TIMEDOUT: Final
+        ATTR_LATE: Final
+        ATTR_ORPHANED: Final
+        ATTR_QUEUE_MAX: Final
+        ATTR_QUEUE_LATENCY: Final
 
         manager: "MQTTProfile"
 
@@ -68,6 +81,11 @@ class ConnectionSensor(me.MEAlwaysAvailableMixin, MLDiagnosticSensor):
             received: int
             published: int
             dropped: int
+            timedout: int
+            late: int
+            orphaned: int
+            queue_max: NotRequired[int]
+            queue_latency: NotRequired[float]
 
         extra_state_attributes: AttrDictType
         native_value: str
@@ -81,6 +99,16 @@ class ConnectionSensor(me.MEAlwaysAvailableMixin, MLDiagnosticSensor):
     ATTR_RECEIVED = "received"
     ATTR_PUBLISHED = "published"
     ATTR_DROPPED = "dropped"
+    ATTR_TIMEDOUT = "timedout"
+    """transactions expired without a reply"""
+    ATTR_LATE = "late"
+    """replies received after their transaction expired"""
+    ATTR_ORPHANED = "orphaned"
+    """replies not matching any (recent) transaction"""
+    ATTR_QUEUE_MAX = "queue_max"
+    """high-water mark of the inbound messages queue (cloud MQTT only)"""
+    ATTR_QUEUE_LATENCY = "queue_latency"
+    """time (seconds) spent in the inbound queue by the slowest message of the last batch"""
 
     # HA core entity attributes:
     _unrecorded_attributes = frozenset(
@@ -89,6 +117,11 @@ class ConnectionSensor(me.MEAlwaysAvailableMixin, MLDiagnosticSensor):
             ATTR_RECEIVED,
             ATTR_PUBLISHED,
             ATTR_DROPPED,
+            ATTR_TIMEDOUT,
+            ATTR_LATE,
+            ATTR_ORPHANED,
+            ATTR_QUEUE_MAX,
+            ATTR_QUEUE_LATENCY,
             *MLDiagnosticSensor._unrecorded_attributes,
         }
     )
@@ -110,6 +143,9 @@ class ConnectionSensor(me.MEAlwaysAvailableMixin, MLDiagnosticSensor):
             ConnectionSensor.ATTR_RECEIVED: 0,
             ConnectionSensor.ATTR_PUBLISHED: 0,
             ConnectionSensor.ATTR_DROPPED: 0,
+            ConnectionSensor.ATTR_TIMEDOUT: 0,
+            ConnectionSensor.ATTR_LATE: 0,
+            ConnectionSensor.ATTR_ORPHANED: 0,
         }
         super().__init__(
             connection.profile,
@@ -144,8 +180,8 @@ class ConnectionSensor(me.MEAlwaysAvailableMixin, MLDiagnosticSensor):
         }
         self.flush_state()
 
-    def inc_counter(self, attr_name: str):
-        self.extra_state_attributes[attr_name] += 1
+    def inc_counter(self, attr_name: str, count: int = 1):
+        self.extra_state_attributes[attr_name] += count
         self.flush_state()
 
     def inc_counter_with_state(self, attr_name: str, state: str):
@@ -166,6 +202,7 @@ class _MQTTTransaction:
         "messageid",
         "method",
         "request_time",
+        "deadline",
         "response_future",
     )
 
@@ -186,6 +223,20 @@ class _MQTTTransaction:
         )
         mqtt_connection._mqtt_transactions[request.messageid] = self
 
+    def arm(self):
+        """Starts the timeout. This is called once the request has actually been
+        published since it might have been held back (see MerossMQTTConnection)."""
+        mqtt_connection = self.mqtt_connection
+        loop = asyncio.get_running_loop()
+        self.deadline = deadline = (
+            loop.time() + mqtt_connection.DEFAULT_RESPONSE_TIMEOUT
+        )
+        # all of the transactions share the same timeout so the queue
+        # is naturally ordered by deadline
+        mqtt_connection._mqtt_transactions_expiry.append((deadline, self))
+        if not mqtt_connection._mqtt_transactions_timer:
+            mqtt_connection._mqtt_transactions_arm(loop)
+
     def cancel(self):
         mqtt_connection = self.mqtt_connection
         mqtt_connection.log(
@@ -200,6 +251,91 @@ class _MQTTTransaction:
         mqtt_connection._mqtt_transactions.pop(self.messageid, None)
 
 
+class MQTTWindow:
+    """
+    Limits the number of MQTT transactions 'in flight' for a device so that
+    independent requests (like the NS_MULTIPLE batches of a polling cycle) can
+    be pipelined instead of waiting each round-trip in turn.
+    The window size adapts (AIMD) to the observed losses: it is halved whenever a
+    transaction times out and slowly grows back (+1 every 'size' acks) up to size_max.
+    """
+
+    if TYPE_CHECKING:
+        size: float
+        size_max: int
+        inflight: int
+        acked: int
+        lost: int
+        _waiters: deque[asyncio.Future]
+
+    __slots__ = (
+        "size",
+        "size_max",
+        "inflight",
+        "acked",
+        "lost",
+        "_waiters",
+    )
+
+    def __init__(self, size_max: int):
+        self.size = self.size_max = size_max
+        self.inflight = 0
+        self.acked = 0
+        self.lost = 0
+        self._waiters = deque()
+
+    def configure(self, size_max: int):
+        self.size_max = size_max
+        if self.size > size_max:
+            self.size = size_max
+        self._wakeup()
+
+    async def async_acquire(self):
+        if (self.inflight < int(self.size)) and not self._waiters:
+            self.inflight += 1
+            return
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.append(future)
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # we've been granted the slot but we're not going to use it
+                self.inflight -= 1
+                self._wakeup()
+            raise
+
+    def release(self, ack: bool | None):
+        """ack is True when the transaction got its reply, False when it timed out
+        and None when the outcome doesn't tell anything about the link."""
+        self.inflight -= 1
+        if ack:
+            self.acked += 1
+            if self.size < self.size_max:
+                self.size = min(self.size + 1 / self.size, self.size_max)
+        elif ack is False:
+            self.lost += 1
+            self.size = max(self.size / 2, 1)
+        self._wakeup()
+
+    def get_diagnostic_state(self):
+        return {
+            "size": self.size,
+            "size_max": self.size_max,
+            "inflight": self.inflight,
+            "acked": self.acked,
+            "lost": self.lost,
+        }
+
+    def _wakeup(self):
+        waiters = self._waiters
+        while waiters and (self.inflight < int(self.size)):
+            future = waiters.popleft()
+            if not future.done():
+                self.inflight += 1
+                future.set_result(None)
+
+
 class MQTTConnection(Loggable):
     """
     Base abstract class representing a connection to an MQTT
@@ -236,6 +372,9 @@ class MQTTConnection(Loggable):
         sensor_connection: ConnectionSensor | None
 
         _mqtt_transactions: Final[dict[str, _MQTTTransaction]]
+        _mqtt_transactions_expiry: Final[deque[tuple[float, _MQTTTransaction]]]
+        _mqtt_transactions_expired: Final[dict[str, None]]
+        _mqtt_transactions_timer: asyncio.TimerHandle | None
         _mqtt_is_connected: bool
 
     _MQTT_DROP = "DROP"
@@ -243,6 +382,10 @@ class MQTTConnection(Loggable):
     _MQTT_RECV = "RECV"
 
     DEFAULT_RESPONSE_TIMEOUT = 5
+    TRANSACTIONS_TICK = 1
+    """resolution (sec) of the transactions expiry: these are expired in bulk"""
+    TRANSACTIONS_EXPIRED_MAX = 64
+    """number of expired transactions (messageId) kept to detect late replies"""
 
     SESSION_HANDLERS = {}
 
@@ -256,6 +399,9 @@ class MQTTConnection(Loggable):
         "is_cloud_connection",
         "sensor_connection",
         "_mqtt_transactions",
+        "_mqtt_transactions_expiry",
+        "_mqtt_transactions_expired",
+        "_mqtt_transactions_timer",
         "_mqtt_is_connected",
     )
 
@@ -274,6 +420,9 @@ class MQTTConnection(Loggable):
         self.sensor_connection = None
         # self.is_cloud_connection = False to be fixed in derived
         self._mqtt_transactions = {}
+        self._mqtt_transactions_expiry = deque()
+        self._mqtt_transactions_expired = {}
+        self._mqtt_transactions_timer = None
         self._mqtt_is_connected = False
         super().__init__(
             str(broker),
@@ -291,8 +440,12 @@ class MQTTConnection(Loggable):
 
     # interface: self
     async def async_shutdown(self):
+        if self._mqtt_transactions_timer:
+            self._mqtt_transactions_timer.cancel()
+            self._mqtt_transactions_timer = None
         for mqtt_transaction in list(self._mqtt_transactions.values()):
             mqtt_transaction.cancel()
+        self._mqtt_transactions_expiry.clear()
         self.mqttdiscovering.clear()
         for device in self.mqttdevices.values():
             device.mqtt_detached()
@@ -313,6 +466,12 @@ class MQTTConnection(Loggable):
     def get_rl_safe_delay(self, uuid: str):
         raise NotImplementedError()
 
+    @abc.abstractmethod
+    def get_rl_budget(self, uuid: str) -> float:
+        """Returns the number of messages we could publish to the device
+        before being rate-limited."""
+        raise NotImplementedError()
+
     @property
     def mqtt_is_connected(self):
         return self._mqtt_is_connected
@@ -358,18 +517,38 @@ class MQTTConnection(Loggable):
         request: "MerossMessage",
     ) -> MerossResponse | None:
         if request.method in mc.METHOD_ACK_MAP.keys():
+            # responses are matched by messageId in _mqtt_transactions so
+            # we can have many of these in flight at the same time. Cloud
+            # connections have their own (rate-limited) publishing queue though.
+            if (not self.is_cloud_connection) and (
+                device := self.mqttdevices.get(device_id)
+            ):
+                window = device.mqtt_window
+                await window.async_acquire()
+            else:
+                window = None
             transaction = _MQTTTransaction(self, device_id, request)
         else:
+            window = None
             transaction = None
+        window_ack = None
         try:
             self.profile.trace_or_log(self, device_id, request, MQTTProfile.TRACE_TX)
             await self._async_mqtt_publish(device_id, request)
-            if transaction:
+            if transaction and not transaction.response_future.cancelled():
+                # the transaction might have been cancelled while the
+                # request was being held (see MerossMQTTConnection)
+                # else the response timeout starts now that it's published
+                if not transaction.response_future.done():
+                    transaction.arm()
                 try:
-                    return await asyncio.wait_for(
-                        transaction.response_future, self.DEFAULT_RESPONSE_TIMEOUT
-                    )
+                    # the future is expired (TimeoutError) in _mqtt_transactions_expire
+                    response = await transaction.response_future
+                    window_ack = True
+                    return response
                 except Exception as exception:
+                    if isinstance(exception, TimeoutError):
+                        window_ack = False
                     self.log_exception(
                         self.DEBUG,
                         exception,
@@ -407,6 +586,10 @@ class MQTTConnection(Loggable):
                 timeout=14400,
             )
 
+        finally:
+            if window:
+                window.release(window_ack)
+
         if transaction:
             transaction.cancel()
         return None
@@ -414,22 +597,27 @@ class MQTTConnection(Loggable):
     @final
     async def async_mqtt_message(
         self,
-        mqtt_msg: "ha_mqtt.ReceiveMessage | paho_mqtt.MQTTMessage | MqttServiceInfo",
+        mqtt_msg: "ha_mqtt.ReceiveMessage | paho_mqtt.MQTTMessage | MqttServiceInfo | MerossResponse",
     ):
         with self.exception_warning("async_mqtt_message"):
             if sensor_connection := self.sensor_connection:
                 sensor_connection.inc_counter(ConnectionSensor.ATTR_RECEIVED)
-            mqtt_payload = mqtt_msg.payload
-            message = MerossResponse(
-                mqtt_payload
-                if type(mqtt_payload) is str
-                else mqtt_payload.decode("utf-8")  # type: ignore
-            )
+            if isinstance(mqtt_msg, MerossResponse):
+                # already decoded in the paho thread (see set_rx_decode)
+                message = mqtt_msg
+            else:
+                # the payload is only decoded when accessed so that
+                # messages we're going to drop are cheap. Both the paho client
+                # and the HA mqtt subscription (encoding=None) give us raw bytes
+                # (HA typing allows bytearray too)
+                payload = mqtt_msg.payload
+                message = MerossLazyResponse(
+                    bytes(payload) if isinstance(payload, bytearray) else payload
+                )
             header = message[mc.KEY_HEADER]
             device_id = get_message_uuid(header)
             namespace = header[mc.KEY_NAMESPACE]
             messageid = header[mc.KEY_MESSAGEID]
-            payload = message[mc.KEY_PAYLOAD]
 
             profile = self.profile
             api = profile.api
@@ -437,17 +625,28 @@ class MQTTConnection(Loggable):
 
             try:
                 if self._mqtt_transactions[messageid].namespace == namespace:
+                    # responses leave the MQTT layer (i.e. service responses
+                    # serialized by orjson) so they need to be complete
+                    if isinstance(message, MerossLazyResponse):
+                        message.ensure_decoded()
                     self._mqtt_transactions.pop(messageid).response_future.set_result(
                         message
                     )
             except KeyError:
+                if header[mc.KEY_METHOD] in mc.METHOD_ACK_MAP.values():
+                    if messageid in self._mqtt_transactions_expired:
+                        del self._mqtt_transactions_expired[messageid]
+                        if sensor_connection:
+                            sensor_connection.inc_counter(ConnectionSensor.ATTR_LATE)
+                    elif sensor_connection:
+                        sensor_connection.inc_counter(ConnectionSensor.ATTR_ORPHANED)
                 # special session management: cloud connections would
                 # behave differently than the local MQTT. Their behavior
                 # will definitevely be set in the dynamic/custom message handlers
                 # implemented in the derived MQTTConnections
                 if namespace in self.namespace_handlers:
                     if await self.namespace_handlers[namespace](
-                        self, device_id, header, payload
+                        self, device_id, header, message[mc.KEY_PAYLOAD]
                     ):
                         # session management has already taken care of everything
                         return
@@ -629,13 +828,44 @@ class MQTTConnection(Loggable):
         self.mqttdiscovering.remove(device_id)
         return result
 
-    def _mqtt_transactions_clean(self):
-        if self._mqtt_transactions:
-            # check and cleanup stale transactions
-            epoch = time()
-            for transaction in list(self._mqtt_transactions.values()):
-                if (epoch - transaction.request_time) > 15:
-                    transaction.cancel()
+    def _mqtt_transactions_arm(self, loop: "asyncio.AbstractEventLoop"):
+        # round up the deadline so that the transactions
+        # expiring in the same tick are managed in bulk
+        tick = self.TRANSACTIONS_TICK
+        deadline = self._mqtt_transactions_expiry[0][0]
+        self._mqtt_transactions_timer = loop.call_at(
+            (int(deadline / tick) + 1) * tick, self._mqtt_transactions_expire
+        )
+
+    @callback
+    def _mqtt_transactions_expire(self):
+        self._mqtt_transactions_timer = None
+        loop = asyncio.get_running_loop()
+        now = loop.time()
+        expiry = self._mqtt_transactions_expiry
+        expired = self._mqtt_transactions_expired
+        mqtt_transactions = self._mqtt_transactions
+        timedout = 0
+        while expiry:
+            deadline, transaction = expiry[0]
+            if transaction.response_future.done() or (deadline != transaction.deadline):
+                # replied, cancelled or restarted
+                expiry.popleft()
+                continue
+            if deadline > now:
+                break
+            expiry.popleft()
+            messageid = transaction.messageid
+            mqtt_transactions.pop(messageid, None)
+            expired[messageid] = None
+            if len(expired) > self.TRANSACTIONS_EXPIRED_MAX:
+                del expired[next(iter(expired))]
+            transaction.response_future.set_exception(TimeoutError())
+            timedout += 1
+        if expiry:
+            self._mqtt_transactions_arm(loop)
+        if timedout and (sensor_connection := self.sensor_connection):
+            sensor_connection.inc_counter(ConnectionSensor.ATTR_TIMEDOUT, timedout)
 
     @abc.abstractmethod
     async def _async_mqtt_publish(
@@ -806,11 +1036,7 @@ class MQTTProfile(ConfigEntryManager):
                 header[mc.KEY_NAMESPACE],
                 self.loggable_device_id(device_id),
                 header[mc.KEY_MESSAGEID],
-                (
-                    json_dumps(obfuscated_dict(message))
-                    if self.obfuscate
-                    else message.json()
-                ),
+                (obfuscate_json(message.json()) if self.obfuscate else message.json()),
             )
         elif self.isEnabledFor(self.DEBUG):
             header = message[mc.KEY_HEADER]
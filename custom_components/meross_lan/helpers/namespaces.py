@@ -2,10 +2,13 @@ from typing import TYPE_CHECKING
 
 from .. import const as mlc
 from ..merossclient.protocol import const as mc, namespaces as mn
-from ..merossclient.protocol.message import check_message_strict
+from ..merossclient.protocol.message import (
+    MerossRequestTemplate,
+    check_message_strict,
+)
 
 if TYPE_CHECKING:
-    from typing import Any, Callable, Coroutine
+    from typing import Any, Callable, ClassVar, Coroutine
 
     from . import Loggable
     from ..merossclient.protocol import types as mt
@@ -108,14 +111,33 @@ class NamespaceHandler:
     """
 
     if TYPE_CHECKING:
+        POLLING_STRATEGY_PUSHED: ClassVar[set[PollingStrategyFunc]]
+        """Strategies which don't poll when the device is PUSHing its state over MQTT
+        unless polling_epoch_next is reset (see Device._get_polling_delay)."""
+        POLLING_STRATEGY_TIMED: ClassVar[set[PollingStrategyFunc]]
+        """Strategies which only poll when polling_epoch_next is due when the device is
+        PUSHing its state over MQTT (see Device._get_polling_delay)."""
+        POLLING_TIMED: ClassVar[bool]
+        """Set in handler classes implementing their own polling strategy with the
+        same behavior of the POLLING_STRATEGY_TIMED ones."""
+
         parsers: dict[object, Callable[[dict], None]]
+        handler_build: Callable[[], Callable[[Any, Any], None]] | None
+        """The builder of the compiled dispatcher currently installed in 'handler'
+        (None while the payload shape is still being probed)."""
         polling_strategy: PollingStrategyFunc | None
         polling_request_channels: list[dict[str, Any]]
+        polling_template: MerossRequestTemplate | None
+        """Cached (serialized) polling_request. Needs to be reset whenever
+        polling_request is changed (see get_polling_template)."""
+
+    POLLING_TIMED = False
 
     __slots__ = (
         "device",
         "ns",
         "handler",
+        "handler_build",
         "parsers",
         "entity_class",
         "lastrequest",
@@ -129,6 +151,7 @@ class NamespaceHandler:
         "polling_response_size",
         "polling_request",
         "polling_request_channels",
+        "polling_template",
     )
 
     def __init__(
@@ -151,6 +174,7 @@ class NamespaceHandler:
         self.ns = ns
         self.lastresponse = self.lastrequest = self.polling_epoch_next = 0.0
         self.parsers = {}
+        self.handler_build = None
         self.entity_class = None
         self.handler = handler or getattr(
             device, f"_handle_{namespace.replace('.', '_')}", self._handle_undefined
@@ -190,6 +214,7 @@ class NamespaceHandler:
         Passing None as request_payload_type configures the default for the namespace.
         """
         ns = self.ns
+        self.polling_template = None
         _request_payload_type = request_payload_type or ns.request_payload_type
         if _request_payload_type is mn.PayloadType.LIST_C:
             self.polling_request = (
@@ -221,6 +246,7 @@ class NamespaceHandler:
                 break
         else:
             polling_request_channels.append({key_channel: channel} | extra)
+            self.polling_template = None
         self.polling_response_size = (
             self.polling_response_base_size
             + len(polling_request_channels) * self.polling_response_item_size
@@ -232,12 +258,31 @@ class NamespaceHandler:
             mc.METHOD_GET,
             {self.ns.key: payload},
         )
+        self.polling_template = None
         self.polling_response_size = (
             self.polling_response_base_size
             + self.polling_response_item_size
             * (len(payload) if type(payload) is list else 1)
         )
 
+    def get_polling_template(self):
+        """Returns the (cached) pre-serialized polling_request."""
+        if not (polling_template := self.polling_template):
+            self.polling_template = polling_template = MerossRequestTemplate(
+                *self.polling_request, mlc.DOMAIN
+            )
+        return polling_template
+
+    def get_response_size_key(self, payload: dict, /) -> str:
+        """Returns the key of the learned response size statistics
+        (see ResponseSizeModel) for a request/response payload."""
+        return self.ns.name
+
+    def polling_reset(self):
+        """Forces a poll of this namespace at the next polling cycle."""
+        self.polling_epoch_next = 0.0
+        self.device.polling_reschedule()
+
     def polling_response_size_adj(self, item_count: int, /):
         self.polling_response_size = (
             self.polling_response_base_size
@@ -260,7 +305,7 @@ class NamespaceHandler:
             if initially_disabled
             else entity_class
         )
-        self.handler = self._handle_list
+        self.handler_rebuild()
         self.device.platforms.setdefault(entity_class.PLATFORM)
         if build_from_digest:
             channels = set()
@@ -292,6 +337,9 @@ class NamespaceHandler:
         # Thermostat payloads for instance) but many older ones are not, and still
         # either carry dict or, worse, could present themselves in both forms
         # (ToggleX is a well-known example)
+        # Once the shape is known, the probing handler is replaced by a 'compiled'
+        # dispatcher (see _build_handler_list) which is rebuilt here so that it
+        # stays in sync with the registered parsers.
         ns = self.ns
         channel = getattr(parser, ns.key_channel)
         assert channel not in self.parsers, "parser already registered"
@@ -300,11 +348,25 @@ class NamespaceHandler:
             parser.namespace_handlers = set()
         parser.namespace_handlers.add(self)
         self.polling_request_add_channel(channel)
-        self.handler = self._handle_list
+        self.handler_rebuild()
 
     def unregister(self, parser: "NamespaceParser", /):
         if self.parsers.pop(getattr(parser, self.ns.key_channel), None):
             parser.namespace_handlers.remove(self)
+            if self.handler_build:
+                self.handler_rebuild()
+
+    def handler_rebuild(self):
+        """(Re)installs the entity-dispatching handler: either the compiled one
+        for the already known payload shape or the probing _handle_list."""
+        if handler_build := self.handler_build:
+            self.handler = handler_build()
+        else:
+            self.handler = self._handle_list
+
+    def handler_compile(self, handler_build: "Callable[[], Callable]", /):
+        self.handler_build = handler_build
+        self.handler = handler_build()
 
     def handle_exception(self, exception: Exception, function_name: str, payload, /):
         device = self.device
@@ -337,6 +399,8 @@ class NamespaceHandler:
             # this might be expected: the payload is not a list
             self.handler = self._handle_dict
             self._handle_dict(header, payload)
+            return
+        self.handler_compile(self._build_handler_list)
 
     def _handle_dict(self, header, payload, /):
         """
@@ -357,6 +421,7 @@ class NamespaceHandler:
             self._handle_generic(header, payload)
             return
         _parse(p_channel)
+        self.handler_compile(self._build_handler_dict)
 
     def _handle_generic(self, header, payload, /):
         """
@@ -381,6 +446,79 @@ class NamespaceHandler:
                 except KeyError as key_error:
                     _parse = self._try_create_entity(key_error)
                 _parse(p_channel)
+        self.handler_compile(self._build_handler_generic)
+
+    def _build_handler_list(self):
+        """Builds the compiled version of _handle_list. Key names and the parsers
+        table are pre-bound in the closure so that the dispatching doesn't need
+        any attribute lookup. Should the payload shape change, we fall back to
+        probing (starting from _handle_dict)."""
+        key = self.ns.key
+        key_channel = self.ns.key_channel
+        parsers = self.parsers
+        try_create_entity = self._try_create_entity
+
+        def _handle_list_compiled(header, payload, /):
+            try:
+                for p_channel in payload[key]:
+                    try:
+                        _parse = parsers[p_channel[key_channel]]
+                    except KeyError as key_error:
+                        _parse = try_create_entity(key_error)
+                    _parse(p_channel)
+            except TypeError:
+                self.handler_build = None
+                self.handler = self._handle_dict
+                self._handle_dict(header, payload)
+
+        return _handle_list_compiled
+
+    def _build_handler_dict(self):
+        """Builds the compiled version of _handle_dict (see _build_handler_list)."""
+        key = self.ns.key
+        key_channel = self.ns.key_channel
+        parsers = self.parsers
+        try_create_entity = self._try_create_entity
+
+        def _handle_dict_compiled(header, payload, /):
+            p_channel = payload[key]
+            try:
+                _parse = parsers[p_channel.get(key_channel)]
+            except KeyError as key_error:
+                _parse = try_create_entity(key_error)
+            except AttributeError:
+                self.handler_build = None
+                self.handler = self._handle_generic
+                self._handle_generic(header, payload)
+                return
+            _parse(p_channel)
+
+        return _handle_dict_compiled
+
+    def _build_handler_generic(self):
+        """Builds the compiled version of _handle_generic (see _build_handler_list)."""
+        key = self.ns.key
+        key_channel = self.ns.key_channel
+        parsers = self.parsers
+        try_create_entity = self._try_create_entity
+
+        def _handle_generic_compiled(header, payload, /):
+            p_channel = payload[key]
+            if type(p_channel) is dict:
+                try:
+                    _parse = parsers[p_channel.get(key_channel)]
+                except KeyError as key_error:
+                    _parse = try_create_entity(key_error)
+                _parse(p_channel)
+            else:
+                for p_channel in p_channel:
+                    try:
+                        _parse = parsers[p_channel[key_channel]]
+                    except KeyError as key_error:
+                        _parse = try_create_entity(key_error)
+                    _parse(p_channel)
+
+        return _handle_generic_compiled
 
     def _handle_undefined(
         self, header: "mt.MerossHeaderType", payload: "mt.MerossPayloadType", /
@@ -829,6 +967,18 @@ class NamespaceHandler:
                         )
 
 
+NamespaceHandler.POLLING_STRATEGY_PUSHED = {
+    NamespaceHandler.async_poll_all,
+    NamespaceHandler.async_poll_default,
+    NamespaceHandler.async_poll_once,
+}
+NamespaceHandler.POLLING_STRATEGY_TIMED = {
+    NamespaceHandler.async_poll_lazy,
+    NamespaceHandler.async_poll_smart,
+    NamespaceHandler.async_poll_diagnostic,
+}
+
+
 class EntityNamespaceMixin(MLEntity if TYPE_CHECKING else object):
     """
     Special 'polling enabler/disabler' mixin used with entities which are
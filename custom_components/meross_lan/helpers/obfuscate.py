@@ -14,6 +14,7 @@ import re
 import typing
 
 from .. import const as mlc
+from ..merossclient import JSON_DECODER, json_dumps
 from ..merossclient.protocol import const as mc
 
 
@@ -246,3 +247,76 @@ def obfuscated_any(value):
             else OBFUSCATE_NO_MAP.obfuscate(value)
         )
     )
+
+
+#
+# Obfuscation of serialized (json) data for the hot paths (tracing/logging):
+# instead of rebuilding the data structure (obfuscated_dict) and serializing it
+# we scan the json text with a compiled pattern matching any of the OBFUSCATE_KEYS
+# and just replace their values in place. Most payloads don't carry any of those
+# keys so the cost is mostly the (C) regex scan over the text.
+#
+def _compile_keys_pattern(keys: "typing.Iterable[str]"):
+    """Builds a regex matching '"key":' for any of the keys (captured in group 1).
+    The alternatives are factored by common prefixes (trie-like) since the re engine
+    would otherwise try them one by one at every '"' of the json."""
+    trie = {}
+    for key in keys:
+        node = trie
+        for char in key:
+            node = node.setdefault(char, {})
+        node[""] = {}
+
+    def _pattern(node: dict):
+        alternatives = [re.escape(char) + _pattern(node[char]) for char in node if char]
+        if not alternatives:
+            return ""
+        if "" in node:
+            return "(?:" + "|".join(alternatives) + ")?"
+        if len(alternatives) == 1:
+            return alternatives[0]
+        return "(?:" + "|".join(alternatives) + ")"
+
+    # group 2 captures the (json) value when it is a string or a number/literal
+    # while an empty match means a container (not obfuscated)
+    return re.compile(
+        '"(' + _pattern(trie) + r')"(\s*:\s*)("(?:[^"\\]|\\.)*"|[\w.+-]*)'
+    )
+
+
+OBFUSCATE_KEYS_PATTERN = _compile_keys_pattern(OBFUSCATE_KEYS)
+"""Matches any of the OBFUSCATE_KEYS (as an object key) and its value in json text."""
+
+
+_OBFUSCATE_JSON_CACHE: dict[str, str] = {}
+"""Memoizes the replacements in obfuscate_json (the obfuscation maps are stable)."""
+_OBFUSCATE_JSON_CACHE_MAX = 1024
+
+
+def _obfuscate_json_match(match: "re.Match[str]"):
+    text = match.group(0)
+    try:
+        return _OBFUSCATE_JSON_CACHE[text]
+    except KeyError:
+        pass
+    key, separator, value = match.groups()
+    if value:
+        if value[0] == '"' and "\\" not in value:
+            value = value[1:-1]
+        else:
+            value = JSON_DECODER.decode(value)
+        value = json_dumps(OBFUSCATE_KEYS[key].obfuscate(value))
+        text = f'"{key}"{separator}{value}'
+    # else the nested keys will be matched while scanning on
+    if len(_OBFUSCATE_JSON_CACHE) >= _OBFUSCATE_JSON_CACHE_MAX:
+        _OBFUSCATE_JSON_CACHE.clear()
+    _OBFUSCATE_JSON_CACHE[match.group(0)] = text
+    return text
+
+
+def obfuscate_json(text: str, /) -> str:
+    """
+    Json text obfuscation: same as obfuscated_dict (dict/list values are not
+    obfuscated but their content is) but working on the serialized data.
+    """
+    return OBFUSCATE_KEYS_PATTERN.sub(_obfuscate_json_match, text)
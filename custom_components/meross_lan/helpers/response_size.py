@@ -0,0 +1,212 @@
+"""
+Learned (per device) model of the response sizes used to pack
+Appliance.Control.Multiple requests.
+"""
+
+from math import sqrt
+import typing
+from typing import TYPE_CHECKING
+
+from homeassistant.helpers import storage
+
+from .. import const as mlc
+
+if TYPE_CHECKING:
+    from typing import Final
+
+    from homeassistant.core import HomeAssistant
+
+    from ..merossclient.protocol.message import MerossRequestTemplate
+    from .namespaces import NamespaceHandler
+
+
+class ResponseSizeStoreType(typing.TypedDict):
+    namespaces: dict[str, list[float]]
+    """namespace (or namespace#chunk for chunked hub namespaces)
+    -> [mean, variance] of the response size"""
+    transports: dict[str, list[int]]
+    """transport (protocol) -> [size_min, size_max]"""
+
+
+class ResponseSizeStore(storage.Store[ResponseSizeStoreType]):
+    VERSION = 1
+
+    def __init__(self, hass: "HomeAssistant", device_id: str):
+        super().__init__(
+            hass,
+            ResponseSizeStore.VERSION,
+            f"{mlc.DOMAIN}.response_size.{device_id}",
+        )
+
+
+class ResponseSizeModel:
+    """
+    Keeps a running estimate (exponential moving average and variance) of the
+    response size for every polled namespace (chunked hub namespaces are keyed by
+    the number of subdevices in the chunk) together with the learned response
+    size limits of the device for every transport (HTTP and MQTT behave differently
+    since the device output buffers are not the same).
+    For every transport 'size_min' is the biggest response ever received while
+    'size_max' is the (estimated) limit before the device truncates the response.
+    The model is persisted so that, at restart, we don't need to relearn the limits
+    by overflowing the device.
+    """
+
+    EMA_WEIGHT: "Final" = 0.2
+    STD_FACTOR: "Final" = 2
+    """how many standard deviations we add to the mean when estimating a response"""
+    TRUNCATION_SAFE_RATIO: "Final" = 0.9
+    SIZE_MIN_DEFAULT: "Final" = 1000
+
+    if TYPE_CHECKING:
+        namespaces: dict[str, list[float]]
+        transports: dict[str, list[int]]
+        size_max_default: Final[int]
+        _store: Final[ResponseSizeStore]
+        _save_pending: bool
+
+    __slots__ = (
+        "namespaces",
+        "transports",
+        "size_max_default",
+        "_store",
+        "_save_pending",
+    )
+
+    def __init__(self, hass: "HomeAssistant", device_id: str, size_max: int):
+        self.namespaces = {}
+        self.transports = {}
+        self.size_max_default = size_max
+        self._store = ResponseSizeStore(hass, device_id)
+        self._save_pending = False
+
+    async def async_load(self):
+        if data := await self._store.async_load():
+            try:
+                self.namespaces = data["namespaces"]
+                self.transports = data["transports"]
+            except Exception:
+                self.namespaces = {}
+                self.transports = {}
+
+    async def async_shutdown(self):
+        """Flushes the pending (delayed) save. This also cancels the store delayed
+        write so that it cannot re-create the file after the config entry removal."""
+        if self._save_pending:
+            await self._store.async_save(self._data_func())
+
+    def get_limits(self, transport: str, /):
+        """Returns the (mutable) [size_min, size_max] for the transport."""
+        try:
+            return self.transports[transport]
+        except KeyError:
+            self.transports[transport] = limits = [
+                self.SIZE_MIN_DEFAULT,
+                self.size_max_default,
+            ]
+            return limits
+
+    def size_max(self, transport: str, /):
+        return self.get_limits(transport)[1]
+
+    def estimate(self, handler: "NamespaceHandler", /):
+        """Returns the (pessimistic) estimation of the next response size for the
+        namespace handler. Defaults to the static handler estimation until we have
+        real data."""
+        try:
+            mean, variance = self.namespaces[
+                handler.get_response_size_key(handler.polling_request[2])
+            ]
+            return int(mean + self.STD_FACTOR * sqrt(variance))
+        except KeyError:
+            return handler.polling_response_size
+
+    def update(self, key: str, size: float, /):
+        try:
+            stats = self.namespaces[key]
+            delta = size - stats[0]
+            stats[0] += self.EMA_WEIGHT * delta
+            stats[1] = (1 - self.EMA_WEIGHT) * (
+                stats[1] + self.EMA_WEIGHT * delta * delta
+            )
+        except KeyError:
+            self.namespaces[key] = [size, 0.0]
+        # the store delays (and coalesces) the writes so
+        # we're not hitting the disk at every update
+        self._schedule_save()
+
+    def update_multiple(
+        self,
+        requests: "list[tuple[NamespaceHandler, MerossRequestTemplate]]",
+        size: int,
+        /,
+    ):
+        """Splits the size of a (complete) Appliance.Control.Multiple response
+        among the packed requests, proportionally to their current estimation."""
+        keys = [
+            handler.get_response_size_key(template.payload)
+            for handler, template in requests
+        ]
+        estimates = [
+            (
+                self.namespaces[key][0]
+                if key in self.namespaces
+                else handler.polling_response_size
+            )
+            for key, (handler, _) in zip(keys, requests)
+        ]
+        if (estimates_sum := sum(estimates)) > 0:
+            ratio = (size - mlc.PARAM_HEADER_SIZE) / estimates_sum
+            for key, estimate in zip(keys, estimates):
+                self.update(key, estimate * ratio)
+
+    def update_received(self, transport: str, size: int, /):
+        """Called for every response received: the device was able to send
+        it so we could raise the limits."""
+        limits = self.get_limits(transport)
+        if size > limits[0]:
+            limits[0] = size
+            if size > limits[1]:
+                limits[1] = size
+            self._schedule_save()
+
+    def update_truncated(self, transport: str, size: int, /):
+        """The device truncated its response at 'size'."""
+        limits = self.get_limits(transport)
+        limits[1] = size_max = int(size * self.TRUNCATION_SAFE_RATIO)
+        if limits[0] > size_max:
+            limits[0] = size_max
+        self._schedule_save()
+        return limits
+
+    def update_failed(self, transport: str, /):
+        """The device failed to reply to an overflowing request: we don't know the
+        actual limit so we bisect between the biggest known response and the current
+        limit."""
+        limits = self.get_limits(transport)
+        limits[1] = int((limits[0] + limits[1]) / 2)
+        self._schedule_save()
+        return limits
+
+    def get_diagnostic_state(self):
+        return {
+            "namespaces": {
+                namespace: [int(stats[0]), int(sqrt(stats[1]))]
+                for namespace, stats in self.namespaces.items()
+            },
+            "transports": self.transports,
+        }
+
+    def _schedule_save(self):
+        if not self._save_pending:
+            self._save_pending = True
+            self._store.async_delay_save(
+                self._data_func, mlc.PARAM_RESPONSE_SIZE_SAVE_TIMEOUT
+            )
+
+    def _data_func(self) -> ResponseSizeStoreType:
+        self._save_pending = False
+        return {
+            "namespaces": self.namespaces,
+            "transports": self.transports,
+        }
@@ -0,0 +1,189 @@
+"""
+Component-wide scheduler for device polling loops.
+"""
+
+import heapq
+from typing import TYPE_CHECKING
+
+from homeassistant.core import callback
+
+from .. import const as mlc
+
+if TYPE_CHECKING:
+    from asyncio import AbstractEventLoop, TimerHandle
+    from typing import Final
+
+    from .device import Device
+
+
+class PollingHandle:
+    """
+    A scheduled polling cycle for a device. This mimics the asyncio.TimerHandle
+    interface (when/cancel) so that Device code can treat it the same way it
+    would treat a plain loop timer.
+    """
+
+    if TYPE_CHECKING:
+        device: Final["Device"]
+        namespace: Final[str | None]
+
+    __slots__ = (
+        "device",
+        "namespace",
+        "_when",
+        "_slot",
+        "_scheduler",
+        "_cancelled",
+    )
+
+    def __init__(
+        self,
+        scheduler: "PollingScheduler",
+        when: float,
+        slot: int,
+        device: "Device",
+        namespace: str | None,
+        /,
+    ):
+        self.device = device
+        self.namespace = namespace
+        self._when = when
+        self._slot = slot
+        self._scheduler = scheduler
+        self._cancelled = False
+
+    def __lt__(self, other: "PollingHandle"):
+        return self._when < other._when
+
+    def when(self):
+        return self._when
+
+    def cancelled(self):
+        return self._cancelled
+
+    def cancel(self):
+        if not self._cancelled:
+            self._cancelled = True
+            self._scheduler._cancel(self)
+
+
+class PollingScheduler:
+    """
+    Keeps a single deadline ordered heap of the next polling cycle for every device
+    and arms only one loop timer for the earliest of them. Deadlines are also
+    spread over 1 sec slots so that no more than SLOT_MAX devices start polling
+    in the same second (this is typically happening when HA restarts and all of the
+    devices get loaded at once). Once spread, the devices will keep their own phase
+    since every device reschedules relative to the end of its own cycle.
+    """
+
+    SLOT_MAX: "Final" = mlc.PARAM_POLLING_SLOT_MAX
+
+    if TYPE_CHECKING:
+        loop: Final[AbstractEventLoop]
+        _heap: list[PollingHandle]
+        _slots: dict[int, int]
+        _cancelled_count: int
+        _timer: TimerHandle | None
+        _timer_when: float
+
+    __slots__ = (
+        "loop",
+        "_heap",
+        "_slots",
+        "_cancelled_count",
+        "_timer",
+        "_timer_when",
+    )
+
+    def __init__(self, loop: "AbstractEventLoop"):
+        self.loop = loop
+        self._heap = []
+        self._slots = {}
+        self._cancelled_count = 0
+        self._timer = None
+        self._timer_when = 0.0
+
+    def schedule(self, device: "Device", delay: float, namespace: str | None = None):
+        """Schedules device._async_polling_callback(namespace) after (at least) delay."""
+        when = self.loop.time() + delay
+        slot = int(when)
+        slots = self._slots
+        if (count := slots.get(slot, 0)) >= self.SLOT_MAX:
+            while (count := slots.get(slot := slot + 1, 0)) >= self.SLOT_MAX:
+                pass
+            when = float(slot)
+        slots[slot] = count + 1
+        handle = PollingHandle(self, when, slot, device, namespace)
+        heapq.heappush(self._heap, handle)
+        if (not self._timer) or (when < self._timer_when):
+            self._arm(when)
+        return handle
+
+    def shutdown(self):
+        if self._timer:
+            self._timer.cancel()
+            self._timer = None
+        for handle in self._heap:
+            handle._cancelled = True
+        self._heap.clear()
+        self._slots.clear()
+        self._cancelled_count = 0
+
+    def get_diagnostic_state(self):
+        heap = self._heap
+        return {
+            "scheduled": len(heap) - self._cancelled_count,
+            "cancelled": self._cancelled_count,
+            "next": (self._timer_when - self.loop.time()) if self._timer else None,
+        }
+
+    def _arm(self, when: float):
+        if self._timer:
+            self._timer.cancel()
+        self._timer_when = when
+        self._timer = self.loop.call_at(when, self._run)
+
+    def _release_slot(self, handle: PollingHandle):
+        slots = self._slots
+        if count := slots.get(handle._slot):
+            if count > 1:
+                slots[handle._slot] = count - 1
+            else:
+                del slots[handle._slot]
+
+    def _cancel(self, handle: PollingHandle):
+        # cancelled handles are lazily removed from the heap when they
+        # reach the top. We compact the heap only if they pile up.
+        self._release_slot(handle)
+        self._cancelled_count += 1
+        heap = self._heap
+        if self._cancelled_count > len(heap) // 2:
+            self._heap = heap = [_handle for _handle in heap if not _handle._cancelled]
+            heapq.heapify(heap)
+            self._cancelled_count = 0
+
+    @callback
+    def _run(self):
+        self._timer = None
+        # the loop might fire the timer slightly in advance (clock resolution)
+        now = max(self.loop.time(), self._timer_when)
+        # tasks are eagerly started and might re-schedule (or compact) the heap
+        while heap := self._heap:
+            handle = heap[0]
+            if handle._cancelled:
+                heapq.heappop(heap)
+                self._cancelled_count -= 1
+                continue
+            if handle._when > now:
+                self._arm(handle._when)
+                return
+            heapq.heappop(heap)
+            # mark as consumed so that a late cancel() is a no-op
+            handle._cancelled = True
+            self._release_slot(handle)
+            device = handle.device
+            device.async_create_task(
+                device._async_polling_callback(handle.namespace),
+                "._async_polling_callback",
+            )
@@ -0,0 +1,37 @@
+"""
+Persisted (per device) snapshot of the last known device state used to
+warm start the device when HA restarts (or the config entry is reloaded).
+"""
+
+import typing
+
+from homeassistant.helpers import storage
+
+from .. import const as mlc
+
+if typing.TYPE_CHECKING:
+    from homeassistant.core import HomeAssistant
+
+
+class DeviceSnapshotStoreType(typing.TypedDict):
+    epoch: float
+    """(our) time of the last response received from the device"""
+    device_timestamp: int
+    """device time of the last response received from the device"""
+    digest: dict
+    """last known digest (as carried by Appliance.System.All)"""
+    namespaces: dict[str, dict]
+    """namespace -> last GETACK payload"""
+    polling: dict[str, float]
+    """namespace -> polling_epoch_next"""
+
+
+class DeviceSnapshotStore(storage.Store[DeviceSnapshotStoreType]):
+    VERSION = 1
+
+    def __init__(self, hass: "HomeAssistant", device_id: str):
+        super().__init__(
+            hass,
+            DeviceSnapshotStore.VERSION,
+            f"{mlc.DOMAIN}.snapshot.{device_id}",
+        )
@@ -0,0 +1,321 @@
+"""
+Component-wide orchestrator of the devices startup (first polling cycle).
+"""
+
+import heapq
+from typing import TYPE_CHECKING
+
+from homeassistant.config_entries import SOURCE_IGNORE
+from homeassistant.core import callback
+
+from . import ConfigEntryType, entity as me
+from .. import const as mlc
+from ..merossclient.protocol import const as mc
+from ..sensor import MLDiagnosticSensor
+
+if TYPE_CHECKING:
+    from asyncio import TimerHandle
+    from typing import Final, NotRequired, TypedDict
+
+    from .component_api import ComponentApi
+    from .device import Device
+
+
+class StartupSensor(me.MEAlwaysAvailableMixin, MLDiagnosticSensor):
+    """Integration-level (ComponentApi) sensor reporting the startup progress."""
+
+    if TYPE_CHECKING:
+        STATE_STARTING: Final
+        STATE_STARTED: Final
+        ATTR_EXPECTED: Final
+        ATTR_STARTED: Final
+        ATTR_QUEUED: Final
+        ATTR_WAVES: Final
+        ATTR_DURATION: Final
+
+        manager: "ComponentApi"
+
+        # HA core entity attributes:
+        class AttrDictType(TypedDict):
+            expected: int
+            started: int
+            queued: int
+            waves: int
+            duration: NotRequired[float]
+
+        extra_state_attributes: AttrDictType
+        native_value: str
+        options: list[str]
+
+    STATE_STARTING = "starting"
+    STATE_STARTED = "started"
+
+    ATTR_EXPECTED = "expected"
+    """device entries (enabled) configured when HA started"""
+    ATTR_STARTED = "started"
+    ATTR_QUEUED = "queued"
+    ATTR_WAVES = "waves"
+    ATTR_DURATION = "duration"
+    """time (seconds) from the first device admission to the last startup wave"""
+
+    # HA core entity attributes:
+    _unrecorded_attributes = frozenset(
+        {
+            ATTR_EXPECTED,
+            ATTR_STARTED,
+            ATTR_QUEUED,
+            ATTR_WAVES,
+            ATTR_DURATION,
+            *MLDiagnosticSensor._unrecorded_attributes,
+        }
+    )
+
+    options = [
+        STATE_STARTING,
+        STATE_STARTED,
+    ]
+
+    __slots__ = ()
+
+    def __init__(self, api: "ComponentApi"):
+        startup_scheduler = api.startup_scheduler
+        self.extra_state_attributes = startup_scheduler.get_diagnostic_state()
+        super().__init__(
+            api,
+            None,
+            "startup",
+            native_value=startup_scheduler.get_state(),
+        )
+        startup_scheduler.sensor = self
+
+    # interface: MLDiagnosticSensor
+    async def async_shutdown(self):
+        # grab it before the base implementation resets our manager
+        startup_scheduler = self.manager.startup_scheduler
+        await super().async_shutdown()
+        if startup_scheduler.sensor is self:
+            startup_scheduler.sensor = None
+
+    # interface: self
+    def update(self):
+        startup_scheduler = self.manager.startup_scheduler
+        # rebuild the attr dict else we were keeping a reference
+        # to the underlying hass.state and updates were missing
+        self.extra_state_attributes = startup_scheduler.get_diagnostic_state()
+        self.native_value = startup_scheduler.get_state()
+        self.flush_state()
+
+
+class StartupScheduler:
+    """
+    Admits the devices (i.e. starts their polling and MQTT linking) in waves so that
+    when HA restarts the whole fleet doesn't hit the network all at once. Every wave
+    (WAVE_PERIOD) can start up to HTTP_BUDGET devices talking HTTP and MQTT_BUDGET
+    devices talking MQTT (devices in 'auto' protocol are charged on the transport
+    they will start with, see Device._check_protocol). Devices exceeding the
+    budgets are queued by priority so that hubs and climate devices are started
+    first while devices with diagnostics (tracing or diagnostic entities) are last.
+    When the budgets allow, devices are started synchronously at admission so a
+    single device (re)load is not delayed at all.
+    """
+
+    WAVE_PERIOD: "Final" = mlc.PARAM_STARTUP_WAVE_PERIOD
+    HTTP_BUDGET: "Final" = mlc.PARAM_STARTUP_HTTP_BUDGET
+    MQTT_BUDGET: "Final" = mlc.PARAM_STARTUP_MQTT_BUDGET
+
+    PRIORITY_HUB: "Final" = 0
+    PRIORITY_CLIMATE: "Final" = 1
+    PRIORITY_DEFAULT: "Final" = 2
+    PRIORITY_DIAGNOSTIC: "Final" = 3
+
+    if TYPE_CHECKING:
+        api: Final[ComponentApi]
+        expected: Final[int]
+        """device entries (enabled) configured when the api was created"""
+        started: int
+        waves: int
+        sensor: StartupSensor | None
+        _queue: list[list]
+        """heap of [priority, sequence, device | None] admission entries"""
+        _queued: dict[str, list]
+        _sequence: int
+        _http_budget: int
+        _mqtt_budget: int
+        _wave_end: float
+        _epoch_begin: float | None
+        _epoch_end: float | None
+        _timer: TimerHandle | None
+
+    __slots__ = (
+        "api",
+        "expected",
+        "started",
+        "waves",
+        "sensor",
+        "_queue",
+        "_queued",
+        "_sequence",
+        "_http_budget",
+        "_mqtt_budget",
+        "_wave_end",
+        "_epoch_begin",
+        "_epoch_end",
+        "_timer",
+    )
+
+    def __init__(self, api: "ComponentApi", /):
+        self.api = api
+        self.expected = sum(
+            1
+            for config_entry in api.hass.config_entries.async_entries(mlc.DOMAIN)
+            if (not config_entry.disabled_by)
+            and (config_entry.source != SOURCE_IGNORE)
+            and (
+                ConfigEntryType.get_type_and_id(config_entry.unique_id)[0]
+                is ConfigEntryType.DEVICE
+            )
+        )
+        self.started = 0
+        self.waves = 0
+        self.sensor = None
+        self._queue = []
+        self._queued = {}
+        self._sequence = 0
+        self._http_budget = 0
+        self._mqtt_budget = 0
+        self._wave_end = 0.0
+        self._epoch_begin = None
+        self._epoch_end = None
+        self._timer = None
+
+    def admit(self, device: "Device", /):
+        """Starts the device now if the current wave has budget left, else queues it."""
+        now = self.api.hass.loop.time()
+        if self._epoch_begin is None:
+            self._epoch_begin = now
+        if now >= self._wave_end:
+            self._new_wave(now)
+        if (not self._queued) and self._consume_budget(device):
+            self._start(device)
+        else:
+            entry = [self._get_priority(device), self._sequence, device]
+            self._sequence += 1
+            heapq.heappush(self._queue, entry)
+            self._queued[device.id] = entry
+            if not self._timer:
+                self._timer = self.api.hass.loop.call_at(self._wave_end, self._run)
+        self._update_sensor()
+
+    def discard(self, device: "Device", /):
+        """Removes the device from the queue (if still waiting) when it shuts down."""
+        if entry := self._queued.pop(device.id, None):
+            # lazily removed from the heap when reaching the top
+            entry[2] = None
+            self._update_sensor()
+
+    def shutdown(self):
+        if self._timer:
+            self._timer.cancel()
+            self._timer = None
+        self._queue.clear()
+        self._queued.clear()
+        self.sensor = None
+
+    def get_state(self):
+        if self._queued:
+            return StartupSensor.STATE_STARTING
+        return StartupSensor.STATE_STARTED
+
+    def get_diagnostic_state(self) -> "StartupSensor.AttrDictType":
+        diagnostic_state: "StartupSensor.AttrDictType" = {
+            StartupSensor.ATTR_EXPECTED: self.expected,
+            StartupSensor.ATTR_STARTED: self.started,
+            StartupSensor.ATTR_QUEUED: len(self._queued),
+            StartupSensor.ATTR_WAVES: self.waves,
+        }
+        if self._epoch_end is not None:
+            diagnostic_state[StartupSensor.ATTR_DURATION] = round(
+                self._epoch_end - self._epoch_begin, 1  # type: ignore
+            )
+        return diagnostic_state
+
+    def _get_priority(self, device: "Device", /):
+        if device.is_tracing or device.create_diagnostic_entities:
+            return StartupScheduler.PRIORITY_DIAGNOSTIC
+        digest = device.descriptor.digest
+        if mc.KEY_HUB in digest:
+            return StartupScheduler.PRIORITY_HUB
+        if mc.KEY_THERMOSTAT in digest:
+            return StartupScheduler.PRIORITY_CLIMATE
+        return StartupScheduler.PRIORITY_DEFAULT
+
+    def _new_wave(self, now: float, /):
+        self._wave_end = now + self.WAVE_PERIOD
+        self._http_budget = self.HTTP_BUDGET
+        self._mqtt_budget = self.MQTT_BUDGET
+        self.waves += 1
+
+    def _get_protocol(self, device: "Device", /):
+        """The transport the device is going to start with. This mirrors the
+        preferred protocol logic in Device._check_protocol since the device
+        is not linked to its MQTT profile yet."""
+        conf_protocol = device.conf_protocol
+        if conf_protocol is mlc.CONF_PROTOCOL_AUTO:
+            if device.config.get(mlc.CONF_HOST) or (
+                (profile := self.api.profiles.get(device.descriptor.userId))  # type: ignore
+                and (profile.key == device.key)
+            ):
+                return mlc.CONF_PROTOCOL_HTTP
+            return mlc.CONF_PROTOCOL_MQTT
+        return conf_protocol
+
+    def _consume_budget(self, device: "Device", /):
+        if self._get_protocol(device) is mlc.CONF_PROTOCOL_MQTT:
+            if self._mqtt_budget <= 0:
+                return False
+            self._mqtt_budget -= 1
+        else:
+            if self._http_budget <= 0:
+                return False
+            self._http_budget -= 1
+        return True
+
+    def _start(self, device: "Device", /):
+        self.started += 1
+        if self.started <= self.expected:
+            self._epoch_end = self._wave_end - self.WAVE_PERIOD
+        device.start()
+
+    def _update_sensor(self):
+        if self.sensor:
+            self.sensor.update()
+
+    @callback
+    def _run(self):
+        if self._timer:
+            # when not called by the timer itself
+            self._timer.cancel()
+            self._timer = None
+        self._new_wave(self.api.hass.loop.time())
+        queue = self._queue
+        queued = self._queued
+        deferred = []
+        while queue and ((self._http_budget > 0) or (self._mqtt_budget > 0)):
+            entry = heapq.heappop(queue)
+            if not (device := entry[2]):
+                continue
+            if self._consume_budget(device):
+                del queued[device.id]
+                with device.exception_warning("starting"):
+                    self._start(device)
+            else:
+                # this transport is exhausted but lower priority devices
+                # on the other one could still fit in this wave
+                deferred.append(entry)
+        for entry in deferred:
+            heapq.heappush(queue, entry)
+        if queued:
+            self._timer = self.api.hass.loop.call_at(self._wave_end, self._run)
+        else:
+            queue.clear()
+        self._update_sensor()
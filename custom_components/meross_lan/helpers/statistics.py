@@ -0,0 +1,259 @@
+"""
+Component-wide importer of the devices energy history (ConsumptionX days,
+ConsumptionH hours) into HA long-term (external) statistics.
+"""
+
+import asyncio
+from typing import TYPE_CHECKING
+
+try:
+    from homeassistant.components.recorder import get_instance as r_get_instance
+    from homeassistant.components.recorder.statistics import (
+        async_add_external_statistics,
+        get_last_statistics,
+    )
+except ImportError:
+    async_add_external_statistics = None
+
+try:
+    from homeassistant.components.recorder.models import (
+        StatisticMeanType,
+        StatisticMetaData,
+    )
+
+    # unit_class was added later on and older cores reject unknown metadata
+    METADATA_UNIT_CLASS = "unit_class" in StatisticMetaData.__annotations__
+except ImportError:  # pre core 2025.4
+    StatisticMeanType = None
+    METADATA_UNIT_CLASS = False
+
+from homeassistant.core import callback
+from homeassistant.util import dt as dt_util, slugify
+
+from .. import const as mlc
+
+if TYPE_CHECKING:
+    from typing import Any, Callable, Final
+
+    from homeassistant.components.recorder.models import StatisticMetaData
+    from homeassistant.core import HomeAssistant
+
+    from .component_api import ComponentApi
+    from .consumption import ConsumptionHistory
+
+
+class StatisticsSource:
+    """
+    Binds a ConsumptionHistory to its external statistic and keeps track of what
+    has already been imported so that every import only carries the samples since
+    the last imported one. Every sample is imported in the (hour aligned) bucket
+    returned by get_start: samples are cumulative over their bucket (an hour for
+    ConsumptionH, the device day for ConsumptionX) so that the last one in a bucket
+    is its total. The last imported bucket is always re-imported since it is usually
+    still growing (today's or this hour consumption) and the recorder will just
+    update the row with the same start.
+    """
+
+    if TYPE_CHECKING:
+        statistic_id: Final[str]
+        name: str | None
+        unit_of_measurement: Final[str | None]
+        history: Final[ConsumptionHistory]
+        get_start: Final[Callable[[int], int]]
+        """returns the (hour aligned) bucket start of a sample time."""
+        version: int
+        """history.version at the time of the last import."""
+        last_start: int | None
+        """start of the last imported bucket (None until loaded from recorder)."""
+        last_value: float
+        sum_base: float
+        """sum of all of the imported buckets before last_start."""
+
+    __slots__ = (
+        "statistic_id",
+        "name",
+        "unit_of_measurement",
+        "history",
+        "get_start",
+        "version",
+        "last_start",
+        "last_value",
+        "sum_base",
+    )
+
+    def __init__(
+        self,
+        unique_id: str,
+        name: str | None,
+        unit_of_measurement: str | None,
+        history: "ConsumptionHistory",
+        get_start: "Callable[[int], int] | None" = None,
+        /,
+    ):
+        self.statistic_id = f"{mlc.DOMAIN}:{slugify(unique_id)}"
+        self.name = name
+        self.unit_of_measurement = unit_of_measurement
+        self.history = history
+        self.get_start = get_start or StatisticsSource.get_hour_start
+        self.version = 0
+        self.last_start = None
+        self.last_value = 0
+        self.sum_base = 0
+
+    @staticmethod
+    def get_hour_start(sample_time: int, /):
+        return sample_time - (sample_time % 3600)
+
+    def get_metadata(self) -> "StatisticMetaData":
+        metadata: "dict[str, Any]" = {
+            "has_mean": False,
+            "has_sum": True,
+            "name": self.name,
+            "source": mlc.DOMAIN,
+            "statistic_id": self.statistic_id,
+            "unit_of_measurement": self.unit_of_measurement,
+        }
+        if StatisticMeanType:
+            metadata["mean_type"] = StatisticMeanType.NONE
+        if METADATA_UNIT_CLASS:
+            metadata["unit_class"] = "energy"
+        # the actual keys depend on the HA core version
+        return metadata  # type: ignore
+
+    def load_last_statistic(self, hass: "HomeAssistant", /):
+        """Recovers the last imported bucket (runs in the recorder executor)."""
+        last_stats = get_last_statistics(
+            hass, 1, self.statistic_id, True, {"state", "sum"}
+        )
+        if (rows := last_stats.get(self.statistic_id)) and (
+            (start := (row := rows[0]).get("start")) is not None
+        ):
+            self.last_start = int(start)
+            self.last_value = row.get("state") or 0
+            self.sum_base = (row.get("sum") or 0) - self.last_value
+        else:
+            self.last_start = 0
+
+    def build_statistics(self):
+        """Returns the rows to import (deduplicated by their bucket start)."""
+        self.version = self.history.version
+        last_start = self.last_start or 0
+        last_value = self.last_value
+        sum_base = self.sum_base
+        get_start = self.get_start
+        rows = []
+        for sample_time, sample_value in self.history.get_samples(last_start):
+            start = get_start(sample_time)
+            if start > last_start:
+                # last_value is the total of the previous bucket while
+                # samples in the same bucket just update its total
+                sum_base += last_value
+                last_start = start
+            elif rows:
+                # same bucket as the previous sample: overwrite
+                rows.pop()
+            last_value = sample_value
+            rows.append(
+                {
+                    "start": dt_util.utc_from_timestamp(start),
+                    "state": sample_value,
+                    "sum": sum_base + sample_value,
+                }
+            )
+        self.last_start = last_start
+        self.last_value = last_value
+        self.sum_base = sum_base
+        return rows
+
+
+class StatisticsImporter:
+    """
+    Collects the StatisticsSource(s) updated by the devices and imports them in the
+    background. Updates are coalesced over IMPORT_DELAY so that a whole polling round
+    of the fleet is imported at once and are then flushed in batches of (at most)
+    BATCH_MAX statistics. Between batches we yield to the recorder and wait for its
+    queue to drain under BACKLOG_MAX so that large fleets don't stall it.
+    """
+
+    IMPORT_DELAY: "Final" = mlc.PARAM_STATISTICS_IMPORT_DELAY
+    BATCH_MAX: "Final" = mlc.PARAM_STATISTICS_IMPORT_BATCH_MAX
+    BATCH_DELAY: "Final" = 1
+    BACKLOG_MAX: "Final" = 100
+
+    if TYPE_CHECKING:
+        api: Final[ComponentApi]
+        _pending: Final[dict[str, StatisticsSource]]
+        _unsub_import: asyncio.TimerHandle | None
+        _import_task: asyncio.Task | None
+
+    __slots__ = (
+        "api",
+        "_pending",
+        "_unsub_import",
+        "_import_task",
+    )
+
+    def __init__(self, api: "ComponentApi", /):
+        self.api = api
+        self._pending = {}
+        self._unsub_import = None
+        self._import_task = None
+
+    def schedule_import(self, source: StatisticsSource, /):
+        if (not async_add_external_statistics) or (
+            "recorder" not in self.api.hass.config.components
+        ):
+            return
+        self._pending[source.statistic_id] = source
+        if not (self._unsub_import or self._import_task):
+            self._unsub_import = self.api.schedule_callback(
+                self.IMPORT_DELAY, self._import_callback
+            )
+
+    def shutdown(self):
+        if self._unsub_import:
+            self._unsub_import.cancel()
+            self._unsub_import = None
+        # the task (if any) is cancelled by the api shutdown
+        self._import_task = None
+        self._pending.clear()
+
+    def get_diagnostic_state(self):
+        return {
+            "pending": len(self._pending),
+            "importing": bool(self._import_task),
+        }
+
+    @callback
+    def _import_callback(self):
+        self._unsub_import = None
+        self._import_task = self.api.async_create_task(
+            self._async_import(), ".statistics_import", False
+        )
+
+    async def _async_import(self):
+        assert async_add_external_statistics
+        api = self.api
+        hass = api.hass
+        recorder = r_get_instance(hass)
+        pending = self._pending
+        try:
+            while pending:
+                while recorder.backlog > self.BACKLOG_MAX:
+                    await asyncio.sleep(self.BATCH_DELAY)
+                for _ in range(min(len(pending), self.BATCH_MAX)):
+                    source = pending.pop(next(iter(pending)))
+                    if source.version == source.history.version:
+                        continue
+                    if source.last_start is None:
+                        await recorder.async_add_executor_job(
+                            source.load_last_statistic, hass
+                        )
+                    if rows := source.build_statistics():
+                        async_add_external_statistics(hass, source.get_metadata(), rows)
+                if pending:
+                    await asyncio.sleep(self.BATCH_DELAY)
+        except Exception as exception:
+            api.log_exception(api.WARNING, exception, "importing statistics")
+        finally:
+            self._import_task = None
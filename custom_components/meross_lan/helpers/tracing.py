@@ -0,0 +1,175 @@
+"""
+Background writer for the tracing feature (see ConfigEntryManager.trace)
+"""
+
+from collections import deque
+import gzip
+import os
+from typing import TYPE_CHECKING
+
+from .. import const as mlc
+from ..merossclient import json_dumps
+
+if TYPE_CHECKING:
+    import asyncio
+    from typing import Callable, Final
+
+    from homeassistant.core import HomeAssistant
+
+
+class TraceWriter:
+    """
+    Writes trace rows to gzip compressed (tab separated) files through the executor
+    so that tracing never touches the disk from the loop. Rows are queued (see write)
+    and formatted/written in batches by a single flush job at a time. When the disk
+    cannot keep up, the queue keeps at most QUEUE_MAX rows discarding the oldest ones
+    (counted in 'dropped').
+    When a file grows over CONF_TRACE_MAXSIZE (uncompressed) the trace rotates to a
+    new file until CONF_TRACE_MAXFILES are written: the writer then stops and 'closed'
+    is set so that the owner knows it's time to end the trace.
+    The owner gets notified (see close) once the last flush is done so that it can
+    report the outcome of the whole trace (files written, errors).
+    """
+
+    EXTENSION: "Final" = ".csv.gz"
+    QUEUE_MAX: "Final" = 4096
+    COMPRESSLEVEL: "Final" = 6
+
+    __slots__ = (
+        "hass",
+        "path",
+        "name",
+        "dropped",
+        "closed",
+        "exception",
+        "_queue",
+        "_closing",
+        "_closed_callback",
+        "_flushing",
+        "_file",
+        "_file_size",
+        "_file_count",
+    )
+
+    def __init__(self, hass: "HomeAssistant", path: str, /):
+        """
+        Opens the first file ('path' is the file path without extension).
+        Since this might block (and raise) on file creation it should be run
+        in an executor.
+        """
+        self.hass = hass
+        self.path = path
+        self.name = f"{path}{TraceWriter.EXTENSION}"
+        self.dropped = 0
+        self.closed = False
+        self.exception: Exception | None = None
+        self._queue: deque[list] = deque(maxlen=TraceWriter.QUEUE_MAX)
+        self._closing = False
+        self._closed_callback = None
+        self._flushing = False
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._file = gzip.open(
+            self.name, mode="wb", compresslevel=TraceWriter.COMPRESSLEVEL
+        )
+        self._file_size = 0
+        self._file_count = 1
+
+    def write(self, columns: list, /):
+        """
+        Queues a row (see mlc.CONF_TRACE_COLUMNS). Non str data (last column)
+        will be serialized in the executor so it must not be shared with
+        anything that could change it later.
+        """
+        if self.closed:
+            return
+        queue = self._queue
+        if len(queue) == TraceWriter.QUEUE_MAX:
+            # the append will push out the oldest row
+            self.dropped += 1
+        queue.append(columns)
+        if not self._flushing:
+            self._schedule_flush()
+
+    @property
+    def names(self):
+        """The files written so far (the first one followed by the rotated ones)."""
+        return [self.name] + [
+            f"{self.path}.{index}{TraceWriter.EXTENSION}"
+            for index in range(1, self._file_count)
+        ]
+
+    def close(self, closed_callback: "Callable[[TraceWriter], None] | None" = None):
+        """Flushes the queue and closes the file(s) in the background.
+        closed_callback is called (in the loop) once the last flush is done."""
+        self._closing = True
+        self._closed_callback = closed_callback
+        if not self._flushing:
+            if self.closed:
+                self._notify_closed()
+            else:
+                self._schedule_flush()
+
+    def _schedule_flush(self):
+        self._flushing = True
+        self.hass.async_add_executor_job(self._flush).add_done_callback(
+            self._flush_done
+        )
+
+    def _flush_done(self, future: "asyncio.Future"):
+        self._flushing = False
+        if self.closed:
+            self._notify_closed()
+        elif self._queue or self._closing:
+            self._schedule_flush()
+
+    def _notify_closed(self):
+        if closed_callback := self._closed_callback:
+            self._closed_callback = None
+            closed_callback(self)
+
+    def _flush(self):
+        """Executor job: drains the queue and eventually closes the file."""
+        try:
+            queue = self._queue
+            lines = []
+            while queue:
+                columns = queue.popleft()
+                data = columns[5]
+                if type(data) is not str:
+                    columns = columns.copy()
+                    columns[5] = json_dumps(data)
+                lines.append("\t".join(columns))
+            if lines:
+                lines.append("")
+                self._write("\r\n".join(lines).encode("utf-8"))
+            if self._closing:
+                self.closed = True
+        except Exception as exception:
+            self.exception = exception
+            self.closed = True
+        if self.closed:
+            try:
+                self._file.close()
+            except Exception as exception:
+                if not self.exception:
+                    self.exception = exception
+
+    def _write(self, data: bytes, /):
+        self._file.write(data)
+        self._file_size += len(data)
+        if self._file_size > mlc.CONF_TRACE_MAXSIZE:
+            self._file.close()
+            if self._file_count >= mlc.CONF_TRACE_MAXFILES:
+                self.closed = True
+                return
+            self._file = gzip.open(
+                f"{self.path}.{self._file_count}{TraceWriter.EXTENSION}",
+                mode="wb",
+                compresslevel=TraceWriter.COMPRESSLEVEL,
+            )
+            self._file_count += 1
+            self._file_size = 0
+            # every file is a standalone trace
+            self._file.write(
+                ("\t".join(mlc.CONF_TRACE_COLUMNS) + "\r\n").encode("utf-8")
+            )
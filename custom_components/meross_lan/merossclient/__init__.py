@@ -70,21 +70,50 @@ except Exception:
 
 #
 # Optimized JSON encoding/decoding
+# orjson (shipped with HA core) is used when available since it is way faster
+# and natively works with bytes so that we can pass data along from/to the
+# transports (sockets) without intermediate str conversions.
+# JSON_ENCODER/JSON_DECODER are the stdlib fallbacks (JSON_DECODER is also used
+# for partial decoding since only the stdlib supports 'raw_decode' at an index)
 #
 JSON_ENCODER = json.JSONEncoder(
     ensure_ascii=False, check_circular=False, separators=(",", ":")
 )
 JSON_DECODER = json.JSONDecoder()
 
+try:
+    import orjson
+
+    JSON_CODEC = "orjson"
+
+    def json_dumpb(obj, /) -> bytes:
+        """Encodes obj into (utf-8) json bytes"""
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS)
+
+    def json_dumps(obj, /) -> str:
+        """Slightly optimized json.dumps with pre-configured encoder"""
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS).decode("utf-8")
 
-def json_dumps(obj):
-    """Slightly optimized json.dumps with pre-configured encoder"""
-    return JSON_ENCODER.encode(obj)
+    def json_loads(s: str | bytes, /):
+        """Slightly optimized json.loads accepting both str and (utf-8) bytes"""
+        return orjson.loads(s)
 
+except ImportError:
+    JSON_CODEC = "json"
 
-def json_loads(s: str):
-    """Slightly optimized json.loads with pre-configured decoder"""
-    return JSON_DECODER.raw_decode(s)[0]
+    def json_dumpb(obj, /) -> bytes:
+        """Encodes obj into (utf-8) json bytes"""
+        return JSON_ENCODER.encode(obj).encode("utf-8")
+
+    def json_dumps(obj, /) -> str:
+        """Slightly optimized json.dumps with pre-configured encoder"""
+        return JSON_ENCODER.encode(obj)
+
+    def json_loads(s: str | bytes, /):
+        """Slightly optimized json.loads accepting both str and (utf-8) bytes"""
+        return JSON_DECODER.decode(
+            s if type(s) is str else s.decode("utf-8")  # type: ignore
+        )
 
 
 #
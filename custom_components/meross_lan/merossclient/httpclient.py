@@ -5,9 +5,12 @@ for Meross devices.
 
 import asyncio
 from base64 import b64decode, b64encode
+import heapq
+from itertools import count
 import logging
 import socket
 import sys
+from time import monotonic
 from typing import TYPE_CHECKING
 from uuid import uuid4
 
@@ -15,7 +18,7 @@ import aiohttp
 from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
 from yarl import URL
 
-from . import JSON_ENCODER, MEROSSDEBUG
+from . import MEROSSDEBUG, json_dumpb
 from .protocol import MerossKeyError, const as mc
 from .protocol.message import (
     MerossResponse,
@@ -24,7 +27,8 @@ from .protocol.message import (
 )
 
 if TYPE_CHECKING:
-    from typing import ClassVar, Protocol
+    from types import SimpleNamespace
+    from typing import ClassVar, Protocol, TypedDict
 
     from protocol.types import MerossHeaderType, MerossPayloadType
 
@@ -37,19 +41,244 @@ class TerminatedException(Exception):
     pass
 
 
+class HttpDispatcher:
+    """
+    Schedules HTTP transactions across all of the clients (devices) by enforcing
+    a global budget of in-flight requests and a per-host limit (the Meross
+    http server is not able to process concurrent requests).
+    Waiting requests are served by priority (lower value first) and then in
+    FIFO order so that commands (SET) issued while a large poll burst is ongoing
+    don't have to wait for all of the polls to complete. Polls are also restricted
+    to a portion of the global budget so that some slots are always available for
+    commands.
+    """
+
+    PRIORITY_COMMAND = 0
+    PRIORITY_POLL = 1
+
+    if TYPE_CHECKING:
+        inflight_max: int
+        inflight_poll_max: int
+        inflight_host_max: int
+
+        class PriorityStats(TypedDict):
+            requests: int
+            queued: int
+            wait_total: float
+            wait_max: float
+
+    __slots__ = (
+        "inflight_max",
+        "inflight_poll_max",
+        "inflight_host_max",
+        "_inflight",
+        "_inflight_hosts",
+        "_queue",
+        "_queue_max",
+        "_counter",
+        "_stats",
+    )
+
+    def __init__(
+        self, inflight_max: int, inflight_poll_max: int, inflight_host_max: int, /
+    ):
+        self.inflight_max = inflight_max
+        self.inflight_poll_max = inflight_poll_max
+        self.inflight_host_max = inflight_host_max
+        self._inflight = 0
+        self._inflight_hosts: dict[str, int] = {}
+        # heap of waiting entries: [priority, seq, host, future, enqueue time]
+        self._queue: list[list] = []
+        self._queue_max = 0
+        self._counter = count()
+        self._stats: "dict[int, HttpDispatcher.PriorityStats]" = {
+            priority: {
+                "requests": 0,
+                "queued": 0,
+                "wait_total": 0.0,
+                "wait_max": 0.0,
+            }
+            for priority in (self.PRIORITY_COMMAND, self.PRIORITY_POLL)
+        }
+
+    def _can_dispatch(self, host: str, priority: int, /):
+        return (
+            self._inflight
+            < (
+                self.inflight_poll_max
+                if priority >= self.PRIORITY_POLL
+                else self.inflight_max
+            )
+        ) and (self._inflight_hosts.get(host, 0) < self.inflight_host_max)
+
+    def _dispatch(self, host: str, /):
+        self._inflight += 1
+        self._inflight_hosts[host] = self._inflight_hosts.get(host, 0) + 1
+
+    async def async_acquire(self, host: str, priority: int, /):
+        stats = self._stats[priority]
+        stats["requests"] += 1
+        if self._can_dispatch(host, priority):
+            self._dispatch(host)
+            return
+        future = asyncio.get_running_loop().create_future()
+        epoch = monotonic()
+        entry = [priority, next(self._counter), host, future, epoch]
+        heapq.heappush(self._queue, entry)
+        if len(self._queue) > self._queue_max:
+            self._queue_max = len(self._queue)
+        stats["queued"] += 1
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # the slot was granted but the caller was cancelled meanwhile
+                self.release(host)
+            raise
+        wait = monotonic() - epoch
+        stats["wait_total"] += wait
+        if wait > stats["wait_max"]:
+            stats["wait_max"] = wait
+
+    def release(self, host: str, /):
+        self._inflight -= 1
+        if (inflight_host := self._inflight_hosts[host] - 1) > 0:
+            self._inflight_hosts[host] = inflight_host
+        else:
+            del self._inflight_hosts[host]
+        # scan the waiting requests by priority skipping those
+        # still blocked (for host or budget limits)
+        queue = self._queue
+        blocked = []
+        while queue and (self._inflight < self.inflight_max):
+            entry = heapq.heappop(queue)
+            future: asyncio.Future = entry[3]
+            if future.done():  # cancelled while waiting
+                continue
+            if self._can_dispatch(entry[2], entry[0]):
+                self._dispatch(entry[2])
+                future.set_result(None)
+            else:
+                blocked.append(entry)
+        for entry in blocked:
+            heapq.heappush(queue, entry)
+
+    def shutdown(self):
+        for entry in self._queue:
+            future: asyncio.Future = entry[3]
+            if not future.done():
+                future.cancel()
+        self._queue.clear()
+
+    def get_diagnostic_state(self):
+        return {
+            "inflight": self._inflight,
+            "queue_depth": len(self._queue),
+            "queue_depth_max": self._queue_max,
+            "priorities": {
+                ("command" if priority is self.PRIORITY_COMMAND else "poll"): stats
+                | {
+                    "wait_avg": (
+                        (stats["wait_total"] / stats["queued"])
+                        if stats["queued"]
+                        else 0.0
+                    )
+                }
+                for priority, stats in self._stats.items()
+            },
+        }
+
+
+class HttpStats:
+    """
+    Collects timing statistics of the http transactions of a client. Times are
+    smoothed (exponential moving average) and split between the connection setup
+    (only available when a new connection is established) and the transfer
+    (request/response exchange).
+    """
+
+    EMA_WEIGHT = 0.2
+
+    __slots__ = (
+        "requests",
+        "connections",
+        "connections_reused",
+        "connect_time",
+        "transfer_time",
+    )
+
+    def __init__(self):
+        self.requests = 0
+        self.connections = 0
+        self.connections_reused = 0
+        self.connect_time = 0.0
+        self.transfer_time = 0.0
+
+    def update(self, connect_time: float | None, transfer_time: float, reused: bool):
+        self.requests += 1
+        if connect_time is not None:
+            self.connections += 1
+            self.connect_time += (connect_time - self.connect_time) * self.EMA_WEIGHT
+        elif reused:
+            self.connections_reused += 1
+        self.transfer_time += (transfer_time - self.transfer_time) * self.EMA_WEIGHT
+
+
+async def _trace_connection_create_start(
+    session: aiohttp.ClientSession,
+    trace_config_ctx: "SimpleNamespace",
+    params: aiohttp.TraceConnectionCreateStartParams,
+):
+    trace_config_ctx.connect_start = monotonic()
+
+
+async def _trace_connection_create_end(
+    session: aiohttp.ClientSession,
+    trace_config_ctx: "SimpleNamespace",
+    params: aiohttp.TraceConnectionCreateEndParams,
+):
+    if (request_ctx := trace_config_ctx.trace_request_ctx) is not None:
+        request_ctx["connect"] = monotonic() - trace_config_ctx.connect_start
+
+
+async def _trace_connection_reuseconn(
+    session: aiohttp.ClientSession,
+    trace_config_ctx: "SimpleNamespace",
+    params: aiohttp.TraceConnectionReuseconnParams,
+):
+    if (request_ctx := trace_config_ctx.trace_request_ctx) is not None:
+        request_ctx["reused"] = True
+
+
 class MerossHttpClient:
     if TYPE_CHECKING:
         SESSION_MAXIMUM_CONNECTIONS: ClassVar
         SESSION_MAXIMUM_CONNECTIONS_PER_HOST: ClassVar
+        SESSION_MAXIMUM_POLL_CONNECTIONS: ClassVar
+        SESSION_KEEPALIVE_TIMEOUT: ClassVar
         SESSION_TIMEOUT: ClassVar
+        KEEPALIVE_PROBE_PERIOD: ClassVar
         _SESSION: ClassVar[aiohttp.ClientSession | None]
+        DISPATCHER: ClassVar[HttpDispatcher]
 
+        stats: HttpStats
+        _keepalive: bool | None
+        _keepalive_probe: float
+        """time (monotonic) when keep-alive will be tried again if unsupported"""
         _encryption_cipher: Cipher | None
         _key_header: MerossHeaderType
 
     SESSION_MAXIMUM_CONNECTIONS = 50
     SESSION_MAXIMUM_CONNECTIONS_PER_HOST = 1
+    # polls are not allowed to fill the whole budget
+    SESSION_MAXIMUM_POLL_CONNECTIONS = 40
+    # keep idle connections in the pool long enough so that (keep-alive capable)
+    # devices are still connected when the next polling cycle starts
+    SESSION_KEEPALIVE_TIMEOUT = 60
     SESSION_TIMEOUT = aiohttp.ClientTimeout(total=10, connect=5)
+    # when keep-alive looks unsupported we'll stop asking for it (Connection: close)
+    # but periodically try again since the failure might have been transient
+    KEEPALIVE_PROBE_PERIOD = 3600
 
     # Use an 'isolated' and dedicated client session to better manage
     # Meross http specifics following concern from @garysargentpersonal
@@ -59,16 +288,36 @@ class MerossHttpClient:
     # concurrent http sessions to the same device.
     _SESSION = None
 
+    # shared scheduler of the http transactions across all of the clients
+    DISPATCHER = HttpDispatcher(
+        SESSION_MAXIMUM_CONNECTIONS,
+        SESSION_MAXIMUM_POLL_CONNECTIONS,
+        SESSION_MAXIMUM_CONNECTIONS_PER_HOST,
+    )
+
     @staticmethod
     def _get_or_create_client_session():
         if not MerossHttpClient._SESSION:
+            trace_config = aiohttp.TraceConfig()
+            # aiohttp signals typing doesn't match aiosignal's one
+            trace_config.on_connection_create_start.append(
+                _trace_connection_create_start  # type: ignore
+            )
+            trace_config.on_connection_create_end.append(
+                _trace_connection_create_end  # type: ignore
+            )
+            trace_config.on_connection_reuseconn.append(
+                _trace_connection_reuseconn  # type: ignore
+            )
             MerossHttpClient._SESSION = aiohttp.ClientSession(
                 connector=aiohttp.TCPConnector(
                     family=socket.AF_INET,
                     limit=MerossHttpClient.SESSION_MAXIMUM_CONNECTIONS,
                     limit_per_host=MerossHttpClient.SESSION_MAXIMUM_CONNECTIONS_PER_HOST,
+                    keepalive_timeout=MerossHttpClient.SESSION_KEEPALIVE_TIMEOUT,
                     ssl=False,
                 ),
+                trace_configs=[trace_config],
                 headers={
                     aiohttp.hdrs.USER_AGENT: "MerossLan aiohttp/{0} Python/{1[0]}.{1[1]}".format(
                         aiohttp.__version__, sys.version_info
@@ -80,6 +329,7 @@ class MerossHttpClient:
 
     @staticmethod
     async def async_shutdown_session():
+        MerossHttpClient.DISPATCHER.shutdown()
         if MerossHttpClient._SESSION:
             await MerossHttpClient._SESSION.close()
             MerossHttpClient._SESSION = None
@@ -95,6 +345,9 @@ class MerossHttpClient:
         "_log_level_dump",
         "_terminate",
         "_terminate_guard",
+        "stats",
+        "_keepalive",
+        "_keepalive_probe",
         "_encryption_cipher",
         "_key_header",
     )
@@ -125,6 +378,9 @@ class MerossHttpClient:
         self._log_level_dump = log_level_dump
         self._terminate = False
         self._terminate_guard = 0
+        self.stats = HttpStats()
+        self._keepalive = None
+        self._keepalive_probe = 0.0
         self._encryption_cipher = None
         self._key_header = {}  # type: ignore
 
@@ -136,6 +392,23 @@ class MerossHttpClient:
     def host(self, value: str):
         self._host = value
         self._requesturl = URL(f"http://{value}/config")
+        self._keepalive = None
+
+    @property
+    def keepalive(self):
+        """True/False when we've learned if the device supports keep-alive (None if unknown)."""
+        return self._keepalive
+
+    def get_diagnostic_state(self):
+        stats = self.stats
+        return {
+            "keepalive": self._keepalive,
+            "requests": stats.requests,
+            "connections": stats.connections,
+            "connections_reused": stats.connections_reused,
+            "connect_time": stats.connect_time,
+            "transfer_time": stats.transfer_time,
+        }
 
     def set_encryption(self, encryption_key: bytes | None, /):
         if encryption_key:
@@ -165,12 +438,29 @@ class MerossHttpClient:
         while self._terminate_guard:
             await asyncio.sleep(0.5)
 
-    async def async_request_raw(self, request: str, /) -> MerossResponse:
+    async def async_request_raw(
+        self,
+        request: str | bytes,
+        /,
+        priority: int = HttpDispatcher.PRIORITY_POLL,
+        idempotent: bool = False,
+    ) -> MerossResponse:
+        """
+        Sends the (json) request to the device. priority is used to schedule the
+        transaction (see HttpDispatcher) when too many are concurrently ongoing.
+        Passing the request as (utf-8) bytes avoids any conversion along the way.
+        idempotent (i.e. GET) requests are retried on a new connection when the
+        device drops the (reused) one, since we can't know if it was processed.
+        """
         self._check_terminated()
+        host = self._host
+        dispatcher = MerossHttpClient.DISPATCHER
+        await dispatcher.async_acquire(host, priority)
         logger = self._logger
         logid = None
         self._terminate_guard += 1
         try:
+            self._check_terminated()
             if logger and logger.isEnabledFor(self._log_level_dump):
                 # we catch the 'request' id before json dumping so
                 # to reasonably set the context before any exception
@@ -184,12 +474,14 @@ class MerossHttpClient:
                 MEROSSDEBUG.http_random_timeout()
 
             if _cipher := self._encryption_cipher:
-                request_bytes = request.encode("utf-8")
+                request_bytes = (
+                    request if type(request) is bytes else request.encode("utf-8")  # type: ignore
+                )
                 request_bytes += bytes(16 - (len(request_bytes) % 16))
                 encryptor = _cipher.encryptor()
                 request = b64encode(
                     encryptor.update(request_bytes) + encryptor.finalize()
-                ).decode("utf-8")
+                )
                 headers = {
                     aiohttp.hdrs.CONTENT_TYPE: "application/octet-stream",
                 }
@@ -198,6 +490,12 @@ class MerossHttpClient:
                 headers = {
                     aiohttp.hdrs.CONTENT_TYPE: "application/json",
                 }
+            if self._keepalive is False:
+                if monotonic() < self._keepalive_probe:
+                    # don't leave in the pool a connection the device will drop
+                    headers[aiohttp.hdrs.CONNECTION] = "close"
+                else:
+                    self._keepalive = None
             # since device HTTP service sometimes timeouts with no apparent
             # reason we're using an increasing timeout loop to try recover
             # when this timeout is transient. This will lead to a total timeout
@@ -205,6 +503,9 @@ class MerossHttpClient:
             _connect_timeout_max = self.timeout.connect or self.timeout.total or 5
             _connect_timeout = 1
             while True:
+                # filled by the session tracing (see _trace_connection_xxx)
+                trace_ctx = {}
+                epoch = monotonic()
                 try:
                     response = await self._session.post(
                         url=self._requesturl,
@@ -213,6 +514,7 @@ class MerossHttpClient:
                         timeout=aiohttp.ClientTimeout(
                             total=self.timeout.total, connect=_connect_timeout
                         ),
+                        trace_request_ctx=trace_ctx,
                     )
                     break
                 except aiohttp.ServerTimeoutError as exception:
@@ -221,15 +523,41 @@ class MerossHttpClient:
                         _connect_timeout = _connect_timeout * 2
                     else:
                         raise exception
+                except aiohttp.ServerDisconnectedError as exception:
+                    self._check_terminated()
+                    if not trace_ctx.get("reused"):
+                        raise exception
+                    # the device dropped the (idle) connection we were reusing:
+                    # it doesn't support keep-alive
+                    self._set_keepalive_unsupported()
+                    if not idempotent:
+                        raise exception
+                    # retry on a new one
+                    headers[aiohttp.hdrs.CONNECTION] = "close"
 
             self._check_terminated()
             response.raise_for_status()
-            response = await response.text()
+            if aiohttp.hdrs.CONNECTION in headers:
+                # we asked for 'close' so the reply doesn't tell anything
+                pass
+            elif (
+                connection := response.headers.get(aiohttp.hdrs.CONNECTION)
+            ) and connection.lower() == "close":
+                self._set_keepalive_unsupported()
+            elif trace_ctx.get("reused"):
+                self._keepalive = True
+            response = await response.read()
+            connect_time = trace_ctx.get("connect")
+            self.stats.update(
+                connect_time,
+                monotonic() - epoch - (connect_time or 0.0),
+                trace_ctx.get("reused", False),
+            )
             if _cipher:
                 decryptor = _cipher.decryptor()
                 decrypted_bytes = decryptor.update(b64decode(response))
                 decrypted_bytes += decryptor.finalize()
-                response = decrypted_bytes.decode("utf8").rstrip("\0")
+                response = decrypted_bytes.rstrip(b"\0")
 
             if logger:
                 logger.log(
@@ -251,12 +579,22 @@ class MerossHttpClient:
                 )
             raise e
         finally:
+            dispatcher.release(host)
             self._terminate_guard -= 1
 
+    def _set_keepalive_unsupported(self):
+        self._keepalive = False
+        self._keepalive_probe = monotonic() + self.KEEPALIVE_PROBE_PERIOD
+
     async def async_request(
         self, namespace: str, method: str, payload: "MerossPayloadType", /
     ) -> MerossResponse:
         key = self.key
+        priority = (
+            HttpDispatcher.PRIORITY_POLL
+            if method == mc.METHOD_GET
+            else HttpDispatcher.PRIORITY_COMMAND
+        )
         request = (
             build_message_keyhack(
                 namespace,
@@ -273,7 +611,10 @@ class MerossHttpClient:
                 key,
             )
         )
-        response = await self.async_request_raw(JSON_ENCODER.encode(request))
+        idempotent = method == mc.METHOD_GET
+        response = await self.async_request_raw(
+            json_dumpb(request), priority, idempotent
+        )
         if (
             response.get(mc.KEY_PAYLOAD, {}).get(mc.KEY_ERROR, {}).get(mc.KEY_CODE)
             == mc.ERROR_INVALIDKEY
@@ -295,7 +636,9 @@ class MerossHttpClient:
             req_header[mc.KEY_TIMESTAMP] = resp_header[mc.KEY_TIMESTAMP]
             req_header[mc.KEY_SIGN] = resp_header[mc.KEY_SIGN]
             try:
-                response = await self.async_request_raw(JSON_ENCODER.encode(request))
+                response = await self.async_request_raw(
+                    json_dumpb(request), priority, idempotent
+                )
             except TerminatedException as e:
                 raise e
             except Exception:
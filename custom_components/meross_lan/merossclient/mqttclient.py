@@ -14,6 +14,7 @@ import paho.mqtt.client as mqtt
 
 from . import HostAddress, get_macaddress_from_uuid
 from .protocol import const as mc
+from .protocol.message import MerossResponse
 
 if typing.TYPE_CHECKING:
     from .protocol.message import MerossMessage
@@ -50,23 +51,57 @@ class _MQTTRateLimiter:
     To ensure optimal performance and security,
     please limit your device's communication to no more than 200 messages every one hour."
 
-    TODO
-    Taking this into account, we should set the rate-limiting to 1 message every 18 seconds
-    on average but I guess the short term burst should be allowed (up to 6 messages in 60 seconds)
-    We should eventually setup also a long-term data rate-limiting (e.g. 200 messages in 1 hour)
+    Taking this into account, the limiter is now a two-level token bucket: a short term
+    one allowing bursts (MAXQUEUE messages refilled over DURATION) and a long term one
+    (HOURLY_MAXQUEUE messages refilled over HOURLY_DURATION). A message is only sent
+    when both the buckets have a token available. The remaining (long term) budget is
+    exposed so that the polling strategies can delay less important requests instead
+    of having them dropped.
     """
 
     DURATION: typing.Final = 60
     MAXQUEUE: typing.Final = 6
+    HOURLY_DURATION: typing.Final = 3600
+    HOURLY_MAXQUEUE: typing.Final = 200
 
     __slots__ = (
         "dropped",
-        "t_queue",
+        "tokens",
+        "tokens_hourly",
+        "t_last",
     )
 
     def __init__(self) -> None:
         self.dropped: int = 0
-        self.t_queue: deque[float] = deque()
+        self.tokens: float = _MQTTRateLimiter.MAXQUEUE
+        self.tokens_hourly: float = _MQTTRateLimiter.HOURLY_MAXQUEUE
+        self.t_last = monotonic()
+
+    def refill(self, t_now: float):
+        t_elapsed = t_now - self.t_last
+        self.t_last = t_now
+        self.tokens = min(
+            self.tokens
+            + t_elapsed * _MQTTRateLimiter.MAXQUEUE / _MQTTRateLimiter.DURATION,
+            _MQTTRateLimiter.MAXQUEUE,
+        )
+        self.tokens_hourly = min(
+            self.tokens_hourly
+            + t_elapsed
+            * _MQTTRateLimiter.HOURLY_MAXQUEUE
+            / _MQTTRateLimiter.HOURLY_DURATION,
+            _MQTTRateLimiter.HOURLY_MAXQUEUE,
+        )
+
+    def get_safe_delay(self):
+        """Returns the time to wait before both the buckets have a token."""
+        return max(
+            (1 - self.tokens) * _MQTTRateLimiter.DURATION / _MQTTRateLimiter.MAXQUEUE,
+            (1 - self.tokens_hourly)
+            * _MQTTRateLimiter.HOURLY_DURATION
+            / _MQTTRateLimiter.HOURLY_MAXQUEUE,
+            0.0,
+        )
 
 
 class _MerossMQTTClient(mqtt.Client):
@@ -77,6 +112,9 @@ class _MerossMQTTClient(mqtt.Client):
 
     MQTT_ERR_SUCCESS = mqtt.MQTT_ERR_SUCCESS
 
+    RX_CONSUMERS = 4
+    """Maximum number of coroutines concurrently consuming the inbound messages queue."""
+
     STATE_CONNECTING = "connecting"
     STATE_CONNECTED = "connected"
     STATE_RECONNECTING = "reconnecting"
@@ -125,6 +163,19 @@ class _MerossMQTTClient(mqtt.Client):
             self._asyncio_loop = loop
             self._future_connected = None
             self._tasks: list[asyncio.Task] = []
+            # inbound messages are queued by the mqtt thread (deque append/popleft
+            # are atomic so no locking needed) and the loop is woken up only once
+            # for every batch (see _mqttc_message_loop)
+            self._rx_queue: deque[tuple[mqtt.MQTTMessage | MerossResponse, float]] = (
+                deque()
+            )
+            self._rx_wakeup = False
+            self._rx_sign_key: str | None = None
+            self._rx_consumers = 0
+            self.rx_queue_max = 0
+            """High-water mark of the inbound messages queue."""
+            self.rx_latency = 0.0
+            """Maximum time spent by a message in the queue during the last drain."""
             self.on_subscribe = self._mqttc_subscribe_loop
             self.on_disconnect = self._mqttc_disconnect_loop
             self.on_publish = self._mqttc_publish_loop
@@ -233,28 +284,22 @@ class _MerossMQTTClient(mqtt.Client):
                 # be likely used again
                 self._rl2_queues[uuid] = _MQTTRateLimiter()
                 return 0.0
+            _rl2.refill(monotonic())
+            return _rl2.get_safe_delay()
 
-            t_now = monotonic()
-            t_duration_back = t_now - _MQTTRateLimiter.DURATION
-            t_queue = _rl2.t_queue
-            t_queue_len = len(t_queue)
-            while t_queue_len:
-                if t_queue[0] <= t_duration_back:
-                    # discard in case
-                    t_queue.popleft()
-                    t_queue_len -= 1
-                    continue
-                if t_queue_len >= _MQTTRateLimiter.MAXQUEUE:
-                    # queue full..any send before expiration
-                    # of oldest send will be dropped
-                    t_oldest_exp = t_queue[0] + _MQTTRateLimiter.DURATION
-                    return t_oldest_exp - t_now  # assert > 0 ?
-                # queue not full but we want to 'weigh-in' the queue length
-                return _MQTTRateLimiter.DURATION / (
-                    _MQTTRateLimiter.MAXQUEUE - t_queue_len
-                )
-            # queue empty
-            return 0.0
+    def get_rl_budget(self, uuid: str):
+        """
+        Returns the number of messages we could still send to the device before
+        incurring rate-limiting (this is the minimum between the short-term burst
+        and the long-term hourly budget).
+        """
+        with self._lock_queue:
+            try:
+                _rl2 = self._rl2_queues[uuid]
+            except KeyError:
+                self._rl2_queues[uuid] = _rl2 = _MQTTRateLimiter()
+            _rl2.refill(monotonic())
+            return min(_rl2.tokens, _rl2.tokens_hourly)
 
     def rl_publish(self, uuid: str, request: "MerossMessage"):
         with self._lock_queue:
@@ -264,31 +309,32 @@ class _MerossMQTTClient(mqtt.Client):
             except KeyError:
                 self._rl2_queues[uuid] = _rl2 = _MQTTRateLimiter()
 
-            t_now = monotonic()
-            # implementing a rate-limiter trying to keep the send rate to lower than
-            # 1 MQTT publish every 10 seconds (on average x device). This is accomplished
-            # by keeping the count (and times) of sent messages in the last minute
-            t_duration_back = t_now - _MQTTRateLimiter.DURATION
-            t_queue = _rl2.t_queue
-            t_queue_len = len(t_queue)
-            while t_queue_len:
-                if t_queue[0] <= t_duration_back:
-                    t_queue.popleft()
-                    t_queue_len -= 1
-                    continue
-                if t_queue_len >= _MQTTRateLimiter.MAXQUEUE:
-                    self._rl_dropped += 1
-                    _rl2.dropped += 1
-                    raise MerossMQTTRateLimitException()
-                break
-
-            t_queue.append(t_now)
+            _rl2.refill(monotonic())
+            if (_rl2.tokens < 1) or (_rl2.tokens_hourly < 1):
+                self._rl_dropped += 1
+                _rl2.dropped += 1
+                raise MerossMQTTRateLimitException()
+            _rl2.tokens -= 1
+            _rl2.tokens_hourly -= 1
             return mqtt.Client.publish(
                 self,
                 mc.TOPIC_REQUEST.format(uuid),
-                request.json(),
+                request.json_bytes(),
             )
 
+    def set_rx_decode(self, rx_decode: bool, sign_key: str | None = None):
+        """
+        Configures where inbound messages get decoded. When rx_decode is set the mqtt thread
+        fully decodes the payload (and checks the signature against sign_key if any) so that
+        async_mqtt_message receives a ready to route MerossResponse instead of the raw
+        MQTTMessage. This offloads the json parsing from the asyncio loop.
+        Only effective when the client is managed through a loop.
+        """
+        self._rx_sign_key = sign_key if rx_decode else None
+        self.on_message = (
+            self._mqttc_message_decode_loop if rx_decode else self._mqttc_message_loop
+        )
+
     def _mqtt_connected(self):
         """
         This is a placeholder method called by the asyncio implementation in the
@@ -312,20 +358,53 @@ class _MerossMQTTClient(mqtt.Client):
         """
         pass
 
-    def mqtt_message(self, msg: mqtt.MQTTMessage):
+    def _mqtt_rx_wakeup(self):
+        """
+        Called in the main thread when the mqtt thread has queued new messages.
+        Starts enough consumers (up to RX_CONSUMERS) to drain the queue.
+        """
+        # reset before consuming so that the mqtt thread will wake us up again
+        # should it queue more messages after the consumers are done
+        self._rx_wakeup = False
+        queue_len = len(self._rx_queue)
+        if queue_len > self.rx_queue_max:
+            self.rx_queue_max = queue_len
+        while (self._rx_consumers < self.RX_CONSUMERS) and (
+            self._rx_consumers < queue_len
+        ):
+            self._rx_consumers += 1
+            task = self._asyncio_loop.create_task(self._async_mqtt_rx_consume())
+            self._tasks.append(task)
+            task.add_done_callback(self._tasks.remove)
+
+    async def _async_mqtt_rx_consume(self):
+        rx_queue = self._rx_queue
+        try:
+            while rx_queue:
+                msg, epoch = rx_queue.popleft()
+                latency = monotonic() - epoch
+                if latency > self.rx_latency:
+                    self.rx_latency = latency
+                await self.async_mqtt_message(msg)
+        finally:
+            self._rx_consumers -= 1
+            if not self._rx_consumers:
+                self._mqtt_rx_drained()
+                self.rx_latency = 0.0
+
+    def _mqtt_rx_drained(self):
         """
         This is a placeholder method called by the asyncio implementation in the
-        main thread when the mqtt client receives a message. Defaults to creating
-        a task for processing the message in async_mqtt_message
+        main thread when the inbound messages queue has been drained
+        (rx_queue_max and rx_latency are current).
         """
-        task = self._asyncio_loop.create_task(self.async_mqtt_message(msg))
-        self._tasks.append(task)
-        task.add_done_callback(self._tasks.remove)
+        pass
 
-    async def async_mqtt_message(self, msg: mqtt.MQTTMessage):
+    async def async_mqtt_message(self, msg: mqtt.MQTTMessage | MerossResponse):
         """
         This is a placeholder method called by the asyncio implementation in the
-        main thread when the mqtt client receives a message
+        main thread when the mqtt client receives a message (already decoded
+        if set_rx_decode is active)
         """
         pass
 
@@ -358,7 +437,25 @@ class _MerossMQTTClient(mqtt.Client):
         self._asyncio_loop.call_soon_threadsafe(self._mqtt_published)
 
     def _mqttc_message_loop(self, client, userdata, msg: mqtt.MQTTMessage):
-        self._asyncio_loop.call_soon_threadsafe(self.mqtt_message, msg)
+        self._rx_queue.append((msg, monotonic()))
+        if not self._rx_wakeup:
+            self._rx_wakeup = True
+            self._asyncio_loop.call_soon_threadsafe(self._mqtt_rx_wakeup)
+
+    def _mqttc_message_decode_loop(self, client, userdata, msg: mqtt.MQTTMessage):
+        """Version of _mqttc_message_loop used when set_rx_decode is active."""
+        try:
+            message = MerossResponse(msg.payload)
+            if self._rx_sign_key is not None:
+                message.check_sign(self._rx_sign_key)
+        except Exception:
+            # malformed messages are passed along as they are so that
+            # the loop implementation will handle (and log) the error
+            message = msg
+        self._rx_queue.append((message, monotonic()))
+        if not self._rx_wakeup:
+            self._rx_wakeup = True
+            self._asyncio_loop.call_soon_threadsafe(self._mqtt_rx_wakeup)
 
 
 class MerossMQTTAppClient(_MerossMQTTClient):
@@ -379,7 +476,12 @@ class MerossMQTTAppClient(_MerossMQTTClient):
         app_id: str | None = None,
         loop: asyncio.AbstractEventLoop | None = None,
         sslcontext: ssl.SSLContext | None = None,
+        rx_decode: bool = False,
     ):
+        """
+        rx_decode: (only when managed through a loop) decode inbound messages
+        and check their signature against key in the mqtt thread (see set_rx_decode)
+        """
         if not app_id:
             app_id = generate_app_id()
         self.app_id = app_id
@@ -395,6 +497,8 @@ class MerossMQTTAppClient(_MerossMQTTClient):
             self.tls_set(
                 cert_reqs=ssl.CERT_REQUIRED, tls_version=ssl.PROTOCOL_TLS_CLIENT
             )
+        if loop and rx_decode:
+            self.set_rx_decode(True, key)
 
 
 class MerossMQTTDeviceClient(_MerossMQTTClient):
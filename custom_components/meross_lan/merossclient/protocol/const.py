@@ -15,6 +15,8 @@ RE_PATTERN_UUID = re.compile(r"(^|[^a-fA-F0-9])([a-fA-F0-9]{32})($|[^a-fA-F0-9])
 RE_PATTERN_TOPIC_UUID = re.compile(r"/.+/(.*)/.+")
 RE_PATTERN_TOPIC_USERID = re.compile(r"(/app/)(\d+)(.*/subscribe)")
 """re pattern to search/extract the uuid from an MQTT topic or the "from" field in message header"""
+RE_PATTERN_MESSAGE_HEADER = re.compile(r'\s*\{\s*"header"\s*:\s*')
+"""re pattern matching the (usual) message layout where "header" is the first key"""
 
 METHOD_PUSH = "PUSH"
 METHOD_GET = "GET"
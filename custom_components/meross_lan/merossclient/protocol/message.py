@@ -4,9 +4,11 @@ from typing import TYPE_CHECKING
 from uuid import uuid4
 
 from . import MerossKeyError, MerossProtocolError, const as mc, namespaces as mn
-from .. import JSON_DECODER, JSON_ENCODER
+from .. import JSON_DECODER, json_dumpb, json_loads
 
 if TYPE_CHECKING:
+    from typing import Iterable
+
     from .types import KeyType, MerossHeaderType, MerossMessageType, MerossPayloadType
 
 
@@ -133,34 +135,173 @@ class MerossMessage(dict):
         method: str
         messageid: str
         payload: MerossPayloadType
+        _json: str | bytes | None
 
     __slots__ = (
         "namespace",
         "method",
         "messageid",
         "payload",
-        "_json_str",
+        "_json",
     )
 
-    def __init__(self, message: dict, json_str: str | None = None, /):
-        self._json_str = json_str
+    def __init__(self, message: dict, json: "str | bytes | None" = None, /):
+        # _json caches the serialized message in whatever form we got it
+        # (bytes from the transports or the encoder, str from legacy sources)
+        self._json = json
         super().__init__(message)
 
-    def json(self):
-        if not self._json_str:
-            self._json_str = JSON_ENCODER.encode(self)
-        return self._json_str
+    def json(self) -> str:
+        _json = self._json
+        if _json is None:
+            self._json = _json = json_dumpb(self)
+        return _json if type(_json) is str else _json.decode("utf-8")  # type: ignore
+
+    def json_bytes(self) -> bytes:
+        """Serialized message as (utf-8) bytes: this is what the transports want."""
+        _json = self._json
+        if _json is None:
+            self._json = _json = json_dumpb(self)
+        return _json if type(_json) is bytes else _json.encode("utf-8")  # type: ignore
 
     @staticmethod
-    def decode(json_str: str, /):
-        return MerossMessage(JSON_DECODER.decode(json_str), json_str)
+    def decode(json: "str | bytes", /):
+        return MerossMessage(json_loads(json), json)
 
 
 class MerossResponse(MerossMessage):
     """Helper for messages received from a device"""
 
-    def __init__(self, json_str: str, /):
-        super().__init__(JSON_DECODER.decode(json_str), json_str)
+    if TYPE_CHECKING:
+        sign_ok: bool | None
+        """Result of the last check_sign (None if never checked)."""
+
+    __slots__ = ("sign_ok",)
+
+    def __init__(self, json: "str | bytes", /):
+        self.sign_ok = None
+        super().__init__(json_loads(json), json)
+
+    def check_sign(self, key: str, /):
+        """Verifies the header signature against key and caches the result in sign_ok."""
+        header = self[mc.KEY_HEADER]
+        self.sign_ok = sign_ok = (
+            compute_message_signature(
+                header[mc.KEY_MESSAGEID], key, header[mc.KEY_TIMESTAMP]
+            )
+            == header[mc.KEY_SIGN]
+        )
+        return sign_ok
+
+
+class MerossLazyResponse(MerossResponse):
+    """
+    Helper for messages received from a device where only the header
+    is decoded at construction time. The rest of the message (i.e. the payload)
+    is decoded the first time it is accessed so that we can route/drop messages
+    by just looking at the header. If the json doesn't start with the header
+    we'll fallback to decoding everything. Beware malformed payloads will then raise
+    (ValueError) on first access instead of at construction.
+    """
+
+    HEADER_SIZE_MAX = 1024
+    """Size of the leading chunk of (bytes) messages scanned for the header."""
+
+    __slots__ = ("_lazy",)
+
+    def __init__(self, json: "str | bytes", /):
+        # raw_decode only works on str so we just convert the leading part
+        # of bytes messages: should the header not fit we'll fully decode.
+        head = (
+            json
+            if type(json) is str
+            else json[: self.HEADER_SIZE_MAX].decode("utf-8", "ignore")  # type: ignore
+        )
+        if match := mc.RE_PATTERN_MESSAGE_HEADER.match(head):  # type: ignore
+            try:
+                header = JSON_DECODER.raw_decode(head, match.end())[0]  # type: ignore
+                if type(header) is dict:
+                    self._lazy = True
+                    self.sign_ok = None
+                    MerossMessage.__init__(self, {mc.KEY_HEADER: header}, json)
+                    return
+            except ValueError:
+                pass
+        self._lazy = False
+        super().__init__(json)
+
+    def ensure_decoded(self):
+        """Fully decodes the message (if still lazy). This is needed before handing
+        the message to code serializing it straight from the dict storage
+        (i.e. orjson) since that would only see the header."""
+        if self._lazy:
+            self._decode()
+        return self
+
+    def _decode(self):
+        self._lazy = False
+        message = json_loads(self._json)  # type: ignore
+        # preserve the header instance which might have been already shared
+        message.pop(mc.KEY_HEADER, None)
+        dict.update(self, message)
+
+    def __missing__(self, key):
+        if self._lazy:
+            self._decode()
+            return dict.__getitem__(self, key)
+        raise KeyError(key)
+
+    def __contains__(self, key):
+        if self._lazy and not dict.__contains__(self, key):
+            self._decode()
+        return dict.__contains__(self, key)
+
+    def __iter__(self):
+        if self._lazy:
+            self._decode()
+        return dict.__iter__(self)
+
+    def __len__(self):
+        if self._lazy:
+            self._decode()
+        return dict.__len__(self)
+
+    def __eq__(self, other):
+        if self._lazy:
+            self._decode()
+        return dict.__eq__(self, other)
+
+    __hash__ = None  # type: ignore
+
+    def __repr__(self):
+        if self._lazy:
+            self._decode()
+        return dict.__repr__(self)
+
+    def get(self, key, default=None, /):
+        if self._lazy and not dict.__contains__(self, key):
+            self._decode()
+        return dict.get(self, key, default)
+
+    def keys(self):
+        if self._lazy:
+            self._decode()
+        return dict.keys(self)
+
+    def values(self):
+        if self._lazy:
+            self._decode()
+        return dict.values(self)
+
+    def items(self):
+        if self._lazy:
+            self._decode()
+        return dict.items(self)
+
+    def copy(self):
+        if self._lazy:
+            self._decode()
+        return dict.copy(self)
 
 
 class MerossRequest(MerossMessage):
@@ -200,6 +341,147 @@ class MerossRequest(MerossMessage):
             }
         )
 
+    def refresh(self, key: str, /):
+        """Updates timestamp (and signature) of a request which has been held
+        back before being sent since devices might reject 'old' messages."""
+        header = self[mc.KEY_HEADER]
+        header[mc.KEY_TIMESTAMP] = timestamp = int(time())
+        header[mc.KEY_SIGN] = compute_message_signature(self.messageid, key, timestamp)
+        self._json = None
+
+    def set_json(self, json: bytes, /):
+        """Sets the (pre-serialized) json of this request. It must match the
+        message content (see MerossRequestTemplate)."""
+        self._json = json
+
+
+class MerossRequestTemplate:
+    """
+    Pre-serialized (namespace, method, payload) request used to build MerossRequest(s)
+    for recurring polls: the json of the constant parts is cached so that, at send time,
+    only messageId, timestamp, sign (and from) are spliced in. The payload must not be
+    changed once the template is built (rebuild the template instead).
+    """
+
+    __slots__ = (
+        "namespace",
+        "method",
+        "payload",
+        "triggerSrc",
+        "_from",
+        "_json_from",
+        "_json_header",
+        "_json_payload",
+        "_json_multiple",
+    )
+
+    if TYPE_CHECKING:
+        _from: str | None
+        _json_multiple: tuple[bytes, bytes] | None
+
+    def __init__(
+        self,
+        namespace: str,
+        method: str,
+        payload: "MerossPayloadType",
+        triggerSrc: str = mc.HEADER_TRIGGERSRC_DEFAULT,
+        json_payload: bytes | None = None,
+        /,
+    ):
+        self.namespace = namespace
+        self.method = method
+        self.payload = payload
+        self.triggerSrc = triggerSrc
+        self._from = None
+        self._json_from = b""
+        # b'{"header":{"namespace":..,"method":..,"payloadVersion":1,"triggerSrc":..'
+        self._json_header = (
+            b'{"header":'
+            + json_dumpb(
+                {
+                    mc.KEY_NAMESPACE: namespace,
+                    mc.KEY_METHOD: method,
+                    mc.KEY_PAYLOADVERSION: 1,
+                    mc.KEY_TRIGGERSRC: triggerSrc,
+                }
+            )[:-1]
+        )
+        self._json_payload = json_payload or json_dumpb(payload)
+        self._json_multiple = None
+
+    def build(self, key: str, from_: str = mc.HEADER_FROM_DEFAULT, /):
+        request = MerossRequest(
+            self.namespace, self.method, self.payload, key, from_, self.triggerSrc
+        )
+        if from_ != self._from:
+            self._from = from_
+            self._json_from = b',"from":' + json_dumpb(from_)
+        header = request[mc.KEY_HEADER]
+        request.set_json(
+            b"".join(
+                (
+                    self._json_header,
+                    self._json_from,
+                    b',"messageId":"',
+                    request.messageid.encode("utf-8"),
+                    b'","timestamp":',
+                    str(header[mc.KEY_TIMESTAMP]).encode("utf-8"),
+                    b',"timestampMs":0,"sign":"',
+                    header[mc.KEY_SIGN].encode("utf-8"),
+                    b'"},"payload":',
+                    self._json_payload,
+                    b"}",
+                )
+            )
+        )
+        return request
+
+    @staticmethod
+    def multiple(
+        templates: "Iterable[MerossRequestTemplate]",
+        triggerSrc: str = mc.HEADER_TRIGGERSRC_DEFAULT,
+        /,
+    ):
+        """Packs the templates in an Appliance.Control.Multiple request template
+        reusing their serialized payloads."""
+        p_multiple = []
+        j_multiple = []
+        for template in templates:
+            messageid = uuid4().hex
+            p_multiple.append(
+                {
+                    mc.KEY_HEADER: {
+                        mc.KEY_MESSAGEID: messageid,
+                        mc.KEY_METHOD: template.method,
+                        mc.KEY_NAMESPACE: template.namespace,
+                    },
+                    mc.KEY_PAYLOAD: template.payload,
+                }
+            )
+            if not (json_multiple := template._json_multiple):
+                template._json_multiple = json_multiple = (
+                    b'{"header":'
+                    + json_dumpb(
+                        {
+                            mc.KEY_METHOD: template.method,
+                            mc.KEY_NAMESPACE: template.namespace,
+                        }
+                    )[:-1]
+                    + b',"messageId":"',
+                    b'"},"payload":' + template._json_payload + b"}",
+                )
+            j_multiple.append(
+                json_multiple[0] + messageid.encode("utf-8") + json_multiple[1]
+            )
+        ns = mn.Appliance_Control_Multiple
+        return MerossRequestTemplate(
+            ns.name,
+            mc.METHOD_SET,
+            {ns.key: p_multiple},
+            triggerSrc,
+            b'{"' + ns.key.encode("utf-8") + b'":[' + b",".join(j_multiple) + b"]}",
+        )
+
 
 class MerossPushReply(MerossMessage):
     """
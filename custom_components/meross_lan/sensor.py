@@ -5,6 +5,7 @@ from homeassistant.components import sensor
 
 from . import const as mlc
 from .helpers import entity as me
+from .helpers.consumption import ConsumptionHistory
 from .helpers.namespaces import (
     EntityNamespaceHandler,
     EntityNamespaceMixin,
@@ -12,6 +13,7 @@ from .helpers.namespaces import (
     mc,
     mn,
 )
+from .helpers.statistics import StatisticsSource
 from .merossclient import json_dumps
 
 if TYPE_CHECKING:
@@ -424,12 +426,20 @@ class FilterMaintenanceNamespaceHandler(NamespaceHandler):
 
 class ConsumptionHSensor(MLNumericSensor):
 
+    if TYPE_CHECKING:
+        history: ConsumptionHistory
+        """The device hourly consumption samples (timestamp -> Wh)."""
+        statistics_source: StatisticsSource
+
     manager: "Device"
     ns = mn.Appliance_Control_ConsumptionH
 
     _attr_suggested_display_precision = 0
 
-    __slots__ = ()
+    __slots__ = (
+        "history",
+        "statistics_source",
+    )
 
     def __init__(self, manager: "Device", channel: object | None):
         super().__init__(
@@ -439,6 +449,16 @@ class ConsumptionHSensor(MLNumericSensor):
             self.DeviceClass.ENERGY,
             name="Consumption",
         )
+        # hourly samples are identified by their (fixed) timestamp
+        self.history = ConsumptionHistory(
+            mc.KEY_TIMESTAMP, mc.KEY_VALUE, mc.KEY_TIMESTAMP
+        )
+        self.statistics_source = StatisticsSource(
+            self.unique_id,
+            self.name,
+            self.native_unit_of_measurement,
+            self.history,
+        )
         manager.register_parser_entity(self)
 
     def _parse_consumptionH(self, payload: dict):
@@ -446,6 +466,14 @@ class ConsumptionHSensor(MLNumericSensor):
         {"channel": 1, "total": 958, "data": [{"timestamp": 1721548740, "value": 0}]}
         """
         self.update_device_value(payload[mc.KEY_TOTAL])
+        if (
+            (data := payload.get(mc.KEY_DATA))
+            and self.history.update(data)
+            and self.hass_connected
+        ):
+            statistics_source = self.statistics_source
+            statistics_source.name = f"{self.manager.name} {self.name}"
+            self.manager.api.statistics_importer.schedule_import(statistics_source)
 
 
 class ConsumptionHNamespaceHandler(NamespaceHandler):
@@ -181,4 +181,5 @@ def digest_init_togglex(
             mc.METHOD_GET,
             {ns.key: {mc.KEY_CHANNEL: 65535}},
         )
+        handler.polling_template = None
     return handler.parse_list, (handler,)
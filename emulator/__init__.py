@@ -168,8 +168,10 @@ def build_emulators(
     uuidsub = 0
     for f in os.listdir(tracespath):
         fullpath = os.path.join(tracespath, f)
-        # expect only valid csv or json files
+        # expect only valid csv or json files (csv could be compressed)
         f = f.split(".")
+        if f[-1] == "gz":
+            f.pop()
         if f[-1] not in ("csv", "txt", "json"):
             continue
 
@@ -1,6 +1,7 @@
 import asyncio
 from base64 import b64decode, b64encode
 from enum import Enum
+import gzip
 from json import JSONDecodeError
 import threading
 from time import time
@@ -64,7 +65,9 @@ class MerossEmulatorDescriptor(MerossDeviceDescriptor):
         userId: int | None = None,
     ):
         self.namespaces = {}
-        with open(tracefile, "r", encoding="utf8") as f:
+        # meross_lan traces are gzip compressed
+        _open = gzip.open if tracefile.endswith(".gz") else open
+        with _open(tracefile, "rt", encoding="utf8") as f:
             if tracefile.endswith(".json.txt") or tracefile.endswith(".json"):
                 # HA diagnostics trace
                 self._import_json(f)
@@ -405,7 +408,7 @@ class MerossEmulator:
         """
         self.descriptor.time[mc.KEY_TIMESTAMP] = self.epoch = int(time())
 
-    def handle(self, request: MerossMessage | str, /) -> str | None:
+    def handle(self, request: MerossMessage | str | bytes, /) -> str | None:
         """
         main message handler entry point: this is called either from web.Request
         for request routed from the web.Application or from the mqtt.Client.
@@ -414,7 +417,7 @@ class MerossEmulator:
         This method is thread-safe
         """
         cipher = None
-        if isinstance(request, str):
+        if isinstance(request, (str, bytes)):
             # this is typically the path when processing HTTP requests.
             # we're now 'enforcing' encrypted local traffic if device abilities
             # request so
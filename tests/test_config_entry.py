@@ -13,6 +13,7 @@ from custom_components.meross_lan.merossclient.protocol import (
     const as mc,
     namespaces as mn,
 )
+from custom_components.meross_lan.sensor import MLSignalStrengthSensor
 
 from tests import const as tc, helpers
 
@@ -102,6 +103,21 @@ async def test_device_entry(request, hass: "HomeAssistant"):
                     or descriptor.is_refoss  # brutal exception
                 ), f"Incorrect config for {ns.name} namespace"
 
+            # check the state writes coalescing: unchanged states are not written
+            # and repeated flushes in a batch are only written once
+            entity = next(
+                entity for entity in device.entities.values() if entity.hass_connected
+            )
+            entity.flush_state()
+            state_writes = device.state_writes
+            state_writes_suppressed = device.state_writes_suppressed
+            entity.flush_state()
+            with device.state_batch():
+                entity.flush_state()
+                entity.flush_state()
+            assert device.state_writes == state_writes
+            assert device.state_writes_suppressed == state_writes_suppressed + 3
+
             if entity_dnd:
                 state = hass.states.get(entity_dnd.entity_id)
                 assert state and state.state in (hac.STATE_OFF, hac.STATE_ON)
@@ -111,6 +127,54 @@ async def test_device_entry(request, hass: "HomeAssistant"):
                 assert state and state.state.isdigit()
 
 
+async def test_device_warm_start(request, hass: "HomeAssistant"):
+    """
+    Test the device state is restored from the snapshot saved at unload
+    so that the device is online (with its state) right after setup
+    """
+    async with helpers.DeviceContext(
+        request, hass, mc.TYPE_MSS310, data={mlc.CONF_WARM_START: True}
+    ) as context:
+        device = await context.perform_coldstart()
+        sensor_signal_strength = device.entities[mlc.SIGNALSTRENGTH_ID]
+        assert isinstance(sensor_signal_strength, MLSignalStrengthSensor)
+        signal_strength = sensor_signal_strength.native_value
+        assert signal_strength is not None
+
+        # per-channel payloads (i.e. chunked hub polls) are merged by channel
+        ns = mn.Appliance_Control_ToggleX
+        snapshot_payloads = device._snapshot_payloads
+        assert snapshot_payloads is not None
+        snapshot_payloads.pop(ns.name, None)
+        device._snapshot_update(
+            ns.name, {ns.key: [{ns.key_channel: 0, mc.KEY_ONOFF: 1}]}
+        )
+        device._snapshot_update(
+            ns.name, {ns.key: [{ns.key_channel: 1, mc.KEY_ONOFF: 0}]}
+        )
+        device._snapshot_update(
+            ns.name, {ns.key: [{ns.key_channel: 0, mc.KEY_ONOFF: 0}]}
+        )
+        assert snapshot_payloads[ns.name] == {
+            ns.key: [
+                {ns.key_channel: 0, mc.KEY_ONOFF: 0},
+                {ns.key_channel: 1, mc.KEY_ONOFF: 0},
+            ]
+        }
+        snapshot_payloads.pop(ns.name)
+
+        assert await context.async_unload()
+        # bypass DeviceContext.async_setup since it expects an offline device
+        assert await helpers.ConfigEntryMocker.async_setup(context)
+        device = context.device
+        assert device.online
+        sensor_signal_strength = device.entities[mlc.SIGNALSTRENGTH_ID]
+        assert isinstance(sensor_signal_strength, MLSignalStrengthSensor)
+        assert sensor_signal_strength.native_value == signal_strength
+        state = hass.states.get(sensor_signal_strength.entity_id)
+        assert state and state.state == str(signal_strength)
+
+
 async def test_profile_entry(request, hass: "HomeAssistant"):
     """
     Test a Meross cloud profile entry
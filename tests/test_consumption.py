@@ -17,6 +17,7 @@ from custom_components.meross_lan import const as mlc
 from custom_components.meross_lan.devices.mss import (
     ConsumptionXSensor,
     ElectricitySensor,
+    ElectricityXSensor,
 )
 from custom_components.meross_lan.merossclient.protocol import const as mc
 from custom_components.meross_lan.sensor import MLNumericSensor
@@ -415,3 +416,44 @@ async def test_consumption_with_reload(request, hass: "HomeAssistant"):
         # new we unload/reload/reboot again in order to see
         # if the consumption offset gets restored
         await _async_unload_reload("reboot with offset", today_offset)
+
+
+async def test_electricity_sensors(request, hass: "HomeAssistant"):
+    """
+    Verify the ElectricitySensor parser resolves its sensors table again when the
+    device entities change and builds the optional sensors appearing in the payload.
+    """
+    async with helpers.DeviceContext(request, hass, mc.TYPE_MSS310) as context:
+        device = await context.perform_coldstart()
+        entities = device.entities
+        channel = 7
+        sensor_electricity = ElectricityXSensor(device, channel)
+        p_electricity = {
+            mc.KEY_CHANNEL: channel,
+            mc.KEY_CURRENT: 4000,
+            mc.KEY_POWER: 1000000,
+            mc.KEY_VOLTAGE: 230000,
+        }
+        sensor_electricity._parse(p_electricity)
+        assert sensor_electricity._sensors_version == device.entities_version
+        sensor_power = entities[f"{channel}_{mc.KEY_POWER}"]
+        assert isinstance(sensor_power, MLNumericSensor)
+        assert sensor_power.native_value == 1000
+        # optional sensors are only built when they appear in the payload
+        assert f"{channel}_{mc.KEY_FACTOR}" not in entities
+        sensor_electricity._parse(p_electricity | {mc.KEY_FACTOR: 0.9})
+        sensor_factor = entities[f"{channel}_{mc.KEY_FACTOR}"]
+        assert isinstance(sensor_factor, MLNumericSensor)
+        assert sensor_factor.native_value == 0.9
+        sensor_electricity._parse(p_electricity | {mc.KEY_FACTOR: 0.8})
+        assert entities[f"{channel}_{mc.KEY_FACTOR}"] is sensor_factor
+        assert sensor_factor.native_value == 0.8
+        # sensors built elsewhere are picked up once the entities change
+        sensor_consume = MLNumericSensor(
+            device, channel, mc.KEY_CONSUME, MLNumericSensor.DeviceClass.ENERGY
+        )
+        assert sensor_electricity._sensors_version != device.entities_version
+        sensor_electricity._parse(p_electricity | {mc.KEY_CONSUME: 5})
+        assert sensor_electricity._sensors_version == device.entities_version
+        assert entities[f"{channel}_{mc.KEY_CONSUME}"] is sensor_consume
+        assert sensor_consume.native_value == 5
@@ -1,7 +1,36 @@
 """Test the .helpers module"""
 
-from custom_components.meross_lan.helpers import obfuscate
-from custom_components.meross_lan.merossclient.protocol import const as mc
+import asyncio
+import contextlib
+import json
+from types import SimpleNamespace
+from typing import TYPE_CHECKING
+
+from custom_components.meross_lan import const as mlc
+from custom_components.meross_lan.helpers import LogThrottle, obfuscate
+from custom_components.meross_lan.helpers.consumption import ConsumptionHistory
+from custom_components.meross_lan.helpers.mqtt_profile import MQTTWindow
+from custom_components.meross_lan.helpers.namespaces import (
+    NamespaceHandler,
+    NamespaceParser,
+)
+from custom_components.meross_lan.helpers.response_size import ResponseSizeModel
+from custom_components.meross_lan.helpers.scheduler import PollingScheduler
+from custom_components.meross_lan.helpers.startup import StartupScheduler
+from custom_components.meross_lan.helpers.statistics import StatisticsSource
+from custom_components.meross_lan.helpers.tracing import TraceWriter
+from custom_components.meross_lan.merossclient import json_dumps, json_loads
+from custom_components.meross_lan.merossclient.protocol import (
+    const as mc,
+    namespaces as mn,
+)
+
+if TYPE_CHECKING:
+    from homeassistant.core import HomeAssistant
+
+    from custom_components.meross_lan.merossclient.protocol.types import (
+        MerossHeaderType,
+    )
 
 
 def test_obfuscated_key():
@@ -27,3 +56,439 @@ def test_obfuscated_key():
             assert (
                 obfuscate.obfuscated_dict({key: src})[key] == result
             ), f"{key}: {src}"
+
+
+def test_obfuscate_json():
+    """
+    Verify the json text obfuscation matches the dict obfuscation
+    """
+    payload = {
+        "all": {
+            "system": {
+                "hardware": {
+                    "uuid": "eb40234d5ec8db162c08447c0dc7d772",
+                    "macAddress": "48:e1:e9:aa:bb:cc",
+                    "version": "1",
+                },
+                "firmware": {"version": "2", "innerIp": "192.168.1.1", "port": 8883},
+                "online": {"status": 1},
+            },
+            "digest": {
+                "togglex": [
+                    {"channel": 0, "onoff": 1},
+                    {"channel": 1, "uuid": "quoted\"value"},
+                ]
+            },
+        },
+        "params": {"key": "nested"},
+    }
+    clean_payload = payload["all"]["system"]["online"]
+    try:
+        assert obfuscate.obfuscate_json(json_dumps(clean_payload)) == json_dumps(
+            clean_payload
+        )
+        for _ in range(2):  # the second time hits the cached replacements
+            assert obfuscate.obfuscate_json(json_dumps(payload)) == json_dumps(
+                obfuscate.obfuscated_dict(payload)
+            )
+        # also works on 'non compact' json
+        assert json_loads(obfuscate.obfuscate_json(json.dumps(payload))) == json_loads(
+            json_dumps(obfuscate.obfuscated_dict(payload))
+        )
+    finally:
+        # don't leak the obfuscated values into the other tests (logs) expectations
+        for rule in obfuscate.OBFUSCATE_KEYS.values():
+            rule.clear()
+        obfuscate._OBFUSCATE_JSON_CACHE.clear()
+
+
+async def test_polling_scheduler(hass: "HomeAssistant"):
+    """
+    Verify the polling scheduler spreads the devices over time slots
+    and keeps the heap consistent when cancelling.
+    """
+    scheduler = PollingScheduler(hass.loop)
+    devices = [object() for _ in range(5 * PollingScheduler.SLOT_MAX)]
+    handles = [scheduler.schedule(device, 0) for device in devices]  # type: ignore
+    slots: dict[int, int] = {}
+    for handle in handles:
+        slot = int(handle.when())
+        slots[slot] = slots.get(slot, 0) + 1
+    assert len(slots) >= 5
+    assert max(slots.values()) <= PollingScheduler.SLOT_MAX
+    for handle in handles[::2]:
+        handle.cancel()
+    assert scheduler.get_diagnostic_state()["scheduled"] == len(handles) // 2
+    scheduler.shutdown()
+    assert all(handle.cancelled() for handle in handles)
+
+
+async def test_startup_scheduler(hass: "HomeAssistant"):
+    """
+    Verify the startup scheduler admits the devices within the wave budgets
+    and releases the queued ones by priority.
+    """
+    started = []
+
+    def _build_device(
+        device_id: str, conf_protocol: str, digest: dict, config: dict = {}
+    ):
+        return SimpleNamespace(
+            id=device_id,
+            key="",
+            config=config,
+            conf_protocol=conf_protocol,
+            descriptor=SimpleNamespace(digest=digest, userId=None),
+            is_tracing=False,
+            create_diagnostic_entities=False,
+            start=lambda: started.append(device_id),
+            exception_warning=lambda *args: contextlib.nullcontext(),
+        )
+
+    scheduler = StartupScheduler(SimpleNamespace(hass=hass, profiles={}))  # type: ignore
+    # 'auto' devices are only charged on the transport they start with
+    scheduler.admit(_build_device("auto_http", "auto", {}, {"host": "1.1.1.1"}))  # type: ignore
+    scheduler.admit(_build_device("auto_mqtt", "auto", {}))  # type: ignore
+    assert scheduler._http_budget == StartupScheduler.HTTP_BUDGET - 1
+    assert scheduler._mqtt_budget == StartupScheduler.MQTT_BUDGET - 1
+    started.clear()
+    scheduler._new_wave(hass.loop.time())
+    http_budget = StartupScheduler.HTTP_BUDGET
+    for i in range(2 * http_budget):
+        scheduler.admit(_build_device(f"plug{i}", "http", {}))  # type: ignore
+    scheduler.admit(_build_device("hub", "http", {mc.KEY_HUB: {}}))  # type: ignore
+    assert started == [f"plug{i}" for i in range(http_budget)]
+    assert scheduler.get_diagnostic_state()["queued"] == http_budget + 1
+    scheduler._run()
+    assert started[http_budget] == "hub"
+    assert len(started) == 2 * http_budget
+    scheduler._run()
+    assert len(started) == 2 * http_budget + 1
+    assert scheduler.get_state() == "started"
+    scheduler.shutdown()
+
+
+async def test_response_size_model(hass: "HomeAssistant"):
+    """
+    Verify the response size model learns the namespace sizes and the
+    transport limits and that these survive a reload.
+    """
+    model = ResponseSizeModel(hass, "device_id", 4000)
+    for size in (1000, 1200, 1100, 1000):
+        model.update(mn.Appliance_System_All.name, size)
+    mean, variance = model.namespaces[mn.Appliance_System_All.name]
+    assert 1000 < mean < 1200
+    assert variance > 0
+    # every change to the learned means is (lazily) persisted
+    model._data_func()
+    model.update(mn.Appliance_System_All.name, 1100)
+    assert model._save_pending
+    model.update_received("http", 2000)
+    assert model.get_limits("http") == [2000, 4000]
+    model.update_truncated("http", 3000)
+    assert model.size_max("http") == 2700
+    model.update_failed("http")
+    assert model.size_max("http") == 2350
+    # the other transport is unaffected
+    assert model.size_max("mqtt") == 4000
+    # shutdown flushes (and cancels) the delayed save
+    await model.async_shutdown()
+    assert not model._save_pending
+    assert model._store._delay_handle is None
+    model_reloaded = ResponseSizeModel(hass, "device_id", 4000)
+    await model_reloaded.async_load()
+    assert model_reloaded.get_limits("http") == [2000, 2350]
+    assert model_reloaded.namespaces == model.namespaces
+
+
+def test_namespace_handler():
+    """
+    Verify the compiled dispatchers route the payloads to the registered parsers,
+    adapt to the payload shape and are rebuilt when the parsers change.
+    """
+
+    class _Parser(NamespaceParser):
+        def __init__(self, channel):
+            self.channel = channel
+            self.payloads = []
+
+        def _parse(self, payload: dict, /):
+            self.payloads.append(payload)
+
+    logs = []
+    device = SimpleNamespace(
+        namespace_handlers={},
+        is_refoss=False,
+        create_diagnostic_entities=False,
+        DEBUG=10,
+        log=lambda *args, **kwargs: logs.append(args),
+        loggable_dict=lambda payload: payload,
+    )
+    ns = mn.Appliance_Control_ToggleX
+    handler = NamespaceHandler(device, ns)  # type: ignore
+    parser_0 = _Parser(0)
+    handler.register_parser(parser_0)  # type: ignore
+    # the payload shape is probed starting from lists
+    assert handler.handler == handler._handle_list
+    header: "MerossHeaderType" = {}  # type: ignore
+    p_channel_0 = {mc.KEY_CHANNEL: 0, mc.KEY_ONOFF: 1}
+    handler.handler(header, {ns.key: [p_channel_0]})
+    assert handler.handler_build == handler._build_handler_list
+    handler.handler(header, {ns.key: [p_channel_0]})
+    assert parser_0.payloads == [p_channel_0, p_channel_0]
+    # a new parser recompiles the dispatcher
+    handler_compiled = handler.handler
+    parser_1 = _Parser(1)
+    handler.register_parser(parser_1)  # type: ignore
+    assert handler.handler is not handler_compiled
+    p_channel_1 = {mc.KEY_CHANNEL: 1, mc.KEY_ONOFF: 0}
+    handler.handler(header, {ns.key: [p_channel_0, p_channel_1]})
+    assert parser_1.payloads == [p_channel_1]
+    # dict payloads fall back to probing and compile the dict dispatcher
+    handler.handler(header, {ns.key: p_channel_1})
+    assert handler.handler_build == handler._build_handler_dict
+    assert parser_1.payloads == [p_channel_1, p_channel_1]
+    # mixed shapes end with the generic dispatcher
+    handler.handler(header, {ns.key: [p_channel_1]})
+    assert handler.handler_build == handler._build_handler_generic
+    handler.handler(header, {ns.key: p_channel_1})
+    assert parser_1.payloads == [p_channel_1] * 4
+    # unregistering recompiles without the parser (unknown channels are stubbed)
+    handler_compiled = handler.handler
+    handler.unregister(parser_1)  # type: ignore
+    assert handler.handler is not handler_compiled
+    assert handler.handler_build == handler._build_handler_generic
+    handler.handler(header, {ns.key: [p_channel_0, p_channel_1]})
+    assert parser_1.payloads == [p_channel_1] * 4
+    assert parser_0.payloads == [p_channel_0] * 4
+    assert handler.parsers[1] == handler._parse_stub
+    assert len(logs) == 1
+
+
+async def test_mqtt_window(hass: "HomeAssistant"):
+    """
+    Verify the MQTT transactions window limits the in-flight requests
+    and adapts its size to losses.
+    """
+    window = MQTTWindow(2)
+    await window.async_acquire()
+    await window.async_acquire()
+    waiter = asyncio.create_task(window.async_acquire())
+    await asyncio.sleep(0)
+    assert not waiter.done()
+    window.release(True)
+    await asyncio.sleep(0)
+    assert waiter.done()
+    assert window.inflight == 2
+    window.release(False)
+    assert window.size == 1
+    window.release(None)
+    assert window.inflight == 0
+    for _ in range(3):
+        await window.async_acquire()
+        window.release(True)
+    assert window.size == 2
+
+
+async def test_trace_writer(hass: "HomeAssistant", tmp_path, monkeypatch):
+    """
+    Verify the trace writer rotates its files and notifies the owner
+    only after the last flush.
+    """
+    monkeypatch.setattr(mlc, "CONF_TRACE_MAXSIZE", 100)
+    trace_file = await hass.async_add_executor_job(
+        TraceWriter, hass, str(tmp_path / "trace")
+    )
+    closed = []
+    for _ in range(3):
+        # every row overflows the (patched) file size
+        trace_file.write(["0", "", "", "", "", "x" * 100])
+        while trace_file._flushing:
+            await asyncio.sleep(0.01)
+    trace_file.close(closed.append)
+    assert not closed
+    while trace_file._flushing:
+        await asyncio.sleep(0.01)
+    assert closed == [trace_file]
+    assert len(trace_file.names) == 4
+    for name in trace_file.names:
+        assert (tmp_path / name).exists()
+    assert not trace_file.exception
+
+
+def test_log_throttle():
+    """
+    Verify the log throttling keeps the timeout semantics while staying bounded
+    """
+    throttle = LogThrottle()
+    key = ("message %s", ("arg",))
+    assert throttle.check(key, 60, 1000)
+    assert not throttle.check(key, 60, 1030)
+    assert not throttle.check(key, 60, 1059)
+    assert throttle.check(key, 60, 1061)
+    assert throttle.entries[key][2] == 2
+    assert throttle.suppressed == 2
+    assert throttle.get_diagnostic_state()["top_suppressed"] == {"message %s": 2}
+    # expired entries are purged by time bucket
+    throttle.check(("other", ()), 1, 1061)
+    throttle.check(("trigger", ()), 1, 1061 + 2 * LogThrottle.BUCKET_DURATION)
+    assert key not in throttle.entries
+    assert ("other", ()) not in throttle.entries
+    # the cache is bounded evicting the least recently emitted
+    for i in range(LogThrottle.MAXSIZE + 10):
+        throttle.check(("message %s", (i,)), 3600, 10000)
+    assert len(throttle.entries) == LogThrottle.MAXSIZE
+    assert throttle.evicted == 10
+    assert sum(len(bucket) for bucket in throttle.buckets.values()) == len(
+        throttle.entries
+    )
+
+
+def test_consumption_history():
+    """
+    Verify the consumption history merges the device payloads
+    """
+    history = ConsumptionHistory()
+    days = [
+        {
+            mc.KEY_DATE: f"2024-01-{day + 1:02}",
+            mc.KEY_TIME: day * 86400,
+            mc.KEY_VALUE: 10,
+        }
+        for day in range(3)
+    ]
+    assert history.update(days)
+    version = history.version
+    assert not history.update(list(days))
+    assert history.version == version
+    # unordered payload with a new day and an updated one
+    days = [
+        {mc.KEY_DATE: "2024-01-04", mc.KEY_TIME: 3 * 86400, mc.KEY_VALUE: 5},
+        *days[:2],
+        {mc.KEY_DATE: "2024-01-03", mc.KEY_TIME: 2 * 86400, mc.KEY_VALUE: 20},
+    ]
+    assert history.update(days)
+    assert history.version == version + 1
+    assert history.get_samples(86400) == [(86400, 10), (2 * 86400, 20), (3 * 86400, 5)]
+    # samples disappearing from the payload window are dropped
+    assert history.update([days[0], days[1]])
+    assert history.get_samples() == [(0, 10), (3 * 86400, 5)]
+    # bounded size
+    history.update(
+        [
+            {mc.KEY_DATE: f"day{day:03}", mc.KEY_TIME: day * 86400, mc.KEY_VALUE: 1}
+            for day in range(ConsumptionHistory.MAXSIZE + 10)
+        ]
+    )
+    assert len(history.times) == len(history.samples) == ConsumptionHistory.MAXSIZE
+    assert len(history.indexes) == ConsumptionHistory.MAXSIZE
+    assert history.times[0] == 10 * 86400
+
+
+def test_consumption_history_ring_buffer():
+    """
+    Verify the consumption history with (unsorted) ring buffer payloads where
+    the time of today's sample moves forward at every update
+    """
+    history = ConsumptionHistory()
+
+    def _day(day: int, time: int, value: int):
+        return {
+            mc.KEY_DATE: f"2024-01-{day:02}",
+            mc.KEY_TIME: time,
+            mc.KEY_VALUE: value,
+        }
+
+    # ring buffer: the newest sample is not the last one
+    payload = [
+        _day(3, 3 * 86400 + 600, 5),
+        _day(1, 86400 + 86000, 10),
+        _day(2, 2 * 86400 + 86000, 20),
+    ]
+    assert history.update(payload)
+    assert history.get_samples() == [
+        (86400 + 86000, 10),
+        (2 * 86400 + 86000, 20),
+        (3 * 86400 + 600, 5),
+    ]
+    # today's sample is updated (both time and value) in place
+    payload = [_day(3, 3 * 86400 + 1800, 7), *payload[1:]]
+    assert history.update(payload)
+    assert history.times == [86400 + 86000, 2 * 86400 + 86000, 3 * 86400 + 1800]
+    assert len(history.samples) == len(history.indexes) == 3
+    # yesterday is still at times[-2]
+    assert history.times[-2] == 2 * 86400 + 86000
+    assert not history.update([dict(p_sample) for p_sample in payload])
+    # a new day overwrites the oldest slot of the ring buffer
+    # (samples older than the payload window are retained)
+    payload = [payload[0], _day(4, 4 * 86400 + 300, 1), payload[2]]
+    assert history.update(payload)
+    assert history.get_samples() == [
+        (86400 + 86000, 10),
+        (2 * 86400 + 86000, 20),
+        (3 * 86400 + 1800, 7),
+        (4 * 86400 + 300, 1),
+    ]
+
+
+def test_statistics_source():
+    """
+    Verify the statistics rows built out of the consumption history
+    """
+    history = ConsumptionHistory(mc.KEY_TIMESTAMP, mc.KEY_VALUE, mc.KEY_TIMESTAMP)
+    source = StatisticsSource("0123456789ABCDEF_consumptionH", "Test", "Wh", history)
+    assert source.statistic_id == "meross_lan:0123456789abcdef_consumptionh"
+    # as if nothing was imported before
+    source.last_start = 0
+    history.update(
+        [
+            {mc.KEY_TIMESTAMP: 3600 * hour + 3540, mc.KEY_VALUE: hour}
+            for hour in range(1, 4)
+        ]
+    )
+    rows = source.build_statistics()
+    assert [(row["start"].timestamp(), row["state"], row["sum"]) for row in rows] == [
+        (3600, 1, 1),
+        (7200, 2, 3),
+        (10800, 3, 6),
+    ]
+    assert source.version == history.version
+    # the last (growing) bucket is re-imported along with the new ones
+    history.update(
+        [
+            {mc.KEY_TIMESTAMP: 3600 * hour + 3540, mc.KEY_VALUE: hour * 2}
+            for hour in range(2, 5)
+        ]
+    )
+    rows = source.build_statistics()
+    assert [(row["start"].timestamp(), row["state"], row["sum"]) for row in rows] == [
+        (10800, 6, 9),
+        (14400, 8, 17),
+    ]
+    # daily (ConsumptionX) samples are cumulative over the day and the time
+    # of today's sample moves forward at every update
+    history = ConsumptionHistory()
+    source = StatisticsSource(
+        "0123456789ABCDEF_consumptionX",
+        "Test",
+        "Wh",
+        history,
+        lambda sample_time: sample_time - (sample_time % 86400),
+    )
+    source.last_start = 0
+
+    def _day(day: int, time: int, value: int):
+        return {mc.KEY_DATE: f"day{day}", mc.KEY_TIME: time, mc.KEY_VALUE: value}
+
+    history.update([_day(1, 86400 + 80000, 10), _day(2, 2 * 86400 + 3600, 2)])
+    rows = source.build_statistics()
+    assert [(row["start"].timestamp(), row["state"], row["sum"]) for row in rows] == [
+        (86400, 10, 10),
+        (2 * 86400, 2, 12),
+    ]
+    history.update([_day(1, 86400 + 80000, 10), _day(2, 2 * 86400 + 7200, 5)])
+    rows = source.build_statistics()
+    # same day bucket: the sum only grows by the day delta
+    assert [(row["start"].timestamp(), row["state"], row["sum"]) for row in rows] == [
+        (2 * 86400, 5, 15),
+    ]
@@ -0,0 +1,90 @@
+"""Test the hub subdevices dispatching"""
+
+from typing import TYPE_CHECKING
+from unittest.mock import patch
+
+from custom_components.meross_lan import const as mlc
+from custom_components.meross_lan.devices.hub import (
+    HubMixin,
+    HubNamespaceHandler,
+    SubDevice,
+)
+from custom_components.meross_lan.merossclient.protocol import const as mc
+from custom_components.meross_lan.merossclient.protocol.namespaces import (
+    hub as mn_h,
+)
+from custom_components.meross_lan.sensor import MLDiagnosticSensor
+
+from tests import helpers
+
+if TYPE_CHECKING:
+    from homeassistant.core import HomeAssistant
+
+    from custom_components.meross_lan.merossclient.protocol.types import (
+        MerossHeaderType,
+    )
+
+
+async def test_hub_dispatch(request, hass: "HomeAssistant"):
+    """
+    Verify the hub namespaces are dispatched once per subdevice (even if
+    duplicated in the payload) through the subdevice HUB_PARSERS while unknown
+    keys fall through to the diagnostic parsing.
+    """
+    async with helpers.DeviceContext(
+        request,
+        hass,
+        mc.TYPE_MSH300,
+        data={mlc.CONF_CREATE_DIAGNOSTIC_ENTITIES: True},
+    ) as context:
+        device = await context.perform_coldstart()
+        assert isinstance(device, HubMixin)
+        subdevice = next(iter(device.subdevices.values()))
+        subdevice_class = type(subdevice)
+        # the parsers table is built for every subdevice class
+        assert (
+            subdevice_class.HUB_PARSERS[mc.KEY_TOGGLEX]
+            is subdevice_class._parse_togglex
+        )
+        assert SubDevice.HUB_PARSERS[mc.KEY_TOGGLEX] is SubDevice._parse_togglex
+
+        handler = device.namespace_handlers[mn_h.Appliance_Hub_ToggleX.name]
+        assert isinstance(handler, HubNamespaceHandler)
+        header: "MerossHeaderType" = {
+            mc.KEY_NAMESPACE: mn_h.Appliance_Hub_ToggleX.name,
+            mc.KEY_METHOD: mc.METHOD_PUSH,
+        }  # type: ignore
+        p_togglex = {mc.KEY_ID: subdevice.id, mc.KEY_ONOFF: 1}
+        p_togglex_duplicated = {mc.KEY_ID: subdevice.id, mc.KEY_ONOFF: 0}
+        with (
+            patch.object(
+                subdevice_class, "_parse_togglex", autospec=True
+            ) as parse_togglex_mock,
+            patch.object(
+                type(device), "log_duplicated_subdevice", autospec=True
+            ) as log_duplicated_subdevice_mock,
+        ):
+            # HUB_PARSERS caches the (unpatched) functions
+            subdevice_class.HUB_PARSERS = subdevice_class._build_hub_parsers()
+            try:
+                handler.handler(
+                    header, {mc.KEY_TOGGLEX: [p_togglex, p_togglex_duplicated]}
+                )
+                parse_togglex_mock.assert_called_once_with(subdevice, p_togglex)
+                log_duplicated_subdevice_mock.assert_called_once_with(
+                    device, subdevice.id
+                )
+                # a new message is dispatched again
+                handler.handler(header, {mc.KEY_TOGGLEX: [p_togglex]})
+                assert parse_togglex_mock.call_count == 2
+                assert log_duplicated_subdevice_mock.call_count == 1
+            finally:
+                subdevice_class.HUB_PARSERS = subdevice_class._build_hub_parsers()
+
+        # unknown keys build diagnostic sensors
+        subdevice._hub_parse("unknown", {mc.KEY_ID: subdevice.id, "value": 5})
+        sensor = subdevice.entities[f"{subdevice.id}_unknown_value"]
+        assert isinstance(sensor, MLDiagnosticSensor)
+        assert sensor.native_value == 5
+        subdevice._hub_parse("unknown", {mc.KEY_ID: subdevice.id, "value": 6})
+        assert sensor.native_value == 6
@@ -1,8 +1,27 @@
 """Test the merossclient module (low level device/cloud api)"""
 
+import asyncio
+
 from homeassistant.helpers.aiohttp_client import async_get_clientsession
+import paho.mqtt.client as paho_mqtt
+import pytest
 
 from custom_components.meross_lan.merossclient import cloudapi
+from custom_components.meross_lan.merossclient import json_dumpb, json_loads
+from custom_components.meross_lan.merossclient.httpclient import HttpDispatcher
+from custom_components.meross_lan.merossclient.mqttclient import (
+    MerossMQTTAppClient,
+    _MerossMQTTClient,
+    _MQTTRateLimiter,
+)
+from custom_components.meross_lan.merossclient.protocol import const as mc
+from custom_components.meross_lan.merossclient.protocol.message import (
+    MerossLazyResponse,
+    MerossRequest,
+    MerossRequestTemplate,
+    MerossResponse,
+    compute_message_signature,
+)
 
 from . import const as tc, helpers
 
@@ -14,6 +33,56 @@ def test_merossclient_module():
     pass
 
 
+def test_lazy_response():
+    """
+    Verify MerossLazyResponse only decodes the header until the payload is accessed
+    """
+    request = MerossRequest(
+        "Appliance.System.All", "GETACK", {"all": {"system": {}}}, "key"
+    )
+    message = MerossLazyResponse(request.json_bytes())
+    header = message[mc.KEY_HEADER]
+    assert header[mc.KEY_MESSAGEID] == request.messageid
+    assert mc.KEY_PAYLOAD not in dict.keys(message)
+    assert message[mc.KEY_PAYLOAD] == request.payload
+    assert message[mc.KEY_HEADER] is header
+    assert message == MerossResponse(request.json())
+    # dict-storage serializers (orjson) need the fully decoded message
+    message = MerossLazyResponse(request.json_bytes())
+    assert mc.KEY_PAYLOAD not in dict.keys(message)
+    assert message.ensure_decoded() is message
+    assert json_loads(json_dumpb(message))[mc.KEY_PAYLOAD] == request.payload
+    # non header-first messages are fully decoded
+    message = MerossLazyResponse('{"payload":{},"header":{"messageId":"a"}}')
+    assert mc.KEY_PAYLOAD in dict.keys(message)
+
+
+def test_request_template():
+    """
+    Verify requests built out of MerossRequestTemplate(s) serialize to the same message
+    """
+    template = MerossRequestTemplate(
+        "Appliance.System.All", "GET", {"all": {}}, "meross_lan"
+    )
+    template_togglex = MerossRequestTemplate(
+        "Appliance.Control.ToggleX", "GET", {"togglex": [{"channel": 0}]}
+    )
+    for _template in (
+        template,
+        template_togglex,
+        MerossRequestTemplate.multiple((template, template_togglex)),
+    ):
+        request = _template.build("key", "/appliance/uuid/subscribe")
+        message = json_loads(request.json_bytes())
+        assert message == request
+        header = message[mc.KEY_HEADER]
+        assert header[mc.KEY_SIGN] == compute_message_signature(
+            header[mc.KEY_MESSAGEID], "key", header[mc.KEY_TIMESTAMP]
+        )
+        # every build gets a new messageId
+        assert _template.build("key").messageid != request.messageid
+
+
 async def test_cloudapi(hass, cloudapi_mock: helpers.CloudApiMocker):
     cloudapiclient = cloudapi.CloudApiClient(session=async_get_clientsession(hass))
     credentials = await cloudapiclient.async_signin(
@@ -31,3 +100,141 @@ async def test_cloudapi(hass, cloudapi_mock: helpers.CloudApiMocker):
     assert result == tc.MOCK_CLOUDAPI_HUB_GETSUBDEVICES[tc.MOCK_PROFILE_MSH300_UUID]
 
     await cloudapiclient.async_logout()
+
+
+async def test_httpdispatcher():
+    """
+    Verify commands are dispatched before polls when the budget is exhausted
+    """
+    dispatcher = HttpDispatcher(2, 1, 1)
+    await dispatcher.async_acquire("host1", HttpDispatcher.PRIORITY_POLL)
+    dispatched = []
+
+    async def _request(host: str, priority: int):
+        await dispatcher.async_acquire(host, priority)
+        dispatched.append((host, priority))
+
+    tasks = [
+        asyncio.create_task(_request("host2", HttpDispatcher.PRIORITY_POLL)),
+        asyncio.create_task(_request("host1", HttpDispatcher.PRIORITY_COMMAND)),
+        asyncio.create_task(_request("host3", HttpDispatcher.PRIORITY_COMMAND)),
+    ]
+    await asyncio.sleep(0)
+    # the poll budget is exhausted and host1 is busy: only host3 goes through
+    assert dispatched == [("host3", HttpDispatcher.PRIORITY_COMMAND)]
+    dispatcher.release("host1")
+    await asyncio.sleep(0)
+    assert dispatched[1] == ("host1", HttpDispatcher.PRIORITY_COMMAND)
+    dispatcher.release("host3")
+    dispatcher.release("host1")
+    await asyncio.gather(*tasks)
+    assert dispatched[2] == ("host2", HttpDispatcher.PRIORITY_POLL)
+    dispatcher.release("host2")
+    diagnostic_state = dispatcher.get_diagnostic_state()
+    assert diagnostic_state["inflight"] == 0
+    assert diagnostic_state["queue_depth_max"] == 2
+
+
+def test_mqtt_ratelimiter():
+    """
+    Verify the two-level token bucket: bursts are limited over the short term
+    while the hourly budget is slowly consumed.
+    """
+    rl = _MQTTRateLimiter()
+    t_now = rl.t_last
+    for _ in range(_MQTTRateLimiter.MAXQUEUE):
+        rl.refill(t_now)
+        assert rl.tokens >= 1
+        rl.tokens -= 1
+        rl.tokens_hourly -= 1
+    assert rl.tokens < 1
+    assert rl.get_safe_delay() > 0
+    # after DURATION the burst bucket is full again
+    rl.refill(t_now + _MQTTRateLimiter.DURATION)
+    assert rl.tokens == _MQTTRateLimiter.MAXQUEUE
+    assert rl.get_safe_delay() == 0
+    # but the hourly budget has only been partially refilled
+    assert rl.tokens_hourly < _MQTTRateLimiter.HOURLY_MAXQUEUE
+    rl.tokens_hourly = 0
+    assert rl.get_safe_delay() == pytest.approx(
+        _MQTTRateLimiter.HOURLY_DURATION / _MQTTRateLimiter.HOURLY_MAXQUEUE
+    )
+
+
+async def test_mqtt_rx_queue():
+    """
+    Verify messages queued by the mqtt thread are drained in batches
+    by a bounded pool of consumers
+    """
+    loop = asyncio.get_running_loop()
+    received = []
+    consumers_max = 0
+
+    class _Client(_MerossMQTTClient):
+        async def async_mqtt_message(self, msg):
+            nonlocal consumers_max
+            consumers_max = max(consumers_max, self._rx_consumers)
+            await asyncio.sleep(0)
+            received.append(msg)
+
+    client = _Client("test", [], loop=loop)
+    messages = [paho_mqtt.MQTTMessage(mid=mid) for mid in range(100)]
+
+    def _mqtt_thread():
+        for msg in messages:
+            client._mqttc_message_loop(client, None, msg)
+
+    await loop.run_in_executor(None, _mqtt_thread)
+    while len(received) < len(messages):
+        await asyncio.sleep(0.01)
+    assert sorted(msg.mid for msg in received) == list(range(100))
+    assert 0 < client.rx_queue_max <= len(messages)
+    assert consumers_max <= _MerossMQTTClient.RX_CONSUMERS
+    assert not client._rx_consumers
+
+
+async def test_mqtt_rx_decode():
+    """
+    Verify the app client can decode and verify messages in the mqtt thread
+    """
+    loop = asyncio.get_running_loop()
+    received = []
+
+    class _Client(MerossMQTTAppClient):
+        async def async_mqtt_message(self, msg):
+            received.append(msg)
+
+    client = _Client(tc.MOCK_KEY, "100000", loop=loop, rx_decode=True)
+    payloads = [
+        MerossRequest(
+            "Appliance.System.All", "GETACK", {"all": {}}, tc.MOCK_KEY
+        ).json_bytes(),
+        MerossRequest(
+            "Appliance.System.All", "GETACK", {"all": {}}, "wrongkey"
+        ).json_bytes(),
+        b'{"header": {',
+    ]
+
+    def _mqtt_thread():
+        for payload in payloads:
+            msg = paho_mqtt.MQTTMessage()
+            msg.payload = payload
+            client.on_message(client, None, msg)  # type: ignore
+
+    await loop.run_in_executor(None, _mqtt_thread)
+    while len(received) < len(payloads):
+        await asyncio.sleep(0.01)
+    assert isinstance(received[0], MerossResponse)
+    assert received[0].sign_ok is True
+    assert received[0][mc.KEY_PAYLOAD] == {"all": {}}
+    assert isinstance(received[1], MerossResponse)
+    assert received[1].sign_ok is False
+    # malformed payloads are left to the loop
+    assert isinstance(received[2], paho_mqtt.MQTTMessage)
+
+    client.set_rx_decode(False)
+    received.clear()
+    await loop.run_in_executor(None, _mqtt_thread)
+    while len(received) < len(payloads):
+        await asyncio.sleep(0.01)
+    assert all(isinstance(msg, paho_mqtt.MQTTMessage) for msg in received)
@@ -3,12 +3,27 @@
 import typing
 from unittest.mock import ANY
 
+from homeassistant.config_entries import SOURCE_IGNORE
+import pytest
+from pytest_homeassistant_custom_component.common import (
+    MockConfigEntry,
+    async_fire_mqtt_message,
+)
+
 from custom_components.meross_lan import const as mlc
-from custom_components.meross_lan.merossclient import json_dumps
+from custom_components.meross_lan.merossclient import (
+    json_dumpb,
+    json_dumps,
+    json_loads,
+)
 from custom_components.meross_lan.merossclient.protocol import (
     const as mc,
     namespaces as mn,
 )
+from custom_components.meross_lan.merossclient.protocol.message import (
+    MerossRequest,
+    build_message,
+)
 
 from tests import const as tc, helpers
 
@@ -42,6 +57,73 @@ async def test_request_on_mqtt(
         )
 
 
+# the HA MQTT client misc loop timer is still pending when this (fast) test ends
+@pytest.mark.parametrize("expected_lingering_timers", [True])
+async def test_request_on_mqtt_response(
+    request, hass: "HomeAssistant", hamqtt_mock: helpers.HAMQTTMocker
+):
+    """
+    Test the responses to requests routed through mqtt carry the whole
+    message when serialized (HA uses orjson for service responses and
+    orjson only looks at the dict storage of the (lazy) responses)
+    """
+    payload = {mn.Appliance_System_All.key: {mc.KEY_SYSTEM: {}}}
+
+    async def _async_publish(hass, topic: str, request_json, *args, **kwargs):
+        header = json_loads(request_json)[mc.KEY_HEADER]
+        response_topic = mc.TOPIC_RESPONSE.format(tc.MOCK_DEVICE_UUID)
+        response = build_message(
+            header[mc.KEY_NAMESPACE],
+            mc.METHOD_GETACK,
+            payload,
+            header[mc.KEY_MESSAGEID],
+            tc.MOCK_KEY,
+            response_topic,
+        )
+        # reply after the request transaction is armed
+        hass.loop.call_soon(
+            async_fire_mqtt_message, hass, response_topic, json_dumps(response)
+        )
+
+    hamqtt_mock.async_publish_mock.side_effect = _async_publish
+    # avoid the MQTT discovery of the replying device
+    MockConfigEntry(
+        domain=mlc.DOMAIN, source=SOURCE_IGNORE, unique_id=tc.MOCK_DEVICE_UUID
+    ).add_to_hass(hass)
+    async with helpers.MQTTHubEntryMocker(request, hass):
+        service_response = await hass.services.async_call(
+            mlc.DOMAIN,
+            mlc.SERVICE_REQUEST,
+            service_data={
+                mlc.CONF_DEVICE_ID: tc.MOCK_DEVICE_UUID,
+                mc.KEY_NAMESPACE: mn.Appliance_System_All.name,
+                mc.KEY_METHOD: mc.METHOD_GET,
+            },
+            blocking=True,
+            return_response=True,
+        )
+        assert service_response
+        response = json_loads(json_dumpb(service_response["response"]))
+        assert response[mc.KEY_PAYLOAD] == payload
+        # responses are returned untouched to the callers of the MQTT layer
+        api = hass.data[mlc.DOMAIN]
+        mqtt_connection = api._mqtt_connection
+        response = await mqtt_connection.async_mqtt_publish(
+            tc.MOCK_DEVICE_UUID,
+            MerossRequest(
+                mn.Appliance_System_All.name,
+                mc.METHOD_GET,
+                {mn.Appliance_System_All.key: {}},
+                tc.MOCK_KEY,
+                mqtt_connection.topic_response,
+            ),
+        )
+        # beware: any dict api access (even bool()) would decode the lazy message
+        assert response is not None
+        assert mc.KEY_PAYLOAD in dict.keys(response)
+        assert json_loads(json_dumpb(response))[mc.KEY_PAYLOAD] == payload
+
+
 async def test_request_on_device(
     request,
     hass: "HomeAssistant",